@@ -1,28 +1,37 @@
 # Create 3D graf with plottlz
 # Import necessary libraries
-import pandas as pd
-import plotly.graph_objects as go
+import plotly.io as pio
+import dataset_registry
+import downsample
 
-PATH = "datasets\\robot_imu_comparison\\sens1_01_trajectory.csv"
-# Load the robotic_arm dataset
-dataset = pd.read_csv(PATH)
+POINT_BUDGET = downsample.POINT_BUDGET   # max. bodu v grafu, delsi trajektorie se zredukuji
+METHOD = "lttb"                          # lttb | minmax
 
-#Create 3D scatter plot
-fig = go.Scatter3d( 
-    x=dataset['x'],
-    y=dataset['y'],
-    z=dataset['z'],
+# Load the robotic_arm dataset, header aligned with the values (time, x, y, z, qx, qy, qz, qw)
+dataset = dataset_registry.load("robot_imu_trajectory", columns=["time", "x", "y", "z"])
+
+# Downsampling, do prohlizece jde nejvyse POINT_BUDGET bodu
+points = dataset[["x", "y", "z"]].to_numpy()
+points = points[downsample.downsample(points, POINT_BUDGET, METHOD)]
+
+#Create 3D scatter plot, souradnice jako base64 typed arrays misto textovych cisel
+trace = downsample.scatter3d_trace(
+    points,
+    color=points[:, 2],
     mode='markers+lines',
-    marker=dict(size=3, color=dataset['z'], colorscale='Plasma', opacity=0.9, colorbar=dict(title='z')),
-    line=dict(width=1, color='gray')
+    marker=dict(size=3, colorscale='Plasma', opacity=0.9, colorbar=dict(title='z')),
+    line=dict(width=1, color='gray'),
 )
 
-fig = go.Figure(data=[fig])
-fig.update_layout(
-    scene=dict(xaxis_title='x', yaxis_title='y', zaxis_title='z'),
-    title='3D scatter (graph_objects)',
-    margin=dict(l=0, r=0, b=0, t=40)
-)
+fig = {
+    "data": [trace],
+    "layout": dict(
+        scene=dict(xaxis_title='x', yaxis_title='y', zaxis_title='z'),
+        title=f'3D scatter (graph_objects), {len(points)} of {len(dataset)} points',
+        margin=dict(l=0, r=0, b=0, t=40),
+    ),
+}
 
-fig.show()
-fig.write_html("Plotly_grapf.html")
+# validate=False: plotly.py by typed array prevadel zpet na seznam cisel
+pio.show(fig, validate=False)
+pio.write_html(fig, "Plotly_grapf.html", validate=False)
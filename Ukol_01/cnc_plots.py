@@ -0,0 +1,192 @@
+# Speed/acceleration vs. position plots of the CNC tool-wear experiments
+# Obalky (prumer, min/max, volitelne CI) se spocitaji jednou pres NumPy, seaborn by pro kazdou
+# hodnotu x delal bootstrap intervalu spolehlivosti, coz je u dlouhych experimentu nejdrazsi cast.
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import dataset_registry
+
+DEFAULT_BINS = 200
+# z-skore 95% intervalu spolehlivosti prumeru (normalni aproximace)
+Z_95 = 1.959963984540054
+CI_METHODS = (None, "ci95", "sd")
+
+SPEED_COLOR = "blue"
+ACC_COLOR = "red"
+
+
+def envelope(x: np.ndarray, y: np.ndarray, bins: int = DEFAULT_BINS, ci: str | None = None) -> dict:
+    """
+    Binned mean and min/max of y over x, all bins at once
+    :param x: Positions
+    :param y: Values (speed, acceleration)
+    :param bins: Number of equally wide bins of x; 0 = one bin per distinct x (like seaborn)
+    :param ci: None = no interval, "ci95" = 95% CI of the mean, "sd" = mean +- standard deviation
+    :return: x (bin centers), mean, min, max, count and for ci also low/high, only non-empty bins;
+             empty arrays when no pair of x, y is finite
+    """
+    if ci not in CI_METHODS:
+        raise ValueError(f"Unknown ci '{ci}', allowed: {CI_METHODS}")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.isfinite(x) & np.isfinite(y)
+    x, y = x[valid], y[valid]
+    if not len(x):
+        result = {name: np.empty(0) for name in ("x", "mean", "min", "max")}
+        result["count"] = np.empty(0, dtype=np.int64)
+        if ci is not None:
+            result["low"], result["high"] = np.empty(0), np.empty(0)
+        return result
+
+    if bins:
+        edges = np.linspace(x.min(), x.max(), bins + 1)
+        index = np.clip(np.searchsorted(edges, x, side="right") - 1, 0, bins - 1)
+        centers = (edges[:-1] + edges[1:]) / 2
+    else:
+        centers, index = np.unique(x, return_inverse=True)
+        bins = len(centers)
+
+    count = np.bincount(index, minlength=bins)
+    total = np.bincount(index, weights=y, minlength=bins)
+    filled = count > 0
+    mean = total[filled] / count[filled]
+
+    # min/max jednim reduceat nad hodnotami serazenymi podle binu
+    order = np.argsort(index, kind="stable")
+    starts = np.concatenate(([0], np.cumsum(count)[:-1]))[filled]
+    result = {
+        "x": centers[filled],
+        "mean": mean,
+        "min": np.minimum.reduceat(y[order], starts),
+        "max": np.maximum.reduceat(y[order], starts),
+        "count": count[filled],
+    }
+    if ci is not None:
+        # soucet (y - prumer binu)^2, E[y^2] - prumer^2 by pri velkem prumeru a malem rozptylu ztratilo presnost
+        bin_mean = np.zeros(bins)
+        bin_mean[filled] = mean
+        squares = np.bincount(index, weights=(y - bin_mean[index]) ** 2, minlength=bins)[filled]
+        n = count[filled]
+        variance = squares / np.maximum(n - 1, 1)
+        spread = np.sqrt(variance)
+        if ci == "ci95":
+            spread = Z_95 * spread / np.sqrt(n)
+        result["low"], result["high"] = mean - spread, mean + spread
+    return result
+
+
+def draw_envelope(ax, env: dict, color: str, label: str | None = None):
+    """ Mean as a line, min/max as a light band, the interval (if computed) as a darker band """
+    ax.fill_between(env["x"], env["min"], env["max"], color=color, alpha=0.12, linewidth=0)
+    if "low" in env:
+        ax.fill_between(env["x"], env["low"], env["high"], color=color, alpha=0.3, linewidth=0)
+    ax.plot(env["x"], env["mean"], color=color, label=label)
+
+
+def speed_acceleration_figure(data, axes=("X1", "Y1"), bins: int = DEFAULT_BINS, ci: str | None = None, title: str | None = None):
+    """
+    Figure with one subplot per axis: speed (left y axis) and acceleration (right y axis) vs. position
+    :param data: DataFrame with <axis>_Pos, <axis>_Speed and <axis>_Acc columns (see dataset_registry.CNC_RENAMES)
+    :param axes: Machine axes, one subplot each
+    :param bins: Bins of the position, see envelope
+    :param ci: Interval of the mean, see envelope
+    :param title: Title of the figure
+    :return: matplotlib Figure
+    """
+    import matplotlib.pyplot as plt
+
+    fig, subplots = plt.subplots(nrows=len(axes), ncols=1, figsize=(12, 4 * len(axes)), squeeze=False)
+    legend = [
+        plt.Line2D([0], [0], color=SPEED_COLOR, lw=2, label="Speed"),
+        plt.Line2D([0], [0], color=ACC_COLOR, lw=2, label="Acceleration"),
+    ]
+    for ax_speed, axis in zip(subplots[:, 0], axes):
+        position = data[f"{axis}_Pos"].to_numpy()
+        speed_env = envelope(position, data[f"{axis}_Speed"].to_numpy(), bins, ci)
+        acc_env = envelope(position, data[f"{axis}_Acc"].to_numpy(), bins, ci)
+
+        draw_envelope(ax_speed, speed_env, SPEED_COLOR)
+        ax_speed.set_xlabel(f"{axis}_Pos")
+        ax_speed.set_ylabel(f"{axis}_Speed", color=SPEED_COLOR)
+        ax_speed.tick_params(axis="y", labelcolor=SPEED_COLOR)
+
+        ax_acc = ax_speed.twinx()
+        draw_envelope(ax_acc, acc_env, ACC_COLOR)
+        ax_acc.set_ylabel("Acceleration", color=ACC_COLOR)
+        ax_acc.tick_params(axis="y", labelcolor=ACC_COLOR)
+        ax_speed.legend(handles=legend, loc="upper right")
+
+    fig.suptitle(title or "Comparison of Speed and Acceleration for X and Y axes", fontsize=16)
+    fig.tight_layout()
+    return fig
+
+
+def _figure_for_file(job: tuple) -> str:
+    """ Worker of batch_figures: load one experiment, draw it and save it as PNG """
+    path, out_dir, axes, bins, ci = job
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    columns = [f"{axis}_{suffix}" for axis in axes for suffix in ("Pos", "Speed", "Acc")]
+    data = dataset_registry.load_file("cnc_mill_tool_wear", path, columns)
+    name = os.path.splitext(os.path.basename(path))[0]
+    fig = speed_acceleration_figure(data, axes, bins, ci, title=f"{name}: speed and acceleration")
+    out_path = os.path.join(out_dir, f"{name}.png")
+    fig.savefig(out_path, dpi=100)
+    plt.close(fig)
+    return out_path
+
+
+def batch_figures(
+    pattern: str | None = None,
+    out_dir: str = "cnc_figures",
+    axes=("X1", "Y1"),
+    bins: int = DEFAULT_BINS,
+    ci: str | None = None,
+    workers: int | None = None,
+) -> list[str]:
+    """
+    Figures of all experiments at once, one process per file
+    :param pattern: Glob of the CSV files, default experiment_*.csv next to the registered dataset
+    :param out_dir: Directory of the PNG files
+    :param workers: Number of processes, None = number of CPUs
+    :return: Paths of the written figures
+    """
+    if pattern is None:
+        pattern = os.path.join(os.path.dirname(dataset_registry.dataset_path("cnc_mill_tool_wear")), "experiment_*.csv")
+    files = sorted(glob.glob(pattern))
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(path, out_dir, tuple(axes), bins, ci) for path in files]
+    if len(jobs) <= 1:
+        return [_figure_for_file(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_figure_for_file, jobs))
+
+
+if __name__ == "__main__":
+    # porovnani s seaborn lineplot (bootstrap CI pro kazdou hodnotu x) na stejnych datech
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    dataset = dataset_registry.load("cnc_mill_tool_wear", ["X1_Pos", "X1_Speed", "X1_Acc", "Y1_Pos", "Y1_Speed", "Y1_Acc"])
+    start = time.perf_counter()
+    plt.close(speed_acceleration_figure(dataset, ci="ci95"))
+    print(f"envelopes: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    fig, ax = plt.subplots()
+    for axis in ("X1", "Y1"):
+        for column in ("Speed", "Acc"):
+            sns.lineplot(data=dataset, x=f"{axis}_Pos", y=f"{axis}_{column}", ax=ax)
+    plt.close(fig)
+    print(f"seaborn lineplot with bootstrap: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    print(batch_figures(), f"{(time.perf_counter() - start) * 1000:.0f} ms")
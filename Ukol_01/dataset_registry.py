@@ -0,0 +1,216 @@
+# Registry of the datasets in datasets/ with their dtypes and column renames
+# Prvni nacteni parsuje CSV a ulozi binarni cache (Feather), dalsi nacteni CSV vubec neotevre
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+import trajectory
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    # bez pyarrow se data ctou vzdy z CSV, jen bez cache
+    feather = None
+
+# Adresar datasets/ v koreni repozitare, skripty tak nezavisi na aktualnim adresari
+DATASETS_DIR = os.getenv("DATASETS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "datasets"))
+CACHE_DIR = os.getenv("DATASET_CACHE_DIR", os.path.join(DATASETS_DIR, ".cache"))
+
+# Prejmenovani sloupcu CNC datasetu na kratke nazvy
+CNC_RENAMES = {
+    "X1_ActualPosition": "X1_Pos",
+    "X1_ActualVelocity": "X1_Speed",
+    "X1_ActualAcceleration": "X1_Acc",
+    "Y1_ActualPosition": "Y1_Pos",
+    "Y1_ActualVelocity": "Y1_Speed",
+    "Y1_ActualAcceleration": "Y1_Acc",
+    "Z1_ActualPosition": "Z1_Pos",
+    "Z1_ActualVelocity": "Z1_Speed",
+    "Z1_ActualAcceleration": "Z1_Acc",
+}
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """ One CSV file of datasets/ and how to read it """
+    path: str                                              # relativne k DATASETS_DIR
+    dtypes: dict = field(default_factory=dict)             # sloupec (puvodni nazev) -> dtype
+    default_dtype: object = None                           # dtype ostatnich sloupcu, napr. np.float32
+    renames: dict = field(default_factory=dict)            # puvodni nazev -> novy nazev
+    parse_dates: list = field(default_factory=list)
+    reader: Callable[[str], pd.DataFrame] | None = None    # vlastni parser misto pd.read_csv
+
+
+DATASETS = {
+    "cnc_mill_tool_wear": DatasetSpec(
+        "cnc_mill_tool_wear/experiment_01.csv",
+        dtypes={"Machining_Process": "category"},
+        default_dtype=np.float32,
+        renames=CNC_RENAMES,
+    ),
+    # hlavicka je posunuta proti hodnotam, cte se vlastnim parserem (viz trajectory.py)
+    "robot_imu_trajectory": DatasetSpec(
+        "robot_imu_comparison/sens1_01_trajectory.csv",
+        reader=trajectory.read_trajectory_csv,
+    ),
+    "weather_forecast": DatasetSpec(
+        "weather_data/weather_forecast.csv",
+        default_dtype=np.float32,
+        parse_dates=["date"],
+    ),
+}
+
+
+def dataset_path(name: str) -> str:
+    """ Absolute path of the CSV file of a registered dataset """
+    return os.path.join(DATASETS_DIR, get_spec(name).path)
+
+
+def get_spec(name: str) -> DatasetSpec:
+    if name not in DATASETS:
+        raise KeyError(f"Unknown dataset '{name}', registered: {', '.join(DATASETS)}")
+    return DATASETS[name]
+
+
+def file_hash(path: str) -> str:
+    """ sha256 of the whole file """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_csv(spec: DatasetSpec, path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Parse the CSV file with the dtypes and renames of the spec
+    :param spec: Dataset specification
+    :param path: Path to the CSV file
+    :param columns: Columns to parse (new names), None = all
+    :return: DataFrame with renamed columns
+    """
+    if spec.reader is not None:
+        data = spec.reader(path)
+        return data[columns] if columns else data
+
+    original = {new: old for old, new in spec.renames.items()}
+    usecols = [original.get(name, name) for name in columns] if columns else None
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {name: spec.default_dtype for name in header if spec.default_dtype is not None and name not in spec.parse_dates}
+    dtypes.update(spec.dtypes)
+    data = pd.read_csv(path, usecols=usecols, dtype=dtypes, parse_dates=spec.parse_dates or False)
+    data = data.rename(columns=spec.renames)
+    return data[columns] if columns else data
+
+
+def _cache_key(name: str, path: str) -> str:
+    """
+    Cache key of the current file content. Hash se pocita jen kdyz se zmenil mtime nebo velikost,
+    jinak se vezme z meta souboru, takze teply start soubor necte.
+    """
+    stat = os.stat(path)
+    meta_path = os.path.join(CACHE_DIR, f"{name}.json")
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+            return meta["sha256"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sha = file_hash(path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha}, f)
+    os.replace(tmp_path, meta_path)
+    return sha
+
+
+def load(name: str, columns: list[str] | None = None, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Load a registered dataset
+    :param name: Dataset name, see DATASETS
+    :param columns: Columns to load (after renaming), None = all
+    :param use_cache: False = always parse the CSV
+    :return: DataFrame with the dtypes of the registry
+    """
+    return _load(name, get_spec(name), dataset_path(name), columns, use_cache)
+
+
+def load_file(name: str, path: str, columns: list[str] | None = None, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Load another CSV file with the schema of a registered dataset, e.g. experiment_02.csv of cnc_mill_tool_wear
+    :param name: Dataset whose specification is used
+    :param path: Path to the CSV file
+    :param columns: Columns to load (after renaming), None = all
+    :param use_cache: False = always parse the CSV
+    :return: DataFrame with the dtypes of the registry
+    """
+    cache_name = f"{name}.{os.path.splitext(os.path.basename(path))[0]}"
+    return _load(cache_name, get_spec(name), path, columns, use_cache)
+
+
+def _load(cache_name: str, spec: DatasetSpec, path: str, columns: list[str] | None, use_cache: bool) -> pd.DataFrame:
+    if not use_cache or feather is None:
+        return read_csv(spec, path, columns)
+
+    cache_path = os.path.join(CACHE_DIR, f"{cache_name}-{_cache_key(cache_name, path)[:16]}.feather")
+    if not os.path.exists(cache_path):
+        # cache obsahuje vsechny sloupce, pozdejsi dotaz na jine sloupce ji pouzije taky
+        data = read_csv(spec, path)
+        for old in os.listdir(CACHE_DIR):
+            if old.startswith(f"{cache_name}-") and old.endswith(".feather"):
+                os.remove(os.path.join(CACHE_DIR, old))
+        # jmeno tmp souboru podle procesu, soubeh vice procesu (batch grafu) si neprepise rozepsany soubor
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        feather.write_feather(data, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, cache_path)
+        return data[columns] if columns else data
+
+    # nekomprimovany Feather se mapuje do pameti, ctou se jen pozadovane sloupce
+    return feather.read_feather(cache_path, columns=columns, memory_map=True)
+
+
+def clear_cache(name: str):
+    """ Remove the cached copy of a dataset """
+    if not os.path.isdir(CACHE_DIR):
+        return
+    for entry in os.listdir(CACHE_DIR):
+        if entry.startswith(f"{name}-") or entry == f"{name}.json":
+            os.remove(os.path.join(CACHE_DIR, entry))
+
+
+def benchmark(name: str, columns: list[str] | None = None, repeat: int = 5) -> dict:
+    """
+    Compare a cold load (CSV parsing, cache written) with a warm load from the cache
+    :return: Times in milliseconds
+    """
+    clear_cache(name)
+    start = time.perf_counter()
+    load(name, columns)
+    cold = (time.perf_counter() - start) * 1000
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load(name, columns)
+        warm.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    pd.read_csv(dataset_path(name))
+    plain = (time.perf_counter() - start) * 1000
+    return {"plain_read_csv_ms": plain, "cold_ms": cold, "warm_ms": min(warm)}
+
+
+if __name__ == "__main__":
+    for dataset_name in DATASETS:
+        result = benchmark(dataset_name)
+        print(f"{dataset_name}: " + ", ".join(f"{key}={value:.1f}" for key, value in result.items()))
+    print(benchmark("cnc_mill_tool_wear", ["X1_Pos", "X1_Speed", "X1_Acc"]))
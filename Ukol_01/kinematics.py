@@ -0,0 +1,188 @@
+# Vectorized kinematics of a sampled trajectory, whole arrays at once, no loops over samples
+import time as timer
+
+import numpy as np
+
+from trajectory import Trajectory
+
+# Relativni rozptyl kroku, do ktereho se vzorkovani povazuje za rovnomerne.
+# Epoch cas (1.7e9 s) ma v float64 rozliseni ~2e-7 s, krok 10 ms tedy nikdy neni presne stejny.
+UNIFORM_TOLERANCE = 1e-4
+
+
+def uniform_step(time: np.ndarray) -> float | None:
+    """ Sampling step if the samples are uniform within UNIFORM_TOLERANCE, otherwise None """
+    if len(time) < 2:
+        return None
+    steps = np.diff(time)
+    step = (time[-1] - time[0]) / (len(time) - 1)
+    if step > 0 and np.abs(steps - step).max() <= UNIFORM_TOLERANCE * step:
+        return float(step)
+    return None
+
+
+def derivative(values: np.ndarray, time: np.ndarray, step: float | None = None) -> np.ndarray:
+    """
+    Time derivative by finite differences, central inside, one-sided at the ends
+    :param values: (N,) or (N, k) samples
+    :param time: (N,) sample times, need not be uniform
+    :param step: Uniform step from uniform_step, the faster formula with a constant step is used
+    :return: Derivative with the shape of values
+    """
+    if step is not None:
+        return np.gradient(values, step, axis=0, edge_order=1)
+    return np.gradient(values, time, axis=0, edge_order=1)
+
+
+def norm(vectors: np.ndarray) -> np.ndarray:
+    """ Length of every row, einsum is faster than np.linalg.norm(axis=1) """
+    return np.sqrt(np.einsum("ij,ij->i", vectors, vectors))
+
+
+def velocity(position: np.ndarray, time: np.ndarray) -> np.ndarray:
+    return derivative(position, time, uniform_step(time))
+
+
+def acceleration(position: np.ndarray, time: np.ndarray) -> np.ndarray:
+    step = uniform_step(time)
+    return derivative(derivative(position, time, step), time, step)
+
+
+def jerk(position: np.ndarray, time: np.ndarray) -> np.ndarray:
+    step = uniform_step(time)
+    return derivative(derivative(derivative(position, time, step), time, step), time, step)
+
+
+def speed(position: np.ndarray, time: np.ndarray) -> np.ndarray:
+    """ Magnitude of the velocity """
+    return norm(velocity(position, time))
+
+
+def path_length(position: np.ndarray, cumulative: bool = False):
+    """
+    Length of the path as a sum of the segment lengths
+    :param position: (N, 3)
+    :param cumulative: True = (N,) distance travelled up to every sample
+    :return: Total length or the cumulative array
+    """
+    steps = norm(np.diff(position, axis=0))
+    if cumulative:
+        return np.concatenate(([0.0], np.cumsum(steps)))
+    return float(steps.sum())
+
+
+def normalize_quaternions(quaternion: np.ndarray) -> np.ndarray:
+    """
+    Unit quaternions (x, y, z, w) with a continuous sign.
+    q a -q jsou stejna rotace; znamenko se otoci tam, kde by soused skocil na druhou polokouli,
+    jinak by derivace (uhlova rychlost) mela v miste skoku obrovskou spicku.
+    """
+    unit = quaternion / norm(quaternion)[:, None]
+    dots = np.einsum("ij,ij->i", unit[1:], unit[:-1])
+    signs = np.concatenate(([1.0], np.cumprod(np.where(dots < 0, -1.0, 1.0))))
+    return unit * signs[:, None]
+
+
+def quaternion_multiply(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """ Hamilton product of (N, 4) arrays in (x, y, z, w) order """
+    ax, ay, az, aw = a.T
+    bx, by, bz, bw = b.T
+    return np.stack([
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+        aw * bw - ax * bx - ay * by - az * bz,
+    ], axis=1)
+
+
+def quaternion_conjugate(quaternion: np.ndarray) -> np.ndarray:
+    return quaternion * np.array([-1.0, -1.0, -1.0, 1.0])
+
+
+def angular_velocity(
+    quaternion: np.ndarray,
+    time: np.ndarray,
+    body_frame: bool = True,
+    step: float | None = None,
+    normalized: bool = False,
+) -> np.ndarray:
+    """
+    Angular velocity from the orientation, omega = 2 * q* x dq/dt (body frame) or 2 * dq/dt x q* (world frame)
+    :param quaternion: (N, 4) orientation (x, y, z, w)
+    :param time: (N,) sample times
+    :param body_frame: True = in the frame of the sensor, False = in the world frame
+    :param step: Uniform step, see uniform_step
+    :param normalized: True if the quaternions are already from normalize_quaternions
+    :return: (N, 3) rad/s
+    """
+    q = quaternion if normalized else normalize_quaternions(quaternion)
+    dq = derivative(q, time, step)
+    # vektorova cast soucinu primo, skalarni cast (w) neni potreba
+    v, w = q[:, :3], q[:, 3:]
+    dv, dw = dq[:, :3], dq[:, 3:]
+    cross = np.cross(v, dv)
+    if body_frame:
+        return 2.0 * (w * dv - dw * v - cross)
+    return 2.0 * (w * dv - dw * v + cross)
+
+
+def resample(time: np.ndarray, values: np.ndarray, dt: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Linear interpolation of all columns to a uniform time grid
+    :param time: (N,) increasing sample times
+    :param values: (N,) or (N, k) samples
+    :param dt: Step of the new grid
+    :return: (grid, resampled values)
+    """
+    grid = np.arange(time[0], time[-1], dt)
+    # jeden searchsorted pro vsechny sloupce misto np.interp po sloupcich
+    right = np.clip(np.searchsorted(time, grid, side="right"), 1, len(time) - 1)
+    left = right - 1
+    weight = (grid - time[left]) / (time[right] - time[left])
+    if values.ndim > 1:
+        weight = weight[:, None]
+    return grid, values[left] + (values[right] - values[left]) * weight
+
+
+def resample_trajectory(trajectory: Trajectory, dt: float) -> Trajectory:
+    """ Trajectory on a uniform grid, quaternions interpolated linearly and normalized again (nlerp) """
+    grid, position = resample(trajectory.time, trajectory.position, dt)
+    _, quaternion = resample(trajectory.time, normalize_quaternions(trajectory.quaternion), dt)
+    return Trajectory(grid, position, normalize_quaternions(quaternion))
+
+
+def summary(trajectory: Trajectory) -> dict:
+    """ Kinematic quantities of a whole trajectory """
+    t, p = trajectory.time, trajectory.position
+    step = uniform_step(t)
+    v = derivative(p, t, step)
+    a = derivative(v, t, step)
+    j = derivative(a, t, step)
+    q = normalize_quaternions(trajectory.quaternion)
+    return {
+        "velocity": v,
+        "acceleration": a,
+        "jerk": j,
+        "speed": norm(v),
+        "path_length": path_length(p, cumulative=True),
+        "quaternion": q,
+        "angular_velocity": angular_velocity(q, t, step=step, normalized=True),
+    }
+
+
+if __name__ == "__main__":
+    # benchmark na synteticke trajektorii: 2 miliony vzorku po 10 ms
+    samples = 2_000_000
+    t = np.arange(samples) * 0.01
+    synthetic = Trajectory(
+        time=t,
+        position=np.stack([np.cos(t), np.sin(t), 0.01 * t], axis=1),
+        quaternion=np.stack([np.zeros_like(t), np.zeros_like(t), np.sin(t / 2), np.cos(t / 2)], axis=1),
+    )
+    start = timer.perf_counter()
+    result = summary(synthetic)
+    print(f"summary of {samples} samples: {(timer.perf_counter() - start) * 1000:.0f} ms, "
+          f"path length {result['path_length'][-1]:.1f}, omega_z {result['angular_velocity'][samples // 2, 2]:.3f} rad/s")
+    start = timer.perf_counter()
+    resample_trajectory(synthetic, 0.02)
+    print(f"resample to 20 ms: {(timer.perf_counter() - start) * 1000:.0f} ms")
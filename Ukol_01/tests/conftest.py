@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+# moduly Ukol_01 importuji testy, sys.path nastavuje conftest.py v koreni repozitare
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """ Binary cache of dataset_registry in a temporary directory, datasets/.cache stays untouched """
+    import dataset_registry
+    path = tmp_path / "cache"
+    monkeypatch.setattr(dataset_registry, "CACHE_DIR", str(path))
+    return path
+
+
+@pytest.fixture
+def trajectory_csv(tmp_path):
+    """ Factory of a robot_imu_comparison file: header with the '#' placeholder, rows ending with a comma """
+
+    def write(time: np.ndarray, position: np.ndarray, quaternion: np.ndarray) -> str:
+        path = tmp_path / "trajectory.csv"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("#,time[sec],x,y,z,qx,qy,qz,qw\n")
+            for row in np.column_stack([time, position, quaternion]):
+                f.write(",".join(repr(float(value)) for value in row) + ",\n")
+        return str(path)
+
+    return write
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cnc_plots
+
+
+def noisy(samples: int = 5000, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(-10, 10, samples)
+    return x, np.sin(x) + rng.normal(0, 0.1, samples)
+
+
+def test_envelope_matches_pandas_groupby():
+    x, y = noisy()
+    y[::97] = np.nan
+
+    env = cnc_plots.envelope(x, y, bins=40, ci="sd")
+
+    valid = np.isfinite(y)
+    edges = np.linspace(x.min(), x.max(), 41)
+    index = np.clip(np.searchsorted(edges, x[valid], side="right") - 1, 0, 39)
+    expected = pd.Series(y[valid]).groupby(index).agg(["mean", "min", "max", "count", "std"])
+    assert np.allclose(env["mean"], expected["mean"])
+    assert np.array_equal(env["min"], expected["min"]) and np.array_equal(env["max"], expected["max"])
+    assert np.array_equal(env["count"], expected["count"])
+    assert np.allclose(env["high"] - env["mean"], expected["std"])
+
+
+def test_ci95_is_narrower_than_sd():
+    x, y = noisy()
+
+    sd = cnc_plots.envelope(x, y, bins=20, ci="sd")
+    ci = cnc_plots.envelope(x, y, bins=20, ci="ci95")
+
+    assert np.allclose(ci["high"] - ci["mean"], cnc_plots.Z_95 * (sd["high"] - sd["mean"]) / np.sqrt(sd["count"]))
+    assert "low" not in cnc_plots.envelope(x, y, bins=20)
+
+
+def test_one_bin_per_distinct_x():
+    env = cnc_plots.envelope([1, 1, 2, 5, 5, 5], [1.0, 3.0, 4.0, 0.0, 1.0, 2.0], bins=0)
+
+    assert env["x"].tolist() == [1.0, 2.0, 5.0]
+    assert env["mean"].tolist() == [2.0, 4.0, 1.0]
+    assert env["count"].tolist() == [2, 1, 3]
+
+
+def test_empty_bins_are_dropped():
+    env = cnc_plots.envelope([0.0, 0.1, 9.9, 10.0], [1.0, 2.0, 3.0, 4.0], bins=10)
+
+    assert len(env["x"]) == 2
+    assert env["mean"].tolist() == [1.5, 3.5]
+
+
+@pytest.mark.parametrize("x, y", [([], []), ([1.0, 2.0], [np.nan, np.nan]), ([np.inf, np.nan], [1.0, 2.0])])
+@pytest.mark.parametrize("bins", [10, 0])
+def test_no_finite_values_give_empty_envelope(x, y, bins):
+    env = cnc_plots.envelope(x, y, bins=bins, ci="ci95")
+
+    assert set(env) == {"x", "mean", "min", "max", "count", "low", "high"}
+    assert all(len(values) == 0 for values in env.values())
+
+
+def test_variance_with_large_mean():
+    # rozptyl 1e-4 kolem 1e8: E[y^2] - prumer^2 by dal nulu nebo zaporne cislo
+    rng = np.random.default_rng(1)
+    x = np.repeat(np.arange(5.0), 1000)
+    y = 1e8 + rng.normal(0, 0.01, len(x))
+
+    env = cnc_plots.envelope(x, y, bins=0, ci="sd")
+
+    expected = pd.Series(y).groupby(x).std()
+    assert np.allclose(env["high"] - env["mean"], expected, rtol=1e-6)
+
+
+def test_unknown_ci():
+    with pytest.raises(ValueError):
+        cnc_plots.envelope([1.0], [1.0], ci="ci99")
@@ -0,0 +1,74 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataset_registry
+
+
+def test_cnc_dtypes_and_renames():
+    data = dataset_registry.load("cnc_mill_tool_wear", use_cache=False)
+    raw = pd.read_csv(dataset_registry.dataset_path("cnc_mill_tool_wear"))
+
+    assert len(data) == len(raw)
+    assert "X1_Pos" in data.columns and "X1_ActualPosition" not in data.columns
+    assert "S1_ActualPosition" in data.columns
+    assert data["Machining_Process"].dtype == "category"
+    assert data["X1_Pos"].dtype == np.float32
+    assert np.allclose(data["X1_Pos"], raw["X1_ActualPosition"], rtol=1e-6)
+
+
+def test_warm_load_from_cache_equals_csv(cache_dir):
+    cold = dataset_registry.load("cnc_mill_tool_wear")
+    files = sorted(os.listdir(cache_dir))
+    warm = dataset_registry.load("cnc_mill_tool_wear")
+
+    # meta soubor s hashem a jedna kopie dat pojmenovana podle hashe
+    assert len(files) == 2 and "cnc_mill_tool_wear.json" in files
+    assert any(name.startswith("cnc_mill_tool_wear-") and name.endswith(".feather") for name in files)
+    pd.testing.assert_frame_equal(warm, cold)
+    pd.testing.assert_frame_equal(warm, dataset_registry.load("cnc_mill_tool_wear", use_cache=False))
+
+
+def test_columns_are_read_from_the_cache():
+    dataset_registry.load("cnc_mill_tool_wear")
+
+    data = dataset_registry.load("cnc_mill_tool_wear", ["X1_Pos", "X1_Speed"])
+
+    assert list(data.columns) == ["X1_Pos", "X1_Speed"]
+    assert data["X1_Speed"].dtype == np.float32
+
+
+def test_changed_file_invalidates_the_cache(tmp_path, cache_dir):
+    path = str(tmp_path / "experiment_02.csv")
+    shutil.copy(dataset_registry.dataset_path("cnc_mill_tool_wear"), path)
+    first = dataset_registry.load_file("cnc_mill_tool_wear", path)
+
+    pd.read_csv(path).head(10).to_csv(path, index=False)
+    second = dataset_registry.load_file("cnc_mill_tool_wear", path)
+
+    assert len(first) > 10 and len(second) == 10
+    assert "X1_Pos" in second.columns
+    assert len([name for name in os.listdir(cache_dir) if name.endswith(".feather")]) == 1
+
+
+def test_trajectory_dataset_uses_its_reader():
+    data = dataset_registry.load("robot_imu_trajectory", use_cache=False)
+
+    assert list(data.columns) == ["time", "x", "y", "z", "qx", "qy", "qz", "qw"]
+    assert data["time"].iloc[0] > 1.6e9
+    assert np.allclose(np.linalg.norm(data[["qx", "qy", "qz", "qw"]], axis=1), 1.0, atol=1e-3)
+
+
+def test_weather_dates_are_parsed():
+    data = dataset_registry.load("weather_forecast", use_cache=False)
+
+    assert pd.api.types.is_datetime64_any_dtype(data["date"])
+    assert data.drop(columns="date").dtypes.eq(np.float32).all()
+
+
+def test_unknown_dataset():
+    with pytest.raises(KeyError):
+        dataset_registry.load("no_such_dataset")
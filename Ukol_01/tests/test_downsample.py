@@ -0,0 +1,89 @@
+import base64
+
+import numpy as np
+import pytest
+
+import downsample
+
+
+def spiral(samples: int) -> np.ndarray:
+    t = np.linspace(0, 20 * np.pi, samples)
+    return np.stack([np.cos(t), np.sin(t), t / 100], axis=1)
+
+
+@pytest.mark.parametrize("method", list(downsample.METHODS))
+def test_short_input_is_kept(method):
+    points = spiral(50)
+
+    assert np.array_equal(downsample.downsample(points, 50, method), np.arange(50))
+    assert np.array_equal(downsample.downsample(points, 80, method), np.arange(50))
+
+
+def test_lttb_keeps_budget_and_ends():
+    points = spiral(10_000)
+
+    kept = downsample.lttb_3d(points, 500)
+
+    assert len(kept) == 500
+    assert kept[0] == 0 and kept[-1] == len(points) - 1
+    assert np.all(np.diff(kept) > 0)
+
+
+def test_lttb_keeps_a_spike():
+    points = np.zeros((1000, 3))
+    points[:, 0] = np.arange(1000)
+    points[437, 2] = 50.0
+
+    assert 437 in downsample.lttb_3d(points, 20)
+
+
+def test_minmax_keeps_extremes_of_every_bucket():
+    points = spiral(10_000)
+    points[5001, 1] = -3.0
+
+    kept = downsample.minmax_3d(points, 602)
+
+    assert len(kept) <= 602
+    assert 5001 in kept
+    assert kept[0] == 0 and kept[-1] == len(points) - 1
+    assert np.all(np.diff(kept) > 0)
+
+
+@pytest.mark.parametrize("samples", [9, 10, 57, 1000, 1003])
+@pytest.mark.parametrize("budget", [3, 7, 8, 9, 14, 50, 100])
+def test_minmax_length_and_ends(samples, budget):
+    kept = downsample.minmax_3d(spiral(samples), budget)
+
+    assert kept[0] == 0 and kept[-1] == samples - 1
+    assert np.all(np.diff(kept) > 0)
+    if budget >= samples:
+        assert len(kept) == samples
+    elif budget < 8:
+        # na jeden bucket min/max rozpocet nestaci, LTTB vrati presne budget bodu
+        assert len(kept) == budget
+    else:
+        assert 2 + 2 <= len(kept) <= 2 + 6 * ((budget - 2) // 6) <= budget
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        downsample.downsample(spiral(10), 5, "random")
+
+
+def test_typed_array_is_little_endian_float32():
+    values = np.array([1.5, -2.25, 3.0])
+
+    typed = downsample.typed_array(values)
+
+    assert typed["dtype"] == "f4"
+    assert np.array_equal(np.frombuffer(base64.b64decode(typed["bdata"]), "<f4"), values)
+
+
+def test_scatter3d_trace():
+    points = spiral(10)
+
+    trace = downsample.scatter3d_trace(points, points[:, 2], mode="lines")
+
+    assert trace["type"] == "scatter3d" and trace["mode"] == "lines"
+    assert np.allclose(np.frombuffer(base64.b64decode(trace["y"]["bdata"]), "<f4"), points[:, 1])
+    assert trace["marker"]["color"]["dtype"] == "f4"
@@ -0,0 +1,107 @@
+import numpy as np
+
+import kinematics
+import trajectory
+
+
+def circle(samples: int = 2001, step: float = 0.01):
+    """ Unit circle at 1 rad/s while rotating about z at 1 rad/s """
+    t = 1.7e9 + np.arange(samples) * step
+    angle = t - t[0]
+    position = np.stack([np.cos(angle), np.sin(angle), np.zeros_like(angle)], axis=1)
+    quaternion = np.stack([np.zeros_like(angle), np.zeros_like(angle), np.sin(angle / 2), np.cos(angle / 2)], axis=1)
+    return t, position, quaternion
+
+
+def test_header_is_aligned_with_the_values(trajectory_csv):
+    t, position, quaternion = circle(5)
+
+    loaded = trajectory.load_trajectory(trajectory_csv(t, position, quaternion))
+
+    # hlavicka "#,time[sec],x,..." je posunuta, time nese prvni hodnotu radku
+    assert np.allclose(loaded.time, t, rtol=1e-15, atol=0)
+    assert np.allclose(loaded.position, position, rtol=1e-14, atol=0)
+    assert np.allclose(loaded.quaternion, quaternion, rtol=1e-14, atol=0)
+    assert len(loaded) == 5 and loaded.position.flags["C_CONTIGUOUS"]
+
+
+def test_uniform_step_of_epoch_time():
+    t, _, _ = circle()
+
+    assert abs(kinematics.uniform_step(t) - 0.01) < 1e-9
+    assert kinematics.uniform_step(np.array([0.0, 1.0, 3.0])) is None
+    assert kinematics.uniform_step(np.array([1.0])) is None
+
+
+def test_speed_and_acceleration_of_a_circle():
+    t, position, _ = circle()
+
+    speed = kinematics.speed(position, t)
+    acceleration = kinematics.acceleration(position, t)
+
+    # |v| = 1 a dostredive |a| = 1 uvnitr, okraje maji jednostranne diference
+    assert np.allclose(speed[2:-2], 1.0, atol=1e-4)
+    assert np.allclose(kinematics.norm(acceleration[2:-2]), 1.0, atol=1e-3)
+    # stejny vysledek i pres obecny vzorec s nerovnomernym casem
+    assert np.allclose(kinematics.derivative(position, t), kinematics.velocity(position, t), atol=1e-6)
+
+
+def test_path_length():
+    _, position, _ = circle()
+
+    cumulative = kinematics.path_length(position, cumulative=True)
+
+    assert abs(kinematics.path_length(position) - 20.0) < 1e-3
+    assert cumulative[0] == 0.0 and abs(cumulative[-1] - kinematics.path_length(position)) < 1e-12
+
+
+def test_quaternion_sign_flip_is_removed():
+    _, _, quaternion = circle(50)
+    flipped = quaternion.copy()
+    flipped[20:] *= -1
+    flipped[5] *= 2
+
+    normalized = kinematics.normalize_quaternions(flipped)
+
+    assert np.allclose(kinematics.norm(normalized), 1.0)
+    assert np.allclose(normalized, quaternion)
+
+
+def test_angular_velocity_about_z():
+    t, _, quaternion = circle()
+
+    body = kinematics.angular_velocity(quaternion, t)
+    world = kinematics.angular_velocity(quaternion, t, body_frame=False)
+
+    assert np.allclose(body[1:-1], [0.0, 0.0, 1.0], atol=1e-4)
+    assert np.allclose(world[1:-1], [0.0, 0.0, 1.0], atol=1e-4)
+
+
+def test_quaternion_product_with_conjugate_is_identity():
+    _, _, quaternion = circle(10)
+
+    product = kinematics.quaternion_multiply(quaternion, kinematics.quaternion_conjugate(quaternion))
+
+    assert np.allclose(product, [0.0, 0.0, 0.0, 1.0])
+
+
+def test_resample_trajectory():
+    t, position, quaternion = circle(101)
+
+    resampled = kinematics.resample_trajectory(trajectory.Trajectory(t, position, quaternion), 0.025)
+
+    assert len(resampled) == 40
+    assert np.allclose(np.diff(resampled.time), 0.025, atol=1e-6)
+    angle = resampled.time - t[0]
+    assert np.allclose(resampled.position[:, 0], np.cos(angle), atol=1e-4)
+    assert np.allclose(kinematics.norm(resampled.quaternion), 1.0)
+
+
+def test_summary_keys_and_shapes():
+    t, position, quaternion = circle(100)
+
+    result = kinematics.summary(trajectory.Trajectory(t, position, quaternion))
+
+    assert result["velocity"].shape == result["jerk"].shape == (100, 3)
+    assert result["speed"].shape == result["path_length"].shape == (100,)
+    assert result["angular_velocity"].shape == (100, 3)
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+import dataset_registry
+import tool_wear_features
+
+
+def segments_frame() -> pd.DataFrame:
+    """ Three segments: Prep/1 (2 rows), Prep/2 (3 rows), Layer 1 Up/2 (1 row) """
+    return pd.DataFrame({
+        "Machining_Process": pd.Categorical(["Prep", "Prep", "Prep", "Prep", "Prep", "Layer 1 Up"]),
+        "M1_sequence_number": [1.0, 1.0, 2.0, 2.0, 2.0, 2.0],
+        "M1_CURRENT_PROGRAM_NUMBER": [1.0] * 6,
+        "X1_Pos": [3.0, -4.0, 1.0, 1.0, 1.0, 2.0],
+        "X1_CommandPosition": [3.0, -3.0, 1.0, 1.0, 2.0, 2.0],
+        "X1_OutputPower": [10.0, 10.0, 1.0, 2.0, 3.0, 0.0],
+    })
+
+
+def test_segment_starts():
+    assert tool_wear_features.segment_starts(segments_frame()).tolist() == [0, 2, 5]
+    assert tool_wear_features.segment_starts(segments_frame().head(1)).tolist() == [0]
+
+
+def test_features_of_segments():
+    features = tool_wear_features.extract_features(segments_frame(), "experiment_99")
+
+    assert features["segment"].tolist() == [0, 1, 2]
+    assert features["process"].tolist() == ["Prep", "Prep", "Layer 1 Up"]
+    assert features["sequence_number"].tolist() == [1, 2, 2]
+    assert features["rows"].tolist() == [2, 3, 1]
+    assert np.allclose(features["duration_s"], [0.2, 0.3, 0.1])
+    assert np.allclose(features["X1_Pos_rms"], [np.sqrt(12.5), 1.0, 2.0])
+    assert np.allclose(features["X1_Pos_peak"], [4.0, 1.0, 2.0])
+    assert np.allclose(features["X1_Pos_crest"], [4.0 / np.sqrt(12.5), 1.0, 1.0])
+    assert np.allclose(features["X1_energy"], [2.0, 0.6, 0.0])
+    assert np.allclose(features["X1_pos_error_max"], [1.0, 1.0, 0.0])
+    assert features["X1_Pos_rms"].dtype == np.float32
+    assert set(features["experiment"]) == {"experiment_99"}
+
+
+def test_empty_experiment_gives_empty_table():
+    data = dataset_registry.load("cnc_mill_tool_wear", use_cache=False)
+
+    empty = tool_wear_features.extract_features(data.head(0), "experiment_01")
+    full = tool_wear_features.extract_features(data, "experiment_01")
+
+    assert len(tool_wear_features.segment_starts(data.head(0))) == 0
+    assert len(empty) == 0
+    assert list(empty.columns) == list(full.columns)
+
+
+def test_features_of_the_dataset():
+    data = dataset_registry.load("cnc_mill_tool_wear", use_cache=False)
+
+    features = tool_wear_features.extract_features(data, "experiment_01")
+
+    assert features["rows"].sum() == len(data)
+    assert (features["start_row"].diff().dropna() > 0).all()
+    assert "S1_pos_error_rms" in features.columns and "Z1_vel_error_max" in features.columns
+
+
+def test_extract_all_writes_one_table_per_experiment(tmp_path):
+    source = dataset_registry.dataset_path("cnc_mill_tool_wear")
+    for name in ("experiment_01.csv", "experiment_02.csv"):
+        pd.read_csv(source).head(200).to_csv(tmp_path / name, index=False)
+
+    table = tool_wear_features.extract_all(str(tmp_path / "experiment_*.csv"), workers=2)
+    written = tool_wear_features.extract_all(str(tmp_path / "experiment_*.csv"), str(tmp_path / "out"), workers=2)
+
+    assert set(table["experiment"]) == {"experiment_01", "experiment_02"}
+    assert table.groupby("experiment", observed=True)["rows"].sum().tolist() == [200, 200]
+    assert sorted(map(str, written)) == [str(tmp_path / "out" / f"experiment_0{i}_features.csv") for i in (1, 2)]
+    assert tool_wear_features.extract_all(str(tmp_path / "none_*.csv")).empty
@@ -0,0 +1,169 @@
+# Feature extraction of the CNC tool-wear experiments (datasets/cnc_mill_tool_wear)
+# Experiment se rozdeli na useky se stejnym Machining_Process a M1_sequence_number,
+# pro kazdy usek a kazdy kanal se features spocitaji jednim reduceat nad celou matici kanalu.
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import dataset_registry
+
+DATASET = "cnc_mill_tool_wear"
+# Vzorkovaci perioda experimentu v sekundach (data jsou po 100 ms)
+SAMPLE_PERIOD = 0.1
+
+AXES = ["X1", "Y1", "Z1", "S1"]
+SEGMENT_COLUMNS = ["Machining_Process", "M1_sequence_number"]
+# Sloupce, ktere nejsou mereny signal
+META_COLUMNS = SEGMENT_COLUMNS + ["M1_CURRENT_PROGRAM_NUMBER"]
+
+
+def actual_column(data: pd.DataFrame, axis: str, quantity: str) -> str | None:
+    """
+    Name of the actual position/velocity column of an axis, X1-Z1 are renamed in the registry (X1_Pos),
+    S1 keeps the original name (S1_ActualPosition)
+    :param quantity: "Position" or "Velocity"
+    """
+    short = {"Position": "Pos", "Velocity": "Speed"}[quantity]
+    for name in (f"{axis}_{short}", f"{axis}_Actual{quantity}"):
+        if name in data.columns:
+            return name
+    return None
+
+
+def segment_starts(data: pd.DataFrame) -> np.ndarray:
+    """ Row indices where a new segment (change of process or sequence number) starts, empty for no rows """
+    change = np.zeros(len(data), dtype=bool)
+    change[:1] = True
+    for name in SEGMENT_COLUMNS:
+        values = data[name].to_numpy()
+        change[1:] |= values[1:] != values[:-1]
+    return np.flatnonzero(change)
+
+
+def _rms_peak(signals: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ RMS and peak (max |x|) of every segment and column of a (rows, channels) matrix """
+    rms = np.sqrt(np.add.reduceat(signals * signals, starts, axis=0) / counts[:, None])
+    peak = np.maximum.reduceat(np.abs(signals), starts, axis=0)
+    return rms, peak
+
+
+def extract_features(data: pd.DataFrame, experiment: str = "") -> pd.DataFrame:
+    """
+    Per-segment features of one experiment
+    :param data: Experiment loaded by dataset_registry (renamed columns)
+    :param experiment: Name stored in the experiment column
+    :return: One row per segment: RMS, peak and crest factor of every channel, energy from
+             <axis>_OutputPower and command-vs-actual position/velocity tracking errors, as float32
+    """
+    starts = segment_starts(data)
+    counts = np.diff(np.append(starts, len(data)))
+
+    channels = [name for name in data.columns if name not in META_COLUMNS]
+    signals = data[channels].to_numpy(dtype=np.float64)
+    rms, peak = _rms_peak(signals, starts, counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crest = np.where(rms > 0, peak / rms, 0.0)
+
+    columns = {}
+    for i, name in enumerate(channels):
+        columns[f"{name}_rms"] = rms[:, i]
+        columns[f"{name}_peak"] = peak[:, i]
+        columns[f"{name}_crest"] = crest[:, i]
+
+    # energie useku: soucet vykonu krat perioda vzorkovani
+    power = [f"{axis}_OutputPower" for axis in AXES if f"{axis}_OutputPower" in data.columns]
+    if power:
+        energy = np.add.reduceat(data[power].to_numpy(dtype=np.float64), starts, axis=0) * SAMPLE_PERIOD
+        for i, name in enumerate(power):
+            columns[f"{name.split('_')[0]}_energy"] = energy[:, i]
+
+    # chyba sledovani: prikazana minus skutecna poloha/rychlost, vsechny osy v jedne matici
+    errors, names = [], []
+    for axis in AXES:
+        for quantity, short in (("Position", "pos"), ("Velocity", "vel")):
+            actual = actual_column(data, axis, quantity)
+            command = f"{axis}_Command{quantity}"
+            if actual is not None and command in data.columns:
+                errors.append(data[command].to_numpy(dtype=np.float64) - data[actual].to_numpy(dtype=np.float64))
+                names.append(f"{axis}_{short}_error")
+    if errors:
+        error_rms, error_peak = _rms_peak(np.column_stack(errors), starts, counts)
+        for i, name in enumerate(names):
+            columns[f"{name}_rms"] = error_rms[:, i]
+            columns[f"{name}_max"] = error_peak[:, i]
+
+    features = pd.DataFrame({name: values.astype(np.float32) for name, values in columns.items()})
+    meta = pd.DataFrame({
+        "experiment": pd.Categorical([experiment] * len(starts)),
+        "segment": np.arange(len(starts), dtype=np.int32),
+        "process": data["Machining_Process"].to_numpy()[starts],
+        "sequence_number": data["M1_sequence_number"].to_numpy()[starts].astype(np.int32),
+        "start_row": starts.astype(np.int32),
+        "rows": counts.astype(np.int32),
+        "duration_s": (counts * SAMPLE_PERIOD).astype(np.float32),
+    })
+    meta["process"] = meta["process"].astype("category")
+    return pd.concat([meta, features], axis=1)
+
+
+def experiment_features(path: str, out_dir: str | None = None, use_cache: bool = False):
+    """
+    Worker: load one experiment file and extract its features
+    :param path: CSV file of an experiment
+    :param out_dir: If given, the table is written to <out_dir>/<experiment>_features.csv and only the path is returned
+    :param use_cache: Store the experiment in the binary cache of dataset_registry (disk space for hundreds of files)
+    :return: Feature table or the path of the written file
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    data = dataset_registry.load_file(DATASET, path, use_cache=use_cache)
+    features = extract_features(data, name)
+    if out_dir is None:
+        return features
+    out_path = os.path.join(out_dir, f"{name}_features.csv")
+    features.to_csv(out_path, index=False)
+    return out_path
+
+
+def extract_all(pattern: str | None = None, out_dir: str | None = None, workers: int | None = None, use_cache: bool = False):
+    """
+    Features of all experiments in parallel.
+    Kazdy proces drzi v pameti jen jeden experiment, pamet je tedy zhruba workers x jeden soubor.
+    :param pattern: Glob of the experiments, default experiment_*.csv next to the registered dataset
+    :param out_dir: Write one feature table per experiment and return their paths, None = return one DataFrame
+    :param workers: Number of processes, None = number of CPUs
+    :param use_cache: See experiment_features
+    :return: Concatenated feature table or list of written files
+    """
+    if pattern is None:
+        pattern = os.path.join(os.path.dirname(dataset_registry.dataset_path(DATASET)), "experiment_*.csv")
+    files = sorted(glob.glob(pattern))
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+
+    if len(files) <= 1:
+        results = [experiment_features(path, out_dir, use_cache) for path in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(experiment_features, files, [out_dir] * len(files), [use_cache] * len(files)))
+
+    if out_dir is not None:
+        return results
+    if not results:
+        return pd.DataFrame()
+    table = pd.concat(results, ignore_index=True)
+    table["experiment"] = table["experiment"].astype("category")
+    table["process"] = table["process"].astype("category")
+    return table
+
+
+if __name__ == "__main__":
+    data = dataset_registry.load(DATASET)
+    start = time.perf_counter()
+    table = extract_features(data, "experiment_01")
+    print(f"{len(data)} rows -> {table.shape[0]} segments x {table.shape[1]} columns "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms, {table.memory_usage(deep=True).sum() / 1e3:.0f} kB")
+    print(table.iloc[:5, :12])
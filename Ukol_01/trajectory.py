@@ -0,0 +1,60 @@
+# Loader of the robot IMU trajectories (datasets/robot_imu_comparison)
+# Hlavicka "#,time[sec],x,...,qw" ma o sloupec navic: radky nemaji cislo radku, ale konci carkou.
+# Nazvy jsou tak proti hodnotam posunute o jeden sloupec: "#" nese cas, "time[sec]" souradnici x,
+# "x" ve skutecnosti y, "y" z a "z" qx - puvodni graf z pd.read_csv ukazoval (y, z, qx) misto (x, y, z).
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Nazvy sloupcu v poradi hodnot v radku
+COLUMNS = ["time", "x", "y", "z", "qx", "qy", "qz", "qw"]
+
+
+@dataclass
+class Trajectory:
+    """ Trajectory as contiguous float64 arrays """
+    time: np.ndarray          # (N,) s
+    position: np.ndarray      # (N, 3) x, y, z
+    quaternion: np.ndarray    # (N, 4) qx, qy, qz, qw
+
+    def __len__(self):
+        return len(self.time)
+
+
+def _header_names(path: str) -> list[str]:
+    """ Column names of the file, the placeholder '#' of a row number which is not in the rows is dropped """
+    with open(path, "r", encoding="utf-8") as f:
+        header = f.readline().strip().split(",")
+        first_row = f.readline().rstrip("\r\n").split(",")
+    if header[0] == "#" and first_row[-1] == "" and len(first_row) == len(header):
+        header = header[1:]
+    return header
+
+
+def read_trajectory_csv(path: str) -> pd.DataFrame:
+    """
+    Parse the trajectory CSV with the header aligned to the values
+    :param path: Path to the CSV file
+    :return: DataFrame with the columns time, x, y, z, qx, qy, qz, qw (float64)
+    """
+    names = _header_names(path)
+    if len(names) != len(COLUMNS):
+        raise ValueError(f"Unexpected header of {path}: {names}")
+    # prazdny sloupec za koncovou carkou se nenacita
+    data = pd.read_csv(path, skiprows=1, header=None, usecols=range(len(COLUMNS)), names=COLUMNS, dtype=np.float64)
+    return data
+
+
+def from_frame(data: pd.DataFrame) -> Trajectory:
+    """ DataFrame with the COLUMNS -> Trajectory of contiguous arrays """
+    return Trajectory(
+        time=np.ascontiguousarray(data["time"].to_numpy(dtype=np.float64)),
+        position=np.ascontiguousarray(data[["x", "y", "z"]].to_numpy(dtype=np.float64)),
+        quaternion=np.ascontiguousarray(data[["qx", "qy", "qz", "qw"]].to_numpy(dtype=np.float64)),
+    )
+
+
+def load_trajectory(path: str) -> Trajectory:
+    """ Parse a trajectory CSV directly into arrays """
+    return from_frame(read_trajectory_csv(path))
@@ -1,61 +1,179 @@
-# CSU_API.py 
+# CSU_API.py
 # Knihovna pro práci s Českým statistickým úřadem (ČSÚ) API
-import requests
 import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-BASE = "https://data.csu.gov.cz/api"
+import requests
+from requests.adapters import HTTPAdapter
 
-def get_sady():
-    url = f"{BASE}/katalog/v1/sady"
-    resp = requests.get(url)
+BASE = os.getenv("CSU_BASE", "https://data.csu.gov.cz/api")
+
+CATALOG_CACHE_DIR = os.getenv("CSU_CACHE_DIR", ".csu_cache")   # katalog sad a vyberu na disku
+DOWNLOAD_WORKERS = 8                                           # soubezna stahovani vyberu
+CHUNK_SIZE = 64 * 1024                                         # CSV se zapisuje po castech, nikdy cele v pameti
+TIMEOUT = 30
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """ Jedna sdilena session s poolem spojeni pro katalog i stahovani """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=DOWNLOAD_WORKERS)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+    return _session
+
+
+def get_catalog(name: str, cache_dir: str = CATALOG_CACHE_DIR):
+    """
+    Katalog (sady, vybery) s cache na disku.
+    Ulozena kopie se overi pres If-None-Match / If-Modified-Since, pri 304 se katalog znovu nestahuje.
+    :param name: "sady" nebo "vybery"
+    :param cache_dir: Adresar cache
+    :return: JSON katalogu
+    """
+    body_path = os.path.join(cache_dir, f"{name}.json")
+    meta_path = os.path.join(cache_dir, f"{name}.meta.json")
+    headers = {}
+    meta = {}
+    if os.path.exists(body_path) and os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    resp = get_session().get(f"{BASE}/katalog/v1/{name}", headers=headers, timeout=TIMEOUT)
+    if resp.status_code == 304:
+        with open(body_path, "r", encoding="utf-8") as f:
+            return json.load(f)
     resp.raise_for_status()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(body_path + ".tmp", "wb") as f:
+        f.write(resp.content)
+    os.replace(body_path + ".tmp", body_path)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}, f)
     return resp.json()
 
+
+def get_sady():
+    return get_catalog("sady")
+
 def get_vybery():
-    url = f"{BASE}/katalog/v1/vybery"
-    resp = requests.get(url)
-    resp.raise_for_status()
-    return resp.json()
+    return get_catalog("vybery")
+
+def index_vyberu(vybery) -> dict[str, list]:
+    """ Kod sady -> jeji vybery, jeden pruchod katalogem misto filtrovani pro kazdou sadu """
+    index = {}
+    for v in vybery:
+        index.setdefault(v["sada"]["kod"], []).append(v)
+    return index
 
 def get_data_from_vyber_json(kod_vyber):
     url = f"{BASE}/dotaz/v1/data/vybery/{kod_vyber}"
     #params = {"format": fmt}
-    resp = requests.get(url)
+    resp = get_session().get(url, timeout=TIMEOUT)
     resp.raise_for_status()
     return resp.json()
 
 def get_data_from_vyber_csv(kod_vyber):
     url = f"{BASE}/dotaz/v1/data/vybery/{kod_vyber}?format=CSV"
-    resp = requests.get(url)
+    resp = get_session().get(url, timeout=TIMEOUT)
     resp.raise_for_status()
     return resp.content.decode("utf-8")
 
+def safe_file_name(name: str) -> str:
+    """ Nazev vyberu jako nazev souboru, bez znaku nepovolenych ve Windows i Linuxu """
+    return re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", name).strip(" .") or "vyber"
+
+def download_vyber_csv(kod_vyber: str, path: str) -> int:
+    """
+    Stahne CSV vyberu rovnou na disk po CHUNK_SIZE, soubor se objevi az kompletni
+    :param kod_vyber: Kod vyberu
+    :param path: Cilovy soubor
+    :return: Pocet zapsanych bajtu
+    """
+    url = f"{BASE}/dotaz/v1/data/vybery/{kod_vyber}"
+    size = 0
+    tmp_path = path + ".part"
+    with get_session().get(url, params={"format": "CSV"}, stream=True, timeout=TIMEOUT) as resp:
+        resp.raise_for_status()
+        with open(tmp_path, "wb") as f:
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                size += len(chunk)
+    os.replace(tmp_path, path)
+    return size
+
+def vyber_file_name(v: dict) -> str:
+    """ Soubor vyberu <nazev>_<kod>.csv, nazvy vyberu nejsou jedinecne, kod ano """
+    return f"{safe_file_name(v['vyber']['nazev'])}_{safe_file_name(v['vyber']['kod'])}.csv"
+
+def download_vybery(vybery: list, out_dir: str = ".", workers: int = DOWNLOAD_WORKERS) -> dict:
+    """
+    Stahne vice vyberu soubezne, kazdy vyber jen jednou i kdyz je v seznamu vickrat
+    :param vybery: Polozky katalogu vyberu
+    :param out_dir: Adresar pro CSV soubory (<nazev vyberu>_<kod vyberu>.csv)
+    :param workers: Maximalni pocet soubeznych stahovani
+    :return: Kod vyberu -> cesta k souboru, nebo vyjimka pri chybe
+    """
+    unique = {v["vyber"]["kod"]: v for v in vybery}
+    os.makedirs(out_dir, exist_ok=True)
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for kod, v in unique.items():
+            path = os.path.join(out_dir, vyber_file_name(v))
+            futures[pool.submit(download_vyber_csv, kod, path)] = (kod, path)
+        for future in as_completed(futures):
+            kod, path = futures[future]
+            try:
+                size = future.result()
+                results[kod] = path
+                print(f"Data uložena do souboru: {path} ({size} B)")
+            except Exception as e:
+                results[kod] = e
+                print(f"Stažení výběru {kod} selhalo: {e}")
+    return results
+
 # Klicove slovo pro hledani v sadach
 klicovoe_slovo = "podniky"
 
 # --- Příklad použití  a ulozeni do csv souboru ---:
 if __name__ == "__main__":
+    start = time.perf_counter()
     sady = get_sady()
     if sady:
+        # katalog vyberu se stahne (nebo overi v cache) jen jednou pro vsechny sady
+        vybery_podle_sady = index_vyberu(get_vybery())
+        ke_stazeni = []
         for sada in sady:  # vypíše všechny sady
             kod_sady = sada["kod"]
             if klicovoe_slovo.lower() in sada["nazev"].lower(): # hledani podle klicoveho slova v nazvu sady
                 print(f"Vybraná sada: {kod_sady} – {sada['nazev']}")
-                vybery = get_vybery()
-                vybery_pro_sadu = [v for v in vybery if v["sada"]["kod"] == kod_sady]
-                print(vybery_pro_sadu)
+                vybery_pro_sadu = vybery_podle_sady.get(kod_sady, [])
 
                 if vybery_pro_sadu:
-                    for v in vybery_pro_sadu : # vypíše všechny výběry pro danou sadu 
+                    for v in vybery_pro_sadu : # vypíše všechny výběry pro danou sadu
                         print(f"  Výběr: {v['vyber']['kod']} – {v['vyber']['nazev']}")
-                        kod_vyberu = v["vyber"]["kod"]
-                        data = get_data_from_vyber_csv(kod_vyberu)
-                        nazev = v["vyber"]["nazev"]
-                        print(f"Kod vyberu: {kod_vyberu} Nazev: {nazev}")
-                        with open(nazev+".csv", "w", encoding="utf-8") as f:
-                            f.write(data)
-                        print(f"Data uložena do souboru: {nazev}.csv")
+                    ke_stazeni.extend(vybery_pro_sadu)
                 else:
                     print("Pro tuto sadu neexistuje žádný předdefinovaný výběr.")
+
+        vysledky = download_vybery(ke_stazeni)
+        ok = sum(1 for r in vysledky.values() if not isinstance(r, Exception))
+        print(f"Staženo {ok} z {len(vysledky)} výběrů za {time.perf_counter() - start:.2f} s")
     else:
         print("Žádné sady nebyly nalezeny.")
@@ -1,21 +1,69 @@
 # Získejte data pomocí veřejné API a zobrazte je pomocí Plotly nebo Seaborn a uložte data do souboru csv.
 import requests
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import openmeteo_requests
 import pandas as pd 
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import requests_cache   
-from retry_requests import retry  
+from urllib3.util.retry import Retry
 
-path_to_saved_csv =  r"datasets\weather_data\weather_forecast.csv"
+path_to_saved_csv =  os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "datasets", "weather_data", "weather_forecast.csv")
+
+# Adresy API, lze prepsat napr. na lokalni stub server pro testy
+FORECAST_URL = os.getenv("FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+IP_URL = os.getenv("IP_URL", "https://api.ipify.org/?format=json")
+GEO_URL = os.getenv("GEO_URL", "http://ip-api.com")
+
+HOURLY_VARIABLES = ["temperature_2m", "relative_humidity_2m", "precipitation_probability", "apparent_temperature"]
+SITES_PER_REQUEST = 50      # lokaci v jednom pozadavku Open-Meteo (latitude=a,b,...&longitude=c,d,...)
+FETCH_WORKERS = 4           # soubezne pozadavky, kdyz je lokaci vic nez SITES_PER_REQUEST
+
+# Persistentni cache: predpoved 1 h, verejna IP 1 h, lokace IP 1 den
+CACHE_PATH = os.getenv("WEATHER_CACHE", ".cache")
+CACHE_EXPIRE = {
+    "api.open-meteo.com": 3600,
+    "api.ipify.org": 3600,
+    "ip-api.com": 24 * 3600,
+}
+
+_session = None
+_openmeteo = None
+
+
+def get_session():
+    """Jedna sdilena session s persistentni cache, retry a poolem spojeni pro vsechny pozadavky."""
+    global _session
+    if _session is None:
+        cache_session = requests_cache.CachedSession(
+            CACHE_PATH, expire_after=3600, urls_expire_after=CACHE_EXPIRE,
+            allowable_methods=("GET", "POST"),
+        )
+        # Jeden adapter pro pool i opakovani, druhy mount by pool prepsal
+        retries = Retry(total=5, read=5, connect=5, backoff_factor=0.2,
+                        status_forcelist=(500, 502, 504), allowed_methods=None)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=FETCH_WORKERS * 2, max_retries=retries)
+        cache_session.mount("https://", adapter)
+        cache_session.mount("http://", adapter)
+        _session = cache_session
+    return _session
+
+
+def get_openmeteo_client():
+    """Open-Meteo klient nad sdilenou session, vytvori se jen jednou."""
+    global _openmeteo
+    if _openmeteo is None:
+        _openmeteo = openmeteo_requests.Client(session = get_session())
+    return _openmeteo
 
 # Ziska verejnou adresu IP:
 def get_ip_address(host_name):
     "Získá IP adresu z veřejného API "
-    host_name_url = "api.ipify.org"
     try:
-        response = requests.get(f"https://{host_name_url}/?format=json")
+        response = get_session().get(IP_URL, timeout=5)
         if response.status_code == 200:
             data = response.json()
             return data['ip']
@@ -30,7 +78,7 @@ def get_ip_address(host_name):
 def get_location_data(ip_address: str, format: str) :
     "Získá lokaci IP adresy z veřejného API "
     try:
-        response = requests.get(f"http://ip-api.com/{format}/{ip_address}", timeout=5)  
+        response = get_session().get(f"{GEO_URL}/{format}/{ip_address}", timeout=5)
         if response.status_code == 200:
             if format == "json":
                 return response.json() # JSON data jako slovník
@@ -55,6 +103,64 @@ def get_lat_lon(location_data: dict) -> tuple[float, float]:
         return (None, None) 
 
 
+def _hourly_long(response, site: int, variables: list[str]) -> pd.DataFrame:
+    """Jedna lokace v dlouhem formatu (site, date, variable, value), hodnoty se kopiruji jen jednou do vysledku."""
+    hourly = response.Hourly()
+    dates = pd.date_range(
+        start = pd.to_datetime(hourly.Time(), unit = "s", utc = True),
+        end = pd.to_datetime(hourly.TimeEnd(), unit = "s", utc = True),
+        freq = pd.Timedelta(seconds = hourly.Interval()),
+        inclusive = "left"
+    )
+    steps = len(dates)
+    # Poradi promennych odpovida poradi v pozadavku
+    values = np.empty(steps * len(variables), dtype=np.float32)
+    for i in range(len(variables)):
+        values[i * steps:(i + 1) * steps] = hourly.Variables(i).ValuesAsNumpy()
+
+    return pd.DataFrame({
+        "site": np.full(len(values), site, dtype=np.int32),
+        "latitude": np.full(len(values), response.Latitude(), dtype=np.float32),
+        "longitude": np.full(len(values), response.Longitude(), dtype=np.float32),
+        "date": dates.take(np.tile(np.arange(steps), len(variables))),
+        "variable": pd.Categorical.from_codes(np.repeat(np.arange(len(variables)), steps), categories=variables),
+        "value": values,
+    })
+
+
+def fetch_weather(sites: list[tuple[float, float]], variables: list[str] = HOURLY_VARIABLES, url: str = FORECAST_URL) -> pd.DataFrame:
+    """
+    Hodinova predpoved pro vice lokaci.
+    Lokace se posilaji po SITES_PER_REQUEST v jednom pozadavku (Open-Meteo vraci odpoved pro kazdou
+    lokaci ve stejnem poradi), vice takovych davek bezi soubezne nad sdilenou session.
+    :param sites: Seznam (lat, lon)
+    :param variables: Hodinove promenne Open-Meteo
+    :param url: Adresa forecast API
+    :return: Dlouhy DataFrame se sloupci site (index v sites), latitude, longitude, date, variable, value
+    """
+    if not sites:
+        return pd.DataFrame(columns=["site", "latitude", "longitude", "date", "variable", "value"])
+    openmeteo = get_openmeteo_client()
+    chunks = [list(range(start, min(start + SITES_PER_REQUEST, len(sites)))) for start in range(0, len(sites), SITES_PER_REQUEST)]
+
+    def fetch(chunk):
+        params = {
+            "latitude": ",".join(str(sites[i][0]) for i in chunk),
+            "longitude": ",".join(str(sites[i][1]) for i in chunk),
+            "hourly": variables,
+        }
+        # POST: dlouhy seznam souradnic se nevejde do URL
+        responses = openmeteo.weather_api(url, params=params, method="POST")
+        return [_hourly_long(response, site, variables) for site, response in zip(chunk, responses)]
+
+    if len(chunks) == 1:
+        frames = fetch(chunks[0])
+    else:
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            frames = [frame for result in pool.map(fetch, chunks) for frame in result]
+    return pd.concat(frames, ignore_index=True)
+
+
 # Ziska data o pocasi meteo API pomoci ziskane zemepisne sirky a delky
 def get_weather_data(lat: float, lon: float) -> pd.DataFrame:
     "Získá data o počasí z Open-Meteo API"
@@ -62,53 +168,19 @@ def get_weather_data(lat: float, lon: float) -> pd.DataFrame:
         print("Chyba: Neplatná zeměpisná šířka nebo délka.")
         return None
     else:
-        # Setup the Open-Meteo API client with cache and retry on error
-        cache_session = requests_cache.CachedSession('.cache', expire_after = 3600)
-        retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
-        openmeteo = openmeteo_requests.Client(session = retry_session)
-
-        # Make sure all required weather variables are listed here
-        # The order of variables in hourly or daily is important to assign them correctly below
-        url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "hourly": ["temperature_2m", "relative_humidity_2m", "precipitation_probability", "apparent_temperature"],
-        }
-        responses = openmeteo.weather_api(url, params=params)
-
-        # Process first location. Add a for-loop for multiple locations or weather models
-        response = responses[0]
-        print(f"Coordinates: {response.Latitude()}°N {response.Longitude()}°E")
-        print(f"Elevation: {response.Elevation()} m asl")
-        print(f"Timezone difference to GMT+0: {response.UtcOffsetSeconds()}s")
-
-        # Process hourly data. The order of variables needs to be the same as requested.
-        hourly = response.Hourly()
-        hourly_temperature_2m = hourly.Variables(0).ValuesAsNumpy()
-        hourly_relative_humidity_2m = hourly.Variables(1).ValuesAsNumpy()
-        hourly_precipitation_probability = hourly.Variables(2).ValuesAsNumpy()
-        hourly_apparent_temperature = hourly.Variables(3).ValuesAsNumpy()
-
-        hourly_data = {"date": pd.date_range(
-            start = pd.to_datetime(hourly.Time(), unit = "s", utc = True),
-            end = pd.to_datetime(hourly.TimeEnd(), unit = "s", utc = True),
-            freq = pd.Timedelta(seconds = hourly.Interval()),
-            inclusive = "left"
-        )}
-
-        hourly_data["temperature_2m"] = hourly_temperature_2m
-        hourly_data["relative_humidity_2m"] = hourly_relative_humidity_2m
-        hourly_data["precipitation_probability"] = hourly_precipitation_probability
-        hourly_data["apparent_temperature"] = hourly_apparent_temperature
-
-        hourly_dataframe = pd.DataFrame(data = hourly_data)
+        # Jedna lokace pres fetch_weather, vysledek ve sirokem formatu (sloupec na promennou) jako driv
+        long_data = fetch_weather([(lat, lon)])
+        print(f"Coordinates: {long_data['latitude'].iloc[0]}°N {long_data['longitude'].iloc[0]}°E")
+        hourly_dataframe = long_data.pivot(index="date", columns="variable", values="value")
+        hourly_dataframe = hourly_dataframe[HOURLY_VARIABLES].reset_index()
+        hourly_dataframe.columns.name = None
         # print("\nHourly data\n", hourly_dataframe)
         return hourly_dataframe
 
 
 def main():
     print("Získávání IP adresy pomocí veřejného API...")
+    predpoved = None
 
     #Ziskej verejnou IP adresu
     ip_address = get_ip_address("api.ipify.org")
@@ -0,0 +1,362 @@
+# Serial acquisition for the Arduino link: reader thread, ring buffer, write queue and batched hand-off
+# Misto smycky "while True: if in_waiting" blokujici cteni ve vlastnim vlakne, CPU ceka v jadru, ne ve smycce.
+import importlib.util
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import serial
+
+PORT = os.getenv("SERIAL_PORT", "COM4")          # napr. "COM4", "/dev/ttyACM0" nebo "loop://"
+BAUDRATE = int(os.getenv("SERIAL_BAUDRATE", 9600))
+READ_SIZE = 4096                                 # max. bajtu jednoho cteni
+READ_TIMEOUT = 0.1                               # s, jak dlouho cteni ceka na prvni bajt
+
+logger = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """ Preallocated (capacity, channels) ring of samples with their receive times """
+
+    def __init__(self, capacity: int, channels: int, dtype=np.float64):
+        self.capacity = capacity
+        self.values = np.zeros((capacity, channels), dtype=dtype)
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.written = 0        # celkovy pocet zapsanych vzorku
+        self.read = 0           # celkovy pocet vzorku predanych pres drain()
+        self.overruns = 0       # vzorky prepsane driv, nez si je drain() vyzvedl
+        self._lock = threading.Lock()
+
+    def write(self, values: np.ndarray, times: np.ndarray | float):
+        """
+        Append a block of samples, the oldest unread samples are overwritten when full
+        :param values: (n, channels) samples
+        :param times: Receive time of every sample, or one time for the whole block
+        """
+        n = len(values)
+        if n == 0:
+            return
+        times = np.broadcast_to(np.asarray(times, dtype=np.float64), (n,))
+        if n > self.capacity:
+            values, times = values[-self.capacity:], times[-self.capacity:]
+        with self._lock:
+            # z prilis velkeho bloku se zapise jen konec, ten patri na pozice poslednich count vzorku
+            count = len(values)
+            start = (self.written + n - count) % self.capacity
+            first = min(count, self.capacity - start)
+            self.values[start:start + first] = values[:first]
+            self.values[:count - first] = values[first:]
+            self.times[start:start + first] = times[:first]
+            self.times[:count - first] = times[first:]
+            self.written += n
+            lost = self.written - self.read - self.capacity
+            if lost > 0:
+                self.overruns += lost
+                self.read += lost
+
+    def drain(self, max_samples: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """ Samples not yet drained, oldest first, as copies (times, values) """
+        with self._lock:
+            available = self.written - self.read
+            if max_samples is not None:
+                available = min(available, max_samples)
+            index = (self.read + np.arange(available)) % self.capacity
+            self.read += available
+            return self.times[index], self.values[index]
+
+    def latest(self, n: int) -> tuple[np.ndarray, np.ndarray]:
+        """ Last n samples (e.g. for a live plot), drained or not """
+        with self._lock:
+            n = min(n, self.written, self.capacity)
+            index = (self.written - n + np.arange(n)) % self.capacity
+            return self.times[index], self.values[index]
+
+
+class LineParser:
+    """ Text lines "v1,v2,...\\n" -> (n, channels) float array """
+
+    def __init__(self, channels: int, delimiter: bytes = b","):
+        self.channels = channels
+        self.delimiter = delimiter
+        self.remainder = b""
+        self.dropped = 0
+
+    def feed(self, data: bytes) -> np.ndarray:
+        data = self.remainder + data
+        end = data.rfind(b"\n")
+        if end < 0:
+            self.remainder = data
+            return np.empty((0, self.channels))
+        self.remainder = data[end + 1:]
+        lines = data[:end].replace(b"\r", b"").split(b"\n")
+        good = [line for line in lines if line.count(self.delimiter) == self.channels - 1]
+        self.dropped += len(lines) - len(good)
+        if not good:
+            return np.empty((0, self.channels))
+        try:
+            # vsechny radky najednou, jedna konverze textu na cisla
+            return np.array(self.delimiter.join(good).split(self.delimiter)).astype(np.float64).reshape(-1, self.channels)
+        except ValueError:
+            # nektera hodnota neni cislo, prevod po radcich a vadne radky se zahodi
+            rows = []
+            for line in good:
+                try:
+                    rows.append(np.array(line.split(self.delimiter)).astype(np.float64))
+                except ValueError:
+                    self.dropped += 1
+            return np.array(rows).reshape(-1, self.channels)
+
+
+class FrameParser:
+    """
+    Binary frames: header, channels values of dtype, 1 byte checksum (sum of the payload bytes mod 256).
+    Hledani hlavicek a kontrola souctu bezi nad celym blokem najednou.
+    """
+
+    def __init__(self, channels: int, dtype: str = "<f4", header: bytes = b"\xaa\x55"):
+        self.channels = channels
+        self.header = np.frombuffer(header, dtype=np.uint8)
+        self.value_dtype = np.dtype(dtype)
+        self.payload_size = channels * self.value_dtype.itemsize
+        self.frame_size = len(header) + self.payload_size + 1
+        self.remainder = b""
+        self.dropped = 0
+
+    def encode(self, values) -> bytes:
+        """ One frame of values, for the device side and for tests """
+        payload = np.asarray(values, dtype=self.value_dtype).tobytes()
+        return self.header.tobytes() + payload + bytes([sum(payload) % 256])
+
+    def feed(self, data: bytes) -> np.ndarray:
+        data = self.remainder + data
+        raw = np.frombuffer(data, dtype=np.uint8)
+        h = len(self.header)
+        last_start = len(raw) - self.frame_size
+        if last_start < 0:
+            self.remainder = data
+            return np.empty((0, self.channels))
+
+        # kandidati: pozice, kde zacina hlavicka a cely ramec je uz v bufferu
+        starts = np.flatnonzero(raw[:last_start + 1] == self.header[0])
+        for i in range(1, h):
+            starts = starts[raw[starts + i] == self.header[i]]
+        payload = raw[(starts + h)[:, None] + np.arange(self.payload_size)]
+        checksum = raw[starts + h + self.payload_size]
+        valid = (payload.sum(axis=1, dtype=np.int64) % 256) == checksum
+        starts, payload = starts[valid], payload[valid]
+
+        # falesna hlavicka uvnitr platneho ramce: ramce se nesmi prekryvat
+        if len(starts) > 1 and (np.diff(starts) < self.frame_size).any():
+            keep, next_free = [], 0
+            for i, start in enumerate(starts):
+                if start >= next_free:
+                    keep.append(i)
+                    next_free = start + self.frame_size
+            starts, payload = starts[keep], payload[keep]
+
+        # bajty mezi ramci, ktere nejsou platny ramec, se pocitaji jako ztracene ramce
+        consumed = int(starts[-1]) + self.frame_size if len(starts) else max(last_start + 1, 0)
+        garbage = consumed - len(starts) * self.frame_size
+        self.dropped += -(-garbage // self.frame_size) if garbage > 0 else 0
+        self.remainder = data[consumed:]
+        return np.ascontiguousarray(payload).view(self.value_dtype).reshape(-1, self.channels).astype(np.float64)
+
+
+class SerialAcquisition:
+    """
+    One serial port shared by a reader thread, a writer thread with a command queue and an optional
+    hand-off thread, which passes batches of samples to a sink (e.g. mongo_sink).
+    """
+
+    def __init__(
+        self,
+        port: str = PORT,
+        baudrate: int = BAUDRATE,
+        parser=None,
+        buffer: RingBuffer | None = None,
+        sink=None,
+        batch_size: int = 500,
+        batch_interval: float = 1.0,
+    ):
+        """
+        :param port: Port name or pyserial URL (loop:// for tests)
+        :param parser: LineParser or FrameParser
+        :param buffer: Ring buffer for the parsed samples
+        :param sink: Callable(times, values) called with batches of new samples
+        :param batch_size: Samples per sink call at most
+        :param batch_interval: Seconds between sink calls
+        """
+        self.parser = parser or LineParser(channels=1)
+        self.buffer = buffer or RingBuffer(100_000, self.parser.channels)
+        self.sink = sink
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.port = serial.serial_for_url(port, baudrate=baudrate, timeout=READ_TIMEOUT, write_timeout=1)
+        self.commands = queue.Queue()
+        self.bytes_read = 0
+        self.samples = 0
+        self.handed_off = 0
+        self.sink_errors = 0
+        self.started = None
+        self._last_read = None
+        self._last_ms = 0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self.started = time.monotonic()
+        targets = [self._read_loop, self._write_loop]
+        if self.sink is not None:
+            targets.append(self._handoff_loop)
+        self._threads = [threading.Thread(target=target, name=f"serial-{target.__name__}", daemon=True) for target in targets]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """ Stop all threads, the remaining samples are handed off to the sink, then the port is closed """
+        self._stop.set()
+        self.commands.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self.sink is not None:
+            self._handoff()
+        self.port.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def send(self, data: bytes | str):
+        """ Queue a command, written by the writer thread (thread-safe) """
+        self.commands.put(data.encode() if isinstance(data, str) else data)
+
+    def _read_loop(self):
+        while not self._stop.is_set():
+            # blokuje az do prvniho bajtu (nebo timeoutu), pak vezme vse, co uz ceka v bufferu OS
+            data = self.port.read(1)
+            if not data:
+                continue
+            waiting = self.port.in_waiting
+            if waiting:
+                data += self.port.read(min(waiting, READ_SIZE))
+            received = time.time()
+            self.bytes_read += len(data)
+            values = self.parser.feed(data)
+            if len(values):
+                self.buffer.write(values, self._sample_times(len(values), received))
+                self.samples += len(values)
+            self._last_read = received
+
+    def _sample_times(self, n: int, received: float) -> np.ndarray:
+        """
+        Receive times of n samples of one read, spread over the time since the previous read.
+        Casy jsou v celych ms a rostou aspon o 1 ms, MongoDB uklada datum v ms a (machine_id, timestamp) je unikatni.
+        :param n: Number of samples of the read
+        :param received: Time of the read (time.time())
+        :return: Seconds since the epoch, one per sample
+        """
+        previous = self._last_read if self._last_read is not None else received
+        ms = np.round(np.linspace(previous, received, n + 1)[1:] * 1000)
+        # pri vic nez 1000 vzorcich za sekundu casy predbihaji skutecnost, zadny se ale neopakuje
+        steps = np.arange(n)
+        ms = np.maximum.accumulate(np.maximum(ms, self._last_ms + 1) - steps) + steps
+        self._last_ms = ms[-1]
+        return ms / 1000
+
+    def _write_loop(self):
+        while True:
+            command = self.commands.get()
+            if command is None:
+                return
+            self.port.write(command)
+
+    def _handoff(self):
+        while True:
+            times, values = self.buffer.drain(self.batch_size)
+            if len(times) == 0:
+                return
+            try:
+                self.sink(times, values)
+                self.handed_off += len(times)
+            except Exception as e:
+                self.sink_errors += 1
+                logger.error(f"Hand-off of {len(times)} samples failed: {e}")
+
+    def _handoff_loop(self):
+        while not self._stop.wait(self.batch_interval):
+            self._handoff()
+
+    def stats(self) -> dict:
+        """ Counters of the acquisition """
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        return {
+            "bytes_read": self.bytes_read,
+            "samples": self.samples,
+            "samples_per_second": self.samples / elapsed if elapsed > 0 else 0.0,
+            "dropped_frames": self.parser.dropped,
+            "buffer_overruns": self.buffer.overruns,
+            "handed_off": self.handed_off,
+            "sink_errors": self.sink_errors,
+        }
+
+
+def _load_mongo_basic():
+    """ mongo_basic z Ukol_03, stejna zapisova cesta jako data_transform.py """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Ukol_03", "data_trasformer", "src", "libs", "mongo_basic.py")
+    spec = importlib.util.spec_from_file_location("mongo_basic", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def mongo_sink(db, channels: list[str], machine_id: str, plant_name: str, collection_name: str = "machine_data", extra: dict | None = None):
+    """
+    Sink writing batches as machine_data documents through mongo_basic.insert_bulk
+    :param db: MongoDB database object
+    :param channels: Document field of every channel, e.g. ["temperature", "power_usage"]
+    :param machine_id: machine_id of the documents
+    :param plant_name: plant_name of the documents
+    :param extra: Other constant fields, e.g. {"status": "operational"}
+    :return: Callable(times, values)
+    """
+    import datetime
+
+    mongo_basic = _load_mongo_basic()
+
+    def sink(times: np.ndarray, values: np.ndarray):
+        timestamps = [datetime.datetime.fromtimestamp(t, datetime.timezone.utc).replace(tzinfo=None) for t in times]
+        columns = {name: values[:, i].tolist() for i, name in enumerate(channels)}
+        docs = [
+            {"plant_name": plant_name, "machine_id": machine_id, "timestamp": timestamp,
+             **{name: columns[name][row] for name in channels}, **(extra or {})}
+            for row, timestamp in enumerate(timestamps)
+        ]
+        mongo_basic.insert_bulk(db, collection_name, docs)
+
+    return sink
+
+
+if __name__ == "__main__":
+    # loopback benchmark: data zapsana do loop:// se prectou zpet, bez Arduina
+    for name, parser in (("lines", LineParser(channels=3)), ("frames", FrameParser(channels=3))):
+        batches = []
+        acquisition = SerialAcquisition("loop://", 115200, parser=parser, sink=lambda t, v: batches.append(len(t)), batch_interval=0.1)
+        rows = np.random.default_rng(0).normal(50, 5, (50_000, 3))
+        if name == "lines":
+            payload = "".join(f"{a:.3f},{b:.3f},{c:.3f}\n" for a, b, c in rows).encode() + b"broken line\n"
+        else:
+            payload = b"".join(parser.encode(row) for row in rows) + b"\xaa\x55garbage-frame-bytes"
+        with acquisition:
+            for start in range(0, len(payload), 8192):
+                acquisition.send(payload[start:start + 8192])
+            while acquisition.samples < len(rows) and time.monotonic() - acquisition.started < 10:
+                time.sleep(0.01)
+            stats = acquisition.stats()
+        print(f"{name}: {stats['samples']} samples, {stats['samples_per_second']:.0f} samples/s, "
+              f"dropped {stats['dropped_frames']}, overruns {stats['buffer_overruns']}, handed off {sum(batches)}")
@@ -1,20 +1,20 @@
-import serial
 import time
 
-# Nastav správný port podle svého systému
-# Např. "COM3" ve Windows, nebo "/dev/ttyACM0" na Linuxu
-arduino = serial.Serial(port='COM4', baudrate=9600, timeout=1)
+from serial_acquisition import SerialAcquisition, LineParser, PORT, BAUDRATE
 
-time.sleep(2)  # počkej, až se Arduino inicializuje
+# Port se nastavuje pres SERIAL_PORT, napr. "COM3" ve Windows, nebo "/dev/ttyACM0" na Linuxu.
+# Prikazy jdou pres frontu na stejnem portu, ze ktereho soucasne cte vlakno akvizice.
+acquisition = SerialAcquisition(PORT, BAUDRATE, parser=LineParser(channels=1))
 
-while True:
-    cmd = input("Zadej 1 (rozsvítit) nebo 0 (zhasnout), q pro konec: ")
+time.sleep(2)  # počkej, až se Arduino inicializuje
 
-    if cmd == 'q':
-        break
-    elif cmd in ['0', '1']:
-        arduino.write(cmd.encode())
-    else:
-        print("Neplatný příkaz")
+with acquisition:
+    while True:
+        cmd = input("Zadej 1 (rozsvítit) nebo 0 (zhasnout), q pro konec: ")
 
-arduino.close()
+        if cmd == 'q':
+            break
+        elif cmd in ['0', '1']:
+            acquisition.send(cmd)
+        else:
+            print("Neplatný příkaz")
@@ -1,9 +1,17 @@
-import serial, time
+import time
 
-arduino = serial.Serial('COM4', 9600, timeout=1)
-time.sleep(2)
+from serial_acquisition import SerialAcquisition, LineParser, PORT, BAUDRATE
 
-while True:
-    if arduino.in_waiting:
-        line = arduino.readline().decode().strip()
-        print(line)
+# Cteni ve vlastnim vlakne (blokujici cteni), hlavni vlakno jen vypisuje nove radky
+acquisition = SerialAcquisition(PORT, BAUDRATE, parser=LineParser(channels=1))
+time.sleep(2)  # počkej, až se Arduino inicializuje
+
+with acquisition:
+    try:
+        while True:
+            times, values = acquisition.buffer.drain()
+            for t, value in zip(times, values[:, 0]):
+                print(time.strftime("%H:%M:%S", time.localtime(t)), value)
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print(acquisition.stats())
@@ -0,0 +1,77 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pytest
+
+# moduly Ukol_02 importuji testy, sys.path nastavuje conftest.py v koreni repozitare
+
+
+class StubServer:
+    """ Local HTTP server answering from prepared responses, records requests and connections """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def route(self, path: str, *responses: tuple[int, dict, bytes]):
+        """
+        Odpovedi pro jednu cestu (bez query), vraci se postupne, posledni se opakuje.
+        :param path: Cesta pozadavku
+        :param responses: (status, hlavicky, telo)
+        """
+        self.routes[path] = list(responses)
+
+    def hits(self, path: str) -> int:
+        return sum(1 for request in self.requests if request["path"] == path)
+
+    def _respond(self, handler: BaseHTTPRequestHandler):
+        path = urlsplit(handler.path).path
+        length = int(handler.headers.get("Content-Length") or 0)
+        with self.lock:
+            self.requests.append({"method": handler.command, "path": path, "headers": dict(handler.headers),
+                                  "body": handler.rfile.read(length)})
+            responses = self.routes.get(path) or [(404, {}, b"")]
+            status, headers, body = responses.pop(0) if len(responses) > 1 else responses[0]
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                with stub.lock:
+                    stub.connections += 1
+                super().setup()
+
+            def do_GET(self):
+                stub._respond(self)
+
+            do_POST = do_GET
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def stub_server():
+    running = StubServer()
+    running.thread.start()
+    yield running
+    running.httpd.shutdown()
+    running.httpd.server_close()
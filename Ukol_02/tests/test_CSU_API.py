@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+import requests
+
+import CSU_API
+
+
+@pytest.fixture
+def csu(stub_server, monkeypatch):
+    """ CSU_API against the stub server with a fresh session """
+    monkeypatch.setattr(CSU_API, "BASE", stub_server.url)
+    monkeypatch.setattr(CSU_API, "_session", None)
+    yield stub_server
+    CSU_API._session.close()
+
+
+def vyber(kod: str, nazev: str, sada: str = "S1") -> dict:
+    return {"sada": {"kod": sada}, "vyber": {"kod": kod, "nazev": nazev}}
+
+
+def csv_response(body: bytes, status: int = 200) -> tuple[int, dict, bytes]:
+    return status, {"Content-Type": "text/csv"}, body
+
+
+def test_selections_with_same_name_get_own_files(csu, tmp_path):
+    csu.route("/dotaz/v1/data/vybery/A", csv_response(b"a\n1\n"))
+    csu.route("/dotaz/v1/data/vybery/B", csv_response(b"b\n2\n"))
+
+    results = CSU_API.download_vybery([vyber("A", "Podniky"), vyber("B", "Podniky")], str(tmp_path))
+
+    assert results["A"] != results["B"]
+    with open(results["A"], "rb") as f:
+        assert f.read() == b"a\n1\n"
+    with open(results["B"], "rb") as f:
+        assert f.read() == b"b\n2\n"
+    assert sorted(os.listdir(tmp_path)) == ["Podniky_A.csv", "Podniky_B.csv"]
+
+
+def test_duplicate_selection_is_downloaded_once(csu, tmp_path):
+    csu.route("/dotaz/v1/data/vybery/A", csv_response(b"a\n1\n"))
+
+    results = CSU_API.download_vybery([vyber("A", "Podniky"), vyber("A", "Podniky", "S2")], str(tmp_path))
+
+    assert list(results) == ["A"]
+    assert csu.hits("/dotaz/v1/data/vybery/A") == 1
+
+
+def test_failed_download_is_reported(csu, tmp_path):
+    csu.route("/dotaz/v1/data/vybery/A", csv_response(b"a\n1\n"))
+    csu.route("/dotaz/v1/data/vybery/B", csv_response(b"", 500))
+
+    results = CSU_API.download_vybery([vyber("A", "Podniky"), vyber("B", "Mzdy")], str(tmp_path))
+
+    assert isinstance(results["B"], requests.HTTPError)
+    assert os.listdir(tmp_path) == ["Podniky_A.csv"]
+
+
+def test_large_selection_is_streamed_completely(csu, tmp_path):
+    body = b"".join(b"%d;radek\n" % i for i in range(50000))
+    csu.route("/dotaz/v1/data/vybery/A", csv_response(body))
+
+    size = CSU_API.download_vyber_csv("A", str(tmp_path / "a.csv"))
+
+    assert size == len(body) > CSU_API.CHUNK_SIZE
+    with open(tmp_path / "a.csv", "rb") as f:
+        assert f.read() == body
+
+
+def test_file_name_without_forbidden_characters():
+    assert CSU_API.vyber_file_name(vyber("X/1", 'Mzdy: "2024"?')) == "Mzdy_ _2024___X_1.csv"
+
+
+def test_catalog_is_revalidated_from_disk(csu, tmp_path):
+    catalog = [{"kod": "S1", "nazev": "Podniky"}]
+    csu.route("/katalog/v1/sady",
+              (200, {"Content-Type": "application/json", "ETag": '"v1"'}, json.dumps(catalog).encode()),
+              (304, {"ETag": '"v1"'}, b""))
+
+    assert CSU_API.get_catalog("sady", str(tmp_path)) == catalog
+    assert CSU_API.get_catalog("sady", str(tmp_path)) == catalog
+    assert "If-None-Match" not in csu.requests[0]["headers"]
+    assert csu.requests[1]["headers"]["If-None-Match"] == '"v1"'
@@ -0,0 +1,182 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import get_data_from_API
+
+
+@pytest.fixture
+def weather(stub_server, tmp_path, monkeypatch):
+    """ get_data_from_API against the stub server with a fresh session and cache in tmp """
+    monkeypatch.setattr(get_data_from_API, "_session", None)
+    monkeypatch.setattr(get_data_from_API, "_openmeteo", None)
+    monkeypatch.setattr(get_data_from_API, "CACHE_PATH", os.path.join(tmp_path, "cache"))
+    monkeypatch.setattr(get_data_from_API, "IP_URL", stub_server.url + "/ip")
+    monkeypatch.setattr(get_data_from_API, "GEO_URL", stub_server.url)
+    yield stub_server
+    get_data_from_API._session.close()
+
+
+def json_response(data: dict, status: int = 200) -> tuple[int, dict, bytes]:
+    return status, {"Content-Type": "application/json"}, json.dumps(data).encode()
+
+
+def test_session_has_one_pooled_adapter_with_retries(weather):
+    session = get_data_from_API.get_session()
+
+    adapters = [session.get_adapter("https://api.open-meteo.com/v1/forecast"), session.get_adapter("http://ip-api.com/json")]
+    assert adapters[0] is adapters[1]
+    assert adapters[0]._pool_maxsize == get_data_from_API.FETCH_WORKERS * 2
+    assert adapters[0].max_retries.total == 5
+    assert 502 in adapters[0].max_retries.status_forcelist
+    assert get_data_from_API.get_session() is session
+
+
+def test_server_error_is_retried(weather):
+    weather.route("/ip", json_response({}, 502), json_response({}, 500), json_response({"ip": "10.0.0.1"}))
+
+    assert get_data_from_API.get_ip_address("api.ipify.org") == "10.0.0.1"
+    assert weather.hits("/ip") == 3
+
+
+def test_client_error_is_not_retried(weather):
+    weather.route("/ip", json_response({}, 404))
+
+    assert get_data_from_API.get_ip_address("api.ipify.org") is None
+    assert weather.hits("/ip") == 1
+
+
+def test_response_is_cached(weather):
+    weather.route("/ip", json_response({"ip": "10.0.0.1"}))
+
+    assert get_data_from_API.get_ip_address("api.ipify.org") == "10.0.0.1"
+    assert get_data_from_API.get_ip_address("api.ipify.org") == "10.0.0.1"
+    assert weather.hits("/ip") == 1
+
+
+def test_location_requests_reuse_connection(weather):
+    for i in range(5):
+        weather.route(f"/json/10.0.0.{i}", json_response({"lat": 50.0 + i, "lon": 14.0}))
+
+    locations = [get_data_from_API.get_location_data(f"10.0.0.{i}", "json") for i in range(5)]
+
+    assert [get_data_from_API.get_lat_lon(location) for location in locations] == [(50.0 + i, 14.0) for i in range(5)]
+    assert weather.connections == 1
+
+
+
+START = 1_700_000_000   # 2023-11-14 22:13:20 UTC
+STEPS = 3
+
+
+class FakeVariable:
+    def __init__(self, values):
+        self.values = values
+
+    def ValuesAsNumpy(self):
+        return self.values
+
+
+class FakeHourly:
+    def __init__(self, lat: float):
+        self.lat = lat
+
+    def Time(self):
+        return START
+
+    def TimeEnd(self):
+        return START + STEPS * 3600
+
+    def Interval(self):
+        return 3600
+
+    def Variables(self, i):
+        # hodnota prozradi lokaci (lat), promennou (i) i hodinu
+        return FakeVariable(np.array([self.lat + 10 * i + step for step in range(STEPS)], dtype=np.float32))
+
+
+class FakeResponse:
+    def __init__(self, lat: float, lon: float):
+        self.lat, self.lon = lat, lon
+
+    def Latitude(self):
+        return self.lat
+
+    def Longitude(self):
+        return self.lon
+
+    def Hourly(self):
+        return FakeHourly(self.lat)
+
+
+class FakeClient:
+    """ Open-Meteo client answering every location of a request in order """
+    def __init__(self):
+        self.requests = []
+
+    def weather_api(self, url, params, method):
+        self.requests.append((url, params, method))
+        latitudes = [float(lat) for lat in params["latitude"].split(",")]
+        longitudes = [float(lon) for lon in params["longitude"].split(",")]
+        return [FakeResponse(lat, lon) for lat, lon in zip(latitudes, longitudes)]
+
+
+@pytest.fixture
+def openmeteo(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(get_data_from_API, "_openmeteo", client)
+    return client
+
+
+def test_fetch_weather_of_several_sites(openmeteo):
+    sites = [(50.0, 14.0), (49.0, 16.5), (48.0, 17.0)]
+    variables = ["temperature_2m", "precipitation_probability"]
+
+    data = get_data_from_API.fetch_weather(sites, variables, url="http://forecast")
+
+    assert len(openmeteo.requests) == 1
+    url, params, method = openmeteo.requests[0]
+    assert (url, method) == ("http://forecast", "POST")
+    assert params == {"latitude": "50.0,49.0,48.0", "longitude": "14.0,16.5,17.0", "hourly": variables}
+    assert list(data.columns) == ["site", "latitude", "longitude", "date", "variable", "value"]
+    assert len(data) == len(sites) * len(variables) * STEPS
+    assert data["site"].tolist() == np.repeat([0, 1, 2], len(variables) * STEPS).tolist()
+    assert list(data["variable"].cat.categories) == variables
+    dates = pd.date_range(pd.Timestamp(START, unit="s", tz="UTC"), periods=STEPS, freq="h")
+    for site, (lat, lon) in enumerate(sites):
+        rows = data[data["site"] == site]
+        assert set(rows["latitude"]) == {lat} and set(rows["longitude"]) == {lon}
+        assert rows["variable"].tolist() == np.repeat(variables, STEPS).tolist()
+        assert rows["date"].tolist() == list(dates) * len(variables)
+        assert rows["value"].tolist() == [lat + 10 * i + step for i in range(len(variables)) for step in range(STEPS)]
+
+
+def test_fetch_weather_splits_sites_into_requests(openmeteo, monkeypatch):
+    monkeypatch.setattr(get_data_from_API, "SITES_PER_REQUEST", 3)
+    sites = [(40.0 + i, 10.0 + i) for i in range(8)]
+
+    data = get_data_from_API.fetch_weather(sites, ["temperature_2m"])
+
+    latitudes = sorted(params["latitude"] for _, params, _ in openmeteo.requests)
+    assert latitudes == ["40.0,41.0,42.0", "43.0,44.0,45.0", "46.0,47.0"]
+    # poradi lokaci zustava podle sites i pri soubeznych pozadavcich
+    assert data["site"].tolist() == np.repeat(np.arange(8), STEPS).tolist()
+    assert data.groupby("site")["latitude"].first().tolist() == [40.0 + i for i in range(8)]
+
+
+def test_fetch_weather_without_sites(openmeteo):
+    data = get_data_from_API.fetch_weather([])
+
+    assert data.empty and list(data.columns) == ["site", "latitude", "longitude", "date", "variable", "value"]
+    assert openmeteo.requests == []
+
+
+def test_weather_data_of_one_site_is_wide(openmeteo):
+    data = get_data_from_API.get_weather_data(50.0, 14.0)
+
+    assert list(data.columns) == ["date"] + get_data_from_API.HOURLY_VARIABLES
+    assert len(data) == STEPS
+    assert data["relative_humidity_2m"].tolist() == [60.0, 61.0, 62.0]
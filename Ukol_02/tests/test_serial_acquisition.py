@@ -0,0 +1,79 @@
+import logging
+import time
+
+import mongomock
+import numpy as np
+
+import serial_acquisition
+from serial_acquisition import LineParser, RingBuffer, SerialAcquisition
+
+
+def test_oversized_block_keeps_its_tail():
+    buffer = RingBuffer(4, 1)
+    buffer.write(np.arange(6.0).reshape(-1, 1), 1.0)
+
+    times, values = buffer.drain()
+
+    assert values[:, 0].tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert buffer.overruns == 2
+
+
+def test_oversized_block_after_partial_fill():
+    buffer = RingBuffer(4, 1)
+    buffer.write(np.arange(3.0).reshape(-1, 1), 1.0)
+    buffer.drain(1)
+    buffer.write(np.arange(10.0, 16.0).reshape(-1, 1), np.arange(6.0))
+
+    times, values = buffer.drain()
+
+    assert values[:, 0].tolist() == [12.0, 13.0, 14.0, 15.0]
+    assert times.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert buffer.latest(2)[1][:, 0].tolist() == [14.0, 15.0]
+
+
+def test_samples_of_one_read_get_distinct_times():
+    acquisition = SerialAcquisition("loop://", parser=LineParser(channels=1))
+    try:
+        first = acquisition._sample_times(3, 1000.0)
+        acquisition._last_read = 1000.0
+        second = acquisition._sample_times(4, 1000.4)
+        acquisition._last_read = 1000.4
+        burst = acquisition._sample_times(5, 1000.401)
+    finally:
+        acquisition.port.close()
+
+    assert first.tolist() == [1000.0, 1000.001, 1000.002]
+    assert second.tolist() == [1000.1, 1000.2, 1000.3, 1000.4]
+    # vic vzorku nez ms od posledniho cteni: casy po 1 ms, zadny stejny
+    assert burst.tolist() == [1000.401, 1000.402, 1000.403, 1000.404, 1000.405]
+
+
+def test_every_sample_is_stored_in_mongo():
+    db = mongomock.MongoClient()["test_serial"]
+    db["machine_data"].create_index([("machine_id", 1), ("timestamp", 1)], unique=True)
+    sink = serial_acquisition.mongo_sink(db, ["temperature"], "M_01", "Hala_A")
+    acquisition = SerialAcquisition("loop://", 115200, parser=LineParser(channels=1), sink=sink, batch_interval=0.05)
+    payload = "".join(f"{i}.5\n" for i in range(300)).encode()
+
+    with acquisition:
+        acquisition.send(payload)
+        while acquisition.samples < 300 and time.monotonic() - acquisition.started < 5:
+            time.sleep(0.01)
+
+    stored = list(db["machine_data"].find({}, {"_id": 0, "temperature": 1}).sort("timestamp", 1))
+    assert [doc["temperature"] for doc in stored] == [i + 0.5 for i in range(300)]
+    assert acquisition.stats()["sink_errors"] == 0
+
+
+def test_failed_hand_off_is_logged(caplog):
+    def sink(times, values):
+        raise RuntimeError("database down")
+
+    acquisition = SerialAcquisition("loop://", parser=LineParser(channels=1), sink=sink)
+    acquisition.buffer.write(np.ones((3, 1)), 1.0)
+    with caplog.at_level(logging.ERROR, logger=serial_acquisition.__name__):
+        acquisition._handoff()
+    acquisition.port.close()
+
+    assert acquisition.sink_errors == 1
+    assert "Hand-off of 3 samples failed: database down" in caplog.text
@@ -0,0 +1,158 @@
+import datetime
+import logging
+import os
+import time
+from dash import Dash, dcc, html, Input, Output, State, no_update
+from pymongo import MongoClient
+from libs import live_data
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Server configuration
+HOST = os.getenv("HOST", "localhost")
+PORT = int(os.getenv("PORT", 8050))
+
+# MongoDB configuration
+MONGO_HOST = os.getenv("MONGO_HOST", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("DB_NAME", "ukol03_mongodb")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "machine_data")
+
+# Dashboard configuration
+REFRESH_MS = int(os.getenv("REFRESH_MS", 2000))              # interval obnoveni grafu
+WINDOW_POINTS = int(os.getenv("WINDOW_POINTS", 600))          # max. bodu na stroj v grafu
+WINDOW_SECONDS = float(os.getenv("WINDOW_SECONDS", 600))      # kolik sekund historie se nacte pri otevreni
+LATE_SECONDS = float(os.getenv("LATE_SECONDS", 2))            # jak moc mimo poradi mohou dokumenty prijit
+FETCH_LIMIT = int(os.getenv("FETCH_LIMIT", 10_000))           # max. novych dokumentu na jedno obnoveni
+WINDOW_LIMIT = int(os.getenv("WINDOW_LIMIT", 100_000))        # max. dokumentu pri sestaveni figur
+
+TITLES = {"temperature": "Temperature [°C]", "power_usage": "Power usage [kW]"}
+
+client = MongoClient(MONGO_HOST)
+collection = client[DB_NAME][COLLECTION_NAME]
+latency = live_data.LatencyTracker()
+
+
+def figure(field: str, traces: list[dict] | None = None) -> dict:
+    """ Figure of one field, traces of the machines come from live_data.build_traces """
+    return {
+        "data": traces or [],
+        "layout": {
+            "title": {"text": TITLES[field]},
+            "xaxis": {"type": "date"},
+            "uirevision": field,    # zoom a skryte stroje zustanou i po prestaveni figury
+            "margin": {"t": 40, "b": 30},
+        },
+    }
+
+
+app = Dash(__name__)
+app.layout = html.Div([
+    html.H3("machine_data live"),
+    *[dcc.Graph(id=f"graph-{field}", figure=figure(field)) for field in live_data.FIELDS],
+    html.Div(id="refresh-status"),
+    dcc.Store(id="live-state", data=live_data.initial_state()),
+    dcc.Interval(id="refresh", interval=REFRESH_MS),
+])
+
+
+def refresh(state: dict):
+    """
+    One refresh. Bezne se do grafu posilaji jen nove body pres extendData (orezani na WINDOW_POINTS
+    dela prohlizec), cela figura se sestavi jen pri otevreni stranky nebo kdyz pribude novy stroj,
+    a to z omezeneho okna, takze ani tato cesta nezavisi na velikosti kolekce.
+    extendData nemeni vlastnost figure grafu, proto se Patch figury s extendData nekombinuje.
+    :return: (figures or None, extendData or None, new state, number of new documents, query seconds)
+    """
+    start = time.perf_counter()
+    docs = None
+    if state["since"] is not None:
+        docs = live_data.fetch_new(collection, state, live_data.FIELDS, LATE_SECONDS, FETCH_LIMIT)
+        if not docs:
+            return None, None, state, 0, time.perf_counter() - start
+        if all(doc["machine_id"] in state["traces"] for doc in docs):
+            query_time = time.perf_counter() - start
+            # pozdni dokumenty se jen zapamatuji v recent, aby se nenacetly znovu
+            plotted, _ = live_data.split_late(docs, state)
+            extend = live_data.extend_data(plotted, state["traces"], live_data.FIELDS, WINDOW_POINTS) if plotted else None
+            return None, extend, live_data.advance(state, docs, state["traces"], LATE_SECONDS), len(docs), query_time
+
+    # prvni nacteni nebo novy stroj: figury znovu z okna poslednich WINDOW_SECONDS
+    window = live_data.fetch_window(collection, live_data.FIELDS, WINDOW_SECONDS, WINDOW_LIMIT)
+    query_time = time.perf_counter() - start
+    if not window:
+        return None, None, state, 0, query_time
+    data, traces = live_data.build_traces(window, live_data.FIELDS, WINDOW_POINTS)
+    figures = {field: figure(field, data[field]) for field in live_data.FIELDS}
+    new_state = live_data.advance(live_data.initial_state(), window, traces, LATE_SECONDS)
+    return figures, None, new_state, len(docs) if docs is not None else len(window), query_time
+
+
+@app.callback(
+    *[Output(f"graph-{field}", "figure") for field in live_data.FIELDS],
+    *[Output(f"graph-{field}", "extendData") for field in live_data.FIELDS],
+    Output("live-state", "data"),
+    Output("refresh-status", "children"),
+    Input("refresh", "n_intervals"),
+    State("live-state", "data"),
+)
+def on_refresh(_, state):
+    start = time.perf_counter()
+    figures, extend, new_state, new_docs, query_time = refresh(state)
+    latency.add(time.perf_counter() - start)
+    status = (
+        f"{new_docs} new readings, {len(new_state['traces'])} machines, query {query_time * 1000:.1f} ms, "
+        f"callback p50 {latency.percentile(50):.1f} ms p95 {latency.percentile(95):.1f} ms"
+    )
+    figure_outputs = [figures[field] if figures else no_update for field in live_data.FIELDS]
+    extend_outputs = [extend[field] if extend else no_update for field in live_data.FIELDS]
+    return *figure_outputs, *extend_outputs, new_state if new_state is not state else no_update, status
+
+
+def benchmark(rows_steps=(10_000, 100_000, 1_000_000), machines: int = 200, refreshes: int = 20):
+    """
+    Refresh latency while the collection grows, in a scratch collection of the same database.
+    Mezi obnovenimi pribude vzdy jedna sekunda dat vsech stroju, cas obnoveni ma zustat stejny.
+    """
+    scratch = client[DB_NAME][f"{COLLECTION_NAME}_dashboard_benchmark"]
+    scratch.drop()
+    scratch.create_index([("timestamp", 1), ("_id", 1)])
+    global collection
+    collection, original = scratch, collection
+    clock = datetime.datetime(2025, 1, 1)
+
+    def insert_seconds(seconds: int):
+        nonlocal clock
+        docs = []
+        for _ in range(seconds):
+            clock += datetime.timedelta(seconds=1)
+            docs.extend({"plant_name": "Hala_A", "machine_id": f"M_{m:03d}", "timestamp": clock,
+                         "temperature": 80.0 + m % 10, "power_usage": 12.0, "status": "operational"} for m in range(machines))
+        scratch.insert_many(docs, ordered=False)
+
+    try:
+        inserted = 0
+        for rows in rows_steps:
+            while inserted < rows:
+                step = max(min(rows - inserted, 100_000) // machines, 1)
+                insert_seconds(step)
+                inserted += step * machines
+            timings = []
+            _, _, state, _, _ = refresh(live_data.initial_state())   # otevreni stranky
+            for _ in range(refreshes):
+                insert_seconds(1)
+                start = time.perf_counter()
+                _, _, state, new_docs, _ = refresh(state)
+                timings.append(time.perf_counter() - start)
+            logger.info(f"{inserted:>9} documents: refresh with {new_docs} new readings "
+                        f"p50 {sorted(timings)[len(timings) // 2] * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms")
+    finally:
+        collection = original
+        scratch.drop()
+
+
+if __name__ == "__main__":
+    if os.getenv("DASH_BENCHMARK", "0") == "1":
+        benchmark()
+    else:
+        app.run(host=HOST, port=PORT, debug=False)
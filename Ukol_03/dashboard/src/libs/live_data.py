@@ -0,0 +1,165 @@
+""" Incremental reads of machine_data for the live dashboard, new points are pushed to the figures with extendData """
+
+import datetime
+from collections import deque
+
+import numpy as np
+
+FIELDS = ("temperature", "power_usage")
+
+
+def initial_state() -> dict:
+    """
+    Per-browser state kept in dcc.Store, its size depends on the number of machines, not on the collection
+    since: newest timestamp already plotted (ISO), None = figures not built yet
+    recent: "machine_id|timestamp" keys newer than since - late_seconds, so the overlap is not plotted twice
+    traces: machine_id -> trace index (the same in all figures)
+    last: machine_id -> newest timestamp plotted in its trace (ISO)
+    """
+    return {"since": None, "recent": [], "traces": {}, "last": {}}
+
+
+def _key(doc: dict) -> str:
+    return f"{doc['machine_id']}|{doc['timestamp'].isoformat()}"
+
+
+def _projection(fields) -> dict:
+    return {"_id": 0, "machine_id": 1, "timestamp": 1, **{field: 1 for field in fields}}
+
+
+def fetch_window(collection, fields=FIELDS, window_seconds: float = 600, limit: int = 100_000) -> list[dict]:
+    """
+    Newest documents for building the figures, at most window_seconds before the newest document
+    :param collection: machine_data collection
+    :param fields: Plotted fields
+    :param window_seconds: Length of the window
+    :param limit: Maximum documents, the newest are kept
+    :return: Documents sorted by timestamp
+    """
+    latest = collection.find_one({}, {"_id": 0, "timestamp": 1}, sort=[("timestamp", -1)])
+    if latest is None:
+        return []
+    query = {"timestamp": {"$gt": latest["timestamp"] - datetime.timedelta(seconds=window_seconds)}}
+    docs = list(collection.find(query, _projection(fields)).sort("timestamp", -1).limit(limit))
+    docs.reverse()
+    return docs
+
+
+def fetch_new(collection, state: dict, fields=FIELDS, late_seconds: float = 2, limit: int = 10_000) -> list[dict]:
+    """
+    Documents newer than the last plotted timestamp, a range query over the timestamp index,
+    takze cena jednoho obnoveni zavisi jen na poctu novych dokumentu, ne na velikosti kolekce.
+    :param collection: machine_data collection
+    :param state: State from initial_state / advance
+    :param fields: Plotted fields
+    :param late_seconds: Documents may be inserted up to this many seconds out of order (e.g. Modbus batches)
+    :param limit: Maximum documents newer than since per refresh, the rest comes with the next refresh
+    :return: New documents sorted by timestamp
+    """
+    since = datetime.datetime.fromisoformat(state["since"])
+    # prekryv [since - late, since] bez limitu: uz vykreslene dokumenty by jinak mohly limit zaplnit
+    # a since by se uz nikdy neposunul, prekryv je maly, omezuje ho late_seconds
+    overlap = {"timestamp": {"$gte": since - datetime.timedelta(seconds=late_seconds), "$lte": since}}
+    recent = set(state["recent"])
+    late = [doc for doc in collection.find(overlap, _projection(fields)).sort("timestamp", 1) if _key(doc) not in recent]
+    newer = collection.find({"timestamp": {"$gt": since}}, _projection(fields)).sort("timestamp", 1).limit(limit)
+    return late + list(newer)
+
+
+def group(docs: list[dict], fields=FIELDS, max_points: int | None = None) -> dict[str, dict]:
+    """
+    Documents split per machine, in time order
+    :param max_points: Keep only the newest max_points of every machine, None = all
+    :return: machine_id -> {"x": ISO timestamps, <field>: values}
+    """
+    machines = np.array([doc["machine_id"] for doc in docs])
+    # stabilni razeni podle stroje zachova casove poradi uvnitr stroje
+    order = np.argsort(machines, kind="stable")
+    names, starts = np.unique(machines[order], return_index=True)
+    bounds = np.append(starts, len(order))
+    result = {}
+    for machine, start, end in zip(names.tolist(), bounds[:-1], bounds[1:]):
+        rows = order[max(start, end - max_points) if max_points else start:end]
+        series = {"x": [docs[i]["timestamp"].isoformat() for i in rows]}
+        for field in fields:
+            series[field] = [docs[i].get(field) for i in rows]
+        result[machine] = series
+    return result
+
+
+def build_traces(docs: list[dict], fields=FIELDS, max_points: int = 600) -> tuple[dict[str, list[dict]], dict[str, int]]:
+    """
+    Traces of all figures, one per machine with at most max_points points
+    :return: Field -> list of traces, machine_id -> trace index
+    """
+    series = group(docs, fields, max_points)
+    traces = {machine: index for index, machine in enumerate(series)}
+    data = {
+        field: [{"type": "scattergl", "mode": "lines", "name": machine, "x": values["x"], "y": values[field]}
+                for machine, values in series.items()]
+        for field in fields
+    }
+    return data, traces
+
+
+def split_late(docs: list[dict], state: dict) -> tuple[list[dict], list[dict]]:
+    """
+    New documents split into those after the last plotted point of their machine and the late ones.
+    extendData jen pripojuje na konec stopy, pozdni bod by cara vratila zpet v case; pozdni dokumenty
+    se proto do grafu neposilaji a objevi se az pri pristim sestaveni figur (otevreni stranky, novy stroj).
+    :return: (documents to plot, late documents)
+    """
+    last = state.get("last", {})
+    plotted, late = [], []
+    for doc in docs:
+        newest = last.get(doc["machine_id"])
+        (late if newest is not None and doc["timestamp"].isoformat() <= newest else plotted).append(doc)
+    return plotted, late
+
+
+def extend_data(docs: list[dict], traces: dict[str, int], fields=FIELDS, max_points: int = 600) -> dict[str, list]:
+    """
+    extendData of every figure: only the new points, the browser drops points over max_points itself
+    :param docs: New documents, all machines already have a trace
+    :param traces: machine_id -> trace index
+    :return: Field -> [update, trace indices, max_points]
+    """
+    series = group(docs, fields, max_points)
+    indices = [traces[machine] for machine in series]
+    x = [values["x"] for values in series.values()]
+    return {
+        field: [{"x": x, "y": [values[field] for values in series.values()]}, indices, max_points]
+        for field in fields
+    }
+
+
+def advance(state: dict, docs: list[dict], traces: dict[str, int], late_seconds: float = 2) -> dict:
+    """ State after plotting docs: newest timestamp and the keys of the overlap window """
+    times = [doc["timestamp"].isoformat() for doc in docs]
+    # ISO retezce stejneho formatu se radi stejne jako casy
+    since = state["since"]
+    if times:
+        since = max(times) if since is None else max(since, max(times))
+    recent = state["recent"] + [_key(doc) for doc in docs]
+    if since is not None:
+        cutoff = (datetime.datetime.fromisoformat(since) - datetime.timedelta(seconds=late_seconds)).isoformat()
+        recent = [key for key in recent if key.split("|", 1)[1] >= cutoff]
+    last = dict(state.get("last", {}))
+    for doc, stamp in zip(docs, times):
+        if stamp > last.get(doc["machine_id"], ""):
+            last[doc["machine_id"]] = stamp
+    return {"since": since, "recent": recent, "traces": traces, "last": last}
+
+
+class LatencyTracker:
+    """ Durations of the last refreshes, for the status line and the log """
+
+    def __init__(self, window: int = 500):
+        self.durations = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.durations.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        """ Percentile in milliseconds, 0 before the first refresh """
+        return float(np.percentile(self.durations, q) * 1000) if self.durations else 0.0
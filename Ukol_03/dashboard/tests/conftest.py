@@ -0,0 +1,40 @@
+import datetime
+
+import mongomock
+import pytest
+
+# dashboard a jeho libs importuje az fixture, sys.path nastavuje conftest.py v koreni repozitare
+
+START = datetime.datetime(2025, 1, 1)
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient()["test_dashboard"]["machine_data"]
+
+
+@pytest.fixture
+def insert_seconds(collection):
+    """ Inserts readings of all machines for the given seconds after START """
+
+    def insert(seconds, machines: int = 3, offset: float = 0.0):
+        docs = [{
+            "plant_name": "Hala_A",
+            "machine_id": f"M_{m:02d}",
+            "timestamp": START + datetime.timedelta(seconds=second + offset),
+            "temperature": 80.0 + m,
+            "power_usage": 12.0 + second % 5,
+            "status": "operational",
+        } for second in seconds for m in range(machines)]
+        collection.insert_many(docs)
+        return docs
+
+    return insert
+
+
+@pytest.fixture
+def dashboard(collection, monkeypatch):
+    import dashboard
+    monkeypatch.setattr(dashboard, "collection", collection)
+    monkeypatch.setattr(dashboard, "latency", dashboard.live_data.LatencyTracker())
+    return dashboard
@@ -0,0 +1,85 @@
+import json
+
+from dash import no_update
+
+from libs import live_data
+
+
+def test_figures_are_built_once_then_extended(dashboard, insert_seconds):
+    insert_seconds(range(10))
+    outputs = dashboard.on_refresh(1, live_data.initial_state())
+    figures, extends, state = outputs[:2], outputs[2:4], outputs[4]
+
+    assert all(figure is not no_update for figure in figures)
+    assert extends == (no_update, no_update)
+    assert len(figures[0]["data"]) == 3
+
+    insert_seconds([10])
+    outputs = dashboard.on_refresh(2, state)
+
+    assert outputs[:2] == (no_update, no_update)
+    assert outputs[2][1] == [0, 1, 2]
+    assert outputs[4]["since"] == "2025-01-01T00:00:10"
+    assert outputs[5].startswith("3 new readings, 3 machines")
+
+
+def test_new_machine_rebuilds_figures(dashboard, insert_seconds):
+    insert_seconds(range(10), machines=2)
+    _, _, state, _, _ = dashboard.refresh(live_data.initial_state())
+    insert_seconds([10], machines=3)
+
+    figures, extend, state, new_docs, _ = dashboard.refresh(state)
+
+    assert extend is None
+    assert len(figures["temperature"]["data"]) == 3
+    assert new_docs == 3
+    assert set(state["traces"]) == {"M_00", "M_01", "M_02"}
+
+
+def test_nothing_new_keeps_state(dashboard, insert_seconds):
+    insert_seconds(range(10))
+    _, _, state, _, _ = dashboard.refresh(live_data.initial_state())
+
+    outputs = dashboard.on_refresh(2, state)
+
+    assert outputs[:5] == (no_update,) * 5
+
+
+def test_late_reading_is_not_appended_to_the_trace(dashboard, insert_seconds):
+    insert_seconds(range(10))
+    state = dashboard.on_refresh(1, live_data.initial_state())[4]
+    insert_seconds([8], machines=1, offset=0.5)
+    insert_seconds([10], machines=2)
+
+    outputs = dashboard.on_refresh(2, state)
+
+    update, indices, _ = outputs[2]
+    # pozdni cteni M_00 z 8,5 s by caru vratilo zpet, vykresli se jen nove body
+    assert indices == [0, 1]
+    assert update["x"] == [["2025-01-01T00:00:10"]] * 2
+    assert outputs[4]["last"] == {"M_00": "2025-01-01T00:00:10", "M_01": "2025-01-01T00:00:10", "M_02": "2025-01-01T00:00:09"}
+
+    outputs = dashboard.on_refresh(3, outputs[4])
+    assert outputs[:5] == (no_update,) * 5
+
+
+def test_extend_payload_does_not_grow_with_collection(dashboard, insert_seconds):
+    insert_seconds(range(120), machines=10)
+    outputs = dashboard.on_refresh(1, live_data.initial_state())
+    figure_size, state = len(json.dumps(outputs[0])), outputs[4]
+    sizes = []
+    for second in range(120, 150):
+        insert_seconds([second], machines=10)
+        outputs = dashboard.on_refresh(second, state)
+        update, indices, max_points = outputs[2]
+        state = outputs[4]
+        assert state["since"] == f"2025-01-01T00:0{second // 60}:{second % 60:02d}"
+        # jen jeden novy bod na stroj, bez ohledu na to, kolik dat uz kolekce a graf maji
+        assert indices == list(range(10))
+        assert [len(x) for x in update["x"]] == [1] * 10
+        assert max_points == dashboard.WINDOW_POINTS
+        sizes.append(len(json.dumps(outputs[2])))
+
+    assert len(dashboard.latency.durations) == 31
+    assert len(set(sizes)) == 1
+    assert sizes[0] * 20 < figure_size
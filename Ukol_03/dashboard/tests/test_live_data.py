@@ -0,0 +1,66 @@
+from libs import live_data
+
+
+def plotted_state(docs: list[dict]) -> dict:
+    """ State after the figures were built from docs """
+    return live_data.advance(live_data.initial_state(), docs, {"M_00": 0, "M_01": 1, "M_02": 2}, late_seconds=2)
+
+
+def test_full_overlap_does_not_stop_refreshes(insert_seconds, collection):
+    # 90 uz vykreslenych dokumentu v okne late_seconds pred since zaplni limit 50, nove se presto nactou
+    state = plotted_state(insert_seconds(range(20), machines=30))
+    new = insert_seconds([20, 21], machines=30)
+
+    docs = live_data.fetch_new(collection, state, late_seconds=2, limit=50)
+
+    assert docs == [{key: doc[key] for key in ("machine_id", "timestamp", "temperature", "power_usage")} for doc in new[:50]]
+
+
+def test_late_document_is_returned_once(insert_seconds, collection):
+    state = plotted_state(insert_seconds(range(10)))
+    late = insert_seconds([9], machines=1, offset=-0.5)
+
+    docs = live_data.fetch_new(collection, state, late_seconds=2, limit=50)
+    state = live_data.advance(state, docs, state["traces"], late_seconds=2)
+
+    assert [doc["timestamp"] for doc in docs] == [late[0]["timestamp"]]
+    assert live_data.fetch_new(collection, state, late_seconds=2, limit=50) == []
+
+
+def test_backlog_is_read_over_several_refreshes(insert_seconds, collection):
+    state = plotted_state(insert_seconds(range(5)))
+    new = insert_seconds(range(5, 45))
+    received = []
+
+    for _ in range(5):
+        docs = live_data.fetch_new(collection, state, late_seconds=2, limit=50)
+        state = live_data.advance(state, docs, state["traces"], late_seconds=2)
+        received += [(doc["machine_id"], doc["timestamp"]) for doc in docs]
+
+    assert received == [(doc["machine_id"], doc["timestamp"]) for doc in new]
+
+
+def test_extend_data_has_only_new_points(insert_seconds, collection):
+    state = plotted_state(insert_seconds(range(10)))
+    insert_seconds([10])
+
+    extend = live_data.extend_data(live_data.fetch_new(collection, state), state["traces"], max_points=600)
+
+    update, indices, max_points = extend["temperature"]
+    assert indices == [0, 1, 2]
+    assert update["x"] == [["2025-01-01T00:00:10"]] * 3
+    assert update["y"] == [[80.0], [81.0], [82.0]]
+    assert max_points == 600
+
+
+def test_late_documents_are_split_per_machine(insert_seconds):
+    state = live_data.advance(live_data.initial_state(), insert_seconds(range(10), machines=2), {"M_00": 0, "M_01": 1})
+    state = live_data.advance(state, insert_seconds([10], machines=1), state["traces"])
+    # M_01 ma posledni bod v 9 s: jeho cteni z 9,5 s neni pozdni, stejne stare cteni M_00 ano
+    docs = insert_seconds([9], machines=2, offset=0.5)
+
+    plotted, late = live_data.split_late(docs, state)
+
+    assert [doc["machine_id"] for doc in plotted] == ["M_01"]
+    assert [doc["machine_id"] for doc in late] == ["M_00"]
+    assert state["last"] == {"M_00": "2025-01-01T00:00:10", "M_01": "2025-01-01T00:00:09"}
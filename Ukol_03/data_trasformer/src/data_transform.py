@@ -1,33 +1,47 @@
 import pandas as pd
 import logging
-from collections import deque
 import time
-from libs import mongo_basic   
+from libs import mongo_basic, ingest, checkpoint, parallel_ingest, alerts, rollups
 import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 MONGO_HOST = os.getenv("MONGO_HOST", "mongodb://localhost:27017/")
-DB_NAME = os.getenv("DB_NAME", "ukol03_mongodb")   
+DB_NAME = os.getenv("DB_NAME", "ukol03_mongodb")
 
-chunk_size = 25
-message_queue: deque[dict] = deque(maxlen=25) 
+# Ingestion configuration
+CSV_PATH = os.getenv("CSV_PATH", "data/machine_data.csv")     # soubor, adresar nebo glob (data/*.csv)
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", 25))                  # dokumentu na jeden bulk insert
+RATE_POLICY = os.getenv("RATE_POLICY", "fixed")                # fast | fixed | realtime
+RATE_ROWS_PER_SEC = float(os.getenv("RATE_ROWS_PER_SEC", 25 / 30))  # fixed: puvodnich 25 radku za 30 s
+REPLAY_SPEEDUP = float(os.getenv("REPLAY_SPEEDUP", 1.0))       # realtime: zrychleni prehravani
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", 100_000))     # radku parsovanych pandasem najednou
+MAX_QUEUED_BATCHES = int(os.getenv("MAX_QUEUED_BATCHES", 64))  # limit fronty mezi ctenim a zapisem
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "data/machine_data.checkpoint.json")  # musi prezit restart kontejneru
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "data/checkpoints")  # checkpointy pro vice souboru najednou
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", os.cpu_count() or 1))  # procesy parsujici CSV
+WRITER_THREADS = int(os.getenv("WRITER_THREADS", 4))           # vlakna zapisujici do MongoDB
+TIMESERIES = os.getenv("TIMESERIES", "0") == "1"               # nova kolekce jako time-series (bez unikatniho indexu)
+TIMESERIES_GRANULARITY = os.getenv("TIMESERIES_GRANULARITY", "seconds")
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", 0))         # 0 = data se nemazou
+
+COLLECTION_NAME = "machine_data"
+ALERTS_COLLECTION = "alerts"
+DOCUMENT_KEY = ("machine_id", "timestamp")  # jeden zaznam stroje v jednom case, zaklad idempotentniho zapisu
+ALERT_KEY = ("rule", "machine_id", "timestamp")  # jeden alarm pravidla na zaznam, zopakovana davka ho nezapise znovu
 
 def read_date_from_csv_to_pd(path: str) -> pd.DataFrame:
-    """Reads a CSV file into a pandas DataFrame."""
-    dataset = pd.read_csv(path)
+    """Reads a whole CSV file into a pandas DataFrame, timestamp is stored in MongoDB as a date."""
+    dataset = pd.read_csv(path, dtype=ingest.CSV_DTYPES, parse_dates=ingest.CSV_DATE_COLUMNS)
     return dataset
 
 
-def collect_queue(data: pd.DataFrame):
-    """Collects data into a fixed-size queue. """
-    queue = []
-    for row in data.itertuples(index=False):
-        queue.append(row._asdict())
-    return queue
-            
-""" 
+def collect_queue(data: pd.DataFrame) -> list[dict]:
+    """Converts a batch of rows into documents for MongoDB, column-wise instead of row by row."""
+    return ingest.to_records(data)
+
+"""
         Template of a DB dat dictionary after reading from pd.DataFrame. One raw example:
         dict = {
             "plant_name": "Hala_A",
@@ -38,36 +52,105 @@ def collect_queue(data: pd.DataFrame):
             "status": "operational",
             "machine_hours": 1500
         }
-        
+
 """
 
+# Rules evaluated on every batch before it is inserted, hits go to the alerts collection and to the log
+ALERT_RULES = [
+    alerts.ThresholdRule("high_temperature", "temperature", 95),
+    alerts.ThresholdRule("high_power_usage", "power_usage", 14),
+    alerts.RateOfChangeRule("temperature_rate", "temperature", 2.0),     # °C za sekundu
+    alerts.ConsecutiveStatusRule("repeated_errors", "error", 3),
+    alerts.HysteresisRule("overheating", "temperature", 95, 90),
+]
+
+
+def write_alerts(mongo_name, batch_alerts: list[dict]) -> list[dict]:
+    """Stores the alerts of a batch idempotently and logs only the new ones, a replayed batch raises nothing twice."""
+    if not batch_alerts:
+        return []
+    new_positions = mongo_basic.upsert_bulk(mongo_name, ALERTS_COLLECTION, batch_alerts, ALERT_KEY)
+    new_alerts = [batch_alerts[i] for i in new_positions]
+    alerts.log_alerts(new_alerts)
+    return new_alerts
+
+
+def ingest_many_files(mongo_name, timeseries: bool):
+    """Backfill of a directory or glob of CSV files, parsed in parallel processes, without pacing."""
+    files = parallel_ingest.resolve_inputs(CSV_PATH)
+    logger.info(f"Ingesting {len(files)} files with {PARSE_WORKERS} parser processes and {WRITER_THREADS} writer threads.")
+    throughput = parallel_ingest.ingest_files(
+        mongo_name, COLLECTION_NAME, files, DOCUMENT_KEY, timeseries, CHECKPOINT_DIR,
+        PARSE_WORKERS, WRITER_THREADS, BATCH_SIZE, CSV_CHUNK_ROWS, MAX_QUEUED_BATCHES,
+    )
+    throughput.log(logger)
+
+
+def ingest_single_file(mongo_name, timeseries: bool):
+    """Replay of one CSV file with pacing and a checkpoint after every batch."""
+    state = checkpoint.Checkpoint(CHECKPOINT_PATH, CSV_PATH)
+    done_rows = state.load()
+    if state.is_complete():
+        logger.info(f"{CSV_PATH} was already ingested ({done_rows} rows), nothing to do.")
+        return
+    if done_rows:
+        logger.info(f"Resuming {CSV_PATH} after row {done_rows} (byte {state.offset}).")
+
+    rate_policy = ingest.make_rate_policy(RATE_POLICY, RATE_ROWS_PER_SEC, REPLAY_SPEEDUP)
+    throughput = ingest.Throughput()
+    alert_engine = alerts.AlertEngine(ALERT_RULES)
+    rollup_builder = rollups.RollupBuilder(COLLECTION_NAME)
+
+    # CSV se cte po castech ve vlastnim vlakne, v pameti neni nikdy cely soubor
+    # po restartu se cte primo od ulozeneho offsetu, cena obnoveni nezavisi na tom, kolik uz je nacteno
+    offset = state.offset
+    for batch, offset in ingest.stream_batches(CSV_PATH, BATCH_SIZE, CSV_CHUNK_ROWS, MAX_QUEUED_BATCHES, offset):
+        rate_policy.wait(batch)  # Pacing between batches: fast, fixed rate or real-time replay
+
+        # pravidla se vyhodnoti nad celou davkou jeste pred zapisem, alarm prijde uz s touto davkou
+        rules_start = time.perf_counter()
+        batch_alerts = alert_engine.evaluate(batch)
+        logger.debug(f"Rule evaluation of {len(batch)} rows took {(time.perf_counter() - rules_start) * 1000:.2f} ms")
+        write_alerts(mongo_name, batch_alerts)
+
+        queue = collect_queue(batch)
+        if queue:
+            write_start = time.monotonic()
+            new_rows = mongo_basic.upsert_bulk(mongo_name, COLLECTION_NAME, queue, DOCUMENT_KEY, timeseries)
+            # rollupy se prepocitaji z kolekce pro celou davku, i zopakovanou po padu pred touto radkou
+            rollup_builder.apply(mongo_name, batch)
+            throughput.add(len(queue), time.monotonic() - write_start)
+            logger.info(f"Inserted batch of {len(new_rows)} new records into MongoDB.")
+        # checkpoint az po potvrzeni zapisu, po padu se davka nanejvys zopakuje (upsert ji neduplikuje)
+        done_rows += len(batch)
+        state.save(done_rows, offset)
+
+    state.save(done_rows, offset, complete=True)
+    throughput.log(logger)
+
 
 def main():
-    mongo_client, mongo_name = mongo_basic.connect_to_mongoDB(MONGO_HOST, DB_NAME)
+    # pool musi stacit pro vsechna zapisujici vlakna
+    mongo_client, mongo_name = mongo_basic.connect_to_mongoDB(MONGO_HOST, DB_NAME, max_pool_size=max(WRITER_THREADS * 2, 10))
     if mongo_client is None:
         logger.error("Failed to connect to MongoDB.")
-        return  
+        return
     else: logger.info("Connected to MongoDB successfully.")
 
     collection_names = mongo_basic.get_collection_names(mongo_name)
     logger.info(f"Collections in the database: {collection_names}")
 
-    data = read_date_from_csv_to_pd("data/machine_data.csv")
-    
-    for start in range(0, len(data), chunk_size):
-        batch = data.iloc[start:start + chunk_size]
-        queue = collect_queue(batch)
-        if queue:
-            mongo_basic.insert_multiple_data(mongo_name, "machine_data", list(queue))
-            logger.info(f"Inserted batch of {len(queue)} records into MongoDB.")
-        time.sleep(30)  # Simulate delay between batches 
-        queue.clear()  # Clear the queue for the next batch
-    
+    # Collection layout, indexes and retention; key (machine_id, timestamp) is never written twice
+    timeseries = mongo_basic.setup_machine_data(
+        mongo_name, COLLECTION_NAME, TIMESERIES, TIMESERIES_GRANULARITY, RETENTION_DAYS
+    )
+    mongo_basic.setup_alerts(mongo_name, ALERTS_COLLECTION, ALERT_KEY)
 
-if __name__ == "__main__":
-   main() 
-   
-   
+    if parallel_ingest.is_multi_file(CSV_PATH):
+        ingest_many_files(mongo_name, timeseries)
+    else:
+        ingest_single_file(mongo_name, timeseries)
 
 
-    
\ No newline at end of file
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,37 @@
+import datetime
+import logging
+import os
+from libs import mongo_basic, columnar
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MONGO_HOST = os.getenv("MONGO_HOST", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("DB_NAME", "ukol03_mongodb")
+COLLECTION_NAME = "machine_data"
+
+# Export configuration
+EXPORT_DIR = os.getenv("EXPORT_DIR", "data/parquet")          # adresar datasetu date=YYYY-MM-DD/part-0.parquet
+EXPORT_DAYS = int(os.getenv("EXPORT_DAYS", 0))                 # 0 = cela kolekce, jinak poslednich N dni (vcetne dneska)
+ROW_GROUP_ROWS = int(os.getenv("ROW_GROUP_ROWS", columnar.ROW_GROUP_ROWS))
+
+
+def main():
+    """Export of machine_data into Parquet partitioned by day, for analyses without MongoDB and CSV parsing."""
+    mongo_client, mongo_name = mongo_basic.connect_to_mongoDB(MONGO_HOST, DB_NAME)
+    if mongo_client is None:
+        logger.error("Failed to connect to MongoDB.")
+        return
+
+    start = None
+    if EXPORT_DAYS > 0:
+        # cele dny, exportovany den se prepise vcetne dat vlozenych od minuleho exportu
+        today = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None).date()
+        start = datetime.datetime.combine(today - datetime.timedelta(days=EXPORT_DAYS - 1), datetime.time())
+
+    exported = columnar.export_collection(mongo_name, COLLECTION_NAME, EXPORT_DIR, start=start, row_group_rows=ROW_GROUP_ROWS)
+    logger.info(f"Exported {sum(exported.values())} rows in {len(exported)} daily partitions into {EXPORT_DIR}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+""" Rule engine evaluated on every ingested batch, alerts are raised before the batch is inserted """
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class MachineState:
+    """ Per-machine state of all rules in compact arrays, indexed by a machine code """
+
+    def __init__(self, capacity: int = 64):
+        self.codes: dict[str, int] = {}
+        self.capacity = capacity
+        self.arrays: dict[str, np.ndarray] = {}
+        self.fills: dict[str, object] = {}
+
+    def encode(self, machine_ids: np.ndarray) -> np.ndarray:
+        """ Map machine ids of a batch to integer codes, new machines get a new code """
+        uniques, inverse = np.unique(machine_ids, return_inverse=True)
+        unique_codes = np.empty(len(uniques), dtype=np.int64)
+        for i, machine_id in enumerate(uniques):
+            unique_codes[i] = self.codes.setdefault(machine_id, len(self.codes))
+        if len(self.codes) > self.capacity:
+            self._grow(len(self.codes))
+        return unique_codes[inverse]
+
+    def array(self, name: str, dtype, fill) -> np.ndarray:
+        """ State array of one rule, created on first use """
+        if name not in self.arrays:
+            self.arrays[name] = np.full(self.capacity, fill, dtype=dtype)
+            self.fills[name] = fill
+        return self.arrays[name]
+
+    def _grow(self, needed: int):
+        new_capacity = max(needed, self.capacity * 2)
+        for name, values in self.arrays.items():
+            grown = np.empty(new_capacity, dtype=values.dtype)
+            grown[:self.capacity] = values
+            grown[self.capacity:] = self.fills[name]
+            self.arrays[name] = grown
+        self.capacity = new_capacity
+
+
+class Batch:
+    """ One batch sorted by (machine, time) with the group boundaries precomputed for all rules """
+
+    def __init__(self, data: pd.DataFrame, state: MachineState):
+        codes = state.encode(data["machine_id"].astype(str).to_numpy())
+        times = data["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+        self.order = np.lexsort((times, codes))
+        self.data = data
+        self.codes = codes[self.order]
+        self.times = times[self.order]
+        self.first = np.ones(len(self.codes), dtype=bool)
+        self.first[1:] = self.codes[1:] != self.codes[:-1]
+        self.last = np.ones(len(self.codes), dtype=bool)
+        self.last[:-1] = self.first[1:]
+
+    def column(self, name: str, dtype=np.float64) -> np.ndarray:
+        """ Column of the batch in (machine, time) order """
+        return self.data[name].to_numpy(dtype=dtype)[self.order]
+
+    def previous(self, values: np.ndarray, carry: np.ndarray) -> np.ndarray:
+        """ Previous value of the same machine, the first row of a machine takes it from the state """
+        prev = np.empty_like(values)
+        prev[1:] = values[:-1]
+        prev[self.first] = carry[self.codes[self.first]]
+        return prev
+
+    def forward_fill(self, values: np.ndarray, defined: np.ndarray, carry: np.ndarray) -> np.ndarray:
+        """ Forward fill values where defined is False, within a machine, starting from the state """
+        values = values.copy()
+        start = self.first & ~defined
+        values[start] = carry[self.codes[start]]
+        defined = defined | self.first
+        index = np.where(defined, np.arange(len(values)), 0)
+        np.maximum.accumulate(index, out=index)
+        return values[index]
+
+    def store(self, state_array: np.ndarray, values: np.ndarray):
+        """ Save the value of the last row of every machine into the state """
+        state_array[self.codes[self.last]] = values[self.last]
+
+
+class ThresholdRule:
+    """ Value of a field above (or below) a static limit """
+
+    def __init__(self, name: str, field: str, limit: float, above: bool = True):
+        self.name, self.field, self.limit, self.above = name, field, limit, above
+
+    def evaluate(self, batch: Batch, state: MachineState) -> tuple[np.ndarray, np.ndarray]:
+        values = batch.column(self.field)
+        hits = values > self.limit if self.above else values < self.limit
+        return hits, values
+
+
+class RateOfChangeRule:
+    """ Change of a field faster than max_rate per second, compared to the previous reading of the machine """
+
+    def __init__(self, name: str, field: str, max_rate: float):
+        self.name, self.field, self.limit = name, field, max_rate
+
+    def evaluate(self, batch: Batch, state: MachineState) -> tuple[np.ndarray, np.ndarray]:
+        last_value = state.array(f"{self.name}_value", np.float64, np.nan)
+        last_time = state.array(f"{self.name}_time", np.float64, np.nan)
+        values = batch.column(self.field)
+        dt = batch.times - batch.previous(batch.times, last_time)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.abs(values - batch.previous(values, last_value)) / dt
+        hits = np.nan_to_num(rate, nan=0.0, posinf=0.0) > self.limit
+        batch.store(last_value, values)
+        batch.store(last_time, batch.times)
+        return hits, rate
+
+
+class ConsecutiveStatusRule:
+    """ N consecutive readings of a machine with the given status, raised once per run """
+
+    def __init__(self, name: str, status: str, count: int):
+        self.name, self.status, self.limit = name, status, count
+
+    def evaluate(self, batch: Batch, state: MachineState) -> tuple[np.ndarray, np.ndarray]:
+        carry = state.array(f"{self.name}_run", np.int64, 0)
+        matches = batch.column("status", dtype=object) == self.status
+        total = np.cumsum(matches)
+        # zacatek behu: radek bez chyby, nebo prvni radek stroje (pokracuje beh z minule davky)
+        reset = ~matches | batch.first
+        base = np.where(matches, total - 1, total)
+        base = np.where(batch.first & matches, base - carry[batch.codes], base)
+        run = total - batch.forward_fill(base, reset, np.zeros_like(carry))
+        batch.store(carry, run)
+        return run == self.limit, run.astype(np.float64)
+
+
+class HysteresisRule:
+    """ Alarm when a field rises above on_limit, cleared only after it drops below off_limit """
+
+    def __init__(self, name: str, field: str, on_limit: float, off_limit: float):
+        self.name, self.field, self.limit, self.off_limit = name, field, on_limit, off_limit
+
+    def evaluate(self, batch: Batch, state: MachineState) -> tuple[np.ndarray, np.ndarray]:
+        active_state = state.array(f"{self.name}_active", np.bool_, False)
+        values = batch.column(self.field)
+        switch_on = values > self.limit
+        switch_off = values < self.off_limit
+        active = batch.forward_fill(switch_on, switch_on | switch_off, active_state)
+        was_active = batch.previous(active, active_state)
+        batch.store(active_state, active)
+        return active & ~was_active, values
+
+
+class AlertEngine:
+    """ Evaluates all rules on a batch and keeps the per-machine state between batches """
+
+    def __init__(self, rules: list):
+        self.rules = rules
+        self.state = MachineState()
+
+    def evaluate(self, data: pd.DataFrame) -> list[dict]:
+        """
+        Evaluate the rules on one batch
+        :param data: Batch with machine_id, timestamp and the fields used by the rules
+        :return: Alert documents
+        """
+        if data.empty:
+            return []
+        batch = Batch(data, self.state)
+        alerts = []
+        for rule in self.rules:
+            hits, values = rule.evaluate(batch, self.state)
+            rows = batch.order[hits]
+            if len(rows) == 0:
+                continue
+            hit_data = data.iloc[rows]
+            for machine_id, plant_name, timestamp, value in zip(
+                hit_data["machine_id"].astype(str).tolist(),
+                hit_data["plant_name"].astype(str).tolist(),
+                hit_data["timestamp"].dt.to_pydatetime(),
+                values[hits].tolist(),
+            ):
+                alerts.append({
+                    "rule": rule.name,
+                    "machine_id": machine_id,
+                    "plant_name": plant_name,
+                    "timestamp": timestamp,
+                    "value": value,
+                    "limit": rule.limit,
+                })
+        return alerts
+
+
+def log_alerts(alerts: list[dict]):
+    """ Log sink of the alerts """
+    for alert in alerts:
+        logger.warning(
+            f"ALERT {alert['rule']}: machine {alert['machine_id']} ({alert['plant_name']}) "
+            f"at {alert['timestamp']}: value {alert['value']:.2f}, limit {alert['limit']}"
+        )
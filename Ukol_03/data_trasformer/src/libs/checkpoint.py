@@ -0,0 +1,103 @@
+""" Checkpoint of the CSV ingestion, so a restarted data_transformer continues where it stopped """
+
+import hashlib
+import itertools
+import json
+import logging
+import os
+
+# Bytes from the start of the file used as its fingerprint
+HASH_BYTES = 64 * 1024
+
+
+def file_fingerprint(path: str) -> str:
+    """
+    Hash of the beginning of the file.
+    An appended export keeps the fingerprint, a replaced file gets a new one.
+    :param path: Path to the CSV file
+    :return: sha256 hex digest
+    """
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read(HASH_BYTES)).hexdigest()
+
+
+def offset_after_rows(path: str, rows: int) -> int:
+    """
+    Byte offset after the header and the given number of lines, for checkpoints saved without an offset
+    :param path: Path to the CSV file
+    :param rows: Number of data lines
+    :return: Byte offset
+    """
+    with open(path, "rb") as f:
+        f.readline()
+        for _ in itertools.islice(f, rows):
+            pass
+        return f.tell()
+
+
+class Checkpoint:
+    """ Rows of one CSV file already acknowledged by MongoDB and the byte offset after them, stored as JSON """
+
+    def __init__(self, checkpoint_path: str, csv_path: str):
+        """
+        :param checkpoint_path: Where the checkpoint JSON is stored (must survive a container restart)
+        :param csv_path: CSV file which is ingested
+        """
+        self.checkpoint_path = checkpoint_path
+        self.csv_path = csv_path
+        self.fingerprint = file_fingerprint(csv_path)
+        self.rows = 0
+        self.offset = 0
+        self.size = 0
+
+    def load(self) -> int:
+        """
+        Load the checkpoint of the same file, reading continues from self.offset
+        :return: Number of rows already ingested, 0 if there is no checkpoint or the file changed
+        """
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable checkpoint {self.checkpoint_path}: {e}")
+            return 0
+
+        if saved.get("csv_path") != self.csv_path or saved.get("fingerprint") != self.fingerprint:
+            logging.info("Checkpoint belongs to another file, starting from the first row.")
+            return 0
+        self.rows = int(saved.get("rows", 0))
+        self.size = int(saved.get("size", 0))
+        if "offset" in saved:
+            self.offset = int(saved["offset"])
+        elif self.rows:
+            # checkpoint starsi verze, radky se projdou jen tentokrat
+            self.offset = offset_after_rows(self.csv_path, self.rows)
+        return self.rows
+
+    def is_complete(self) -> bool:
+        """ True if the whole file was already ingested and it did not grow since """
+        return self.size > 0 and self.size == os.path.getsize(self.csv_path)
+
+    def save(self, rows: int, offset: int, complete: bool = False):
+        """
+        Store the number of acknowledged rows, atomically via rename
+        :param rows: Rows of the file written to MongoDB so far
+        :param offset: Byte offset right after the last written row
+        :param complete: True after the last batch, remembers the file size
+        """
+        self.rows = rows
+        self.offset = offset
+        self.size = os.path.getsize(self.csv_path) if complete else 0
+        state = {
+            "csv_path": self.csv_path,
+            "fingerprint": self.fingerprint,
+            "rows": self.rows,
+            "offset": self.offset,
+            "size": self.size,
+        }
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
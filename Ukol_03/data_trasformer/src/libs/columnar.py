@@ -0,0 +1,261 @@
+""" Columnar copies of machine_data: Parquet partitioned by day and Arrow IPC streams """
+
+import datetime
+import io
+import itertools
+import logging
+import os
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Schema of machine_data in Arrow, texty jako dictionary (kategorie), mereni jako float32 jako v ingest.CSV_DTYPES
+SCHEMA = pa.schema([
+    ("plant_name", pa.dictionary(pa.int32(), pa.string())),
+    ("machine_id", pa.dictionary(pa.int32(), pa.string())),
+    ("timestamp", pa.timestamp("ms")),
+    ("temperature", pa.float32()),
+    ("power_usage", pa.float32()),
+    ("status", pa.dictionary(pa.int32(), pa.string())),
+    ("machine_hours", pa.int32()),
+])
+
+# Partition column of the exported dataset, directory date=YYYY-MM-DD
+PARTITION_FIELD = "date"
+
+ROW_GROUP_ROWS = 64 * 1024      # radku v jedne row group Parquet souboru
+BATCH_ROWS = 16 * 1024          # radku v jednom Arrow record batch (a jednom HTTP chunku)
+COMPRESSION = "zstd"
+
+PARQUET_MIME = "application/vnd.apache.parquet"
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+
+
+def schema_for(docs: list[dict]) -> pa.Schema:
+    """ Schema restricted to the fields present in the documents (projection fields=...) """
+    if not docs:
+        return SCHEMA
+    present = docs[0].keys()
+    return pa.schema([field for field in SCHEMA if field.name in present])
+
+
+def to_batch(docs: list[dict], schema: pa.Schema) -> pa.RecordBatch:
+    """
+    Convert Mongo documents to one Arrow record batch, column by column
+    :param docs: Documents of machine_data
+    :param schema: Target schema, see schema_for
+    :return: RecordBatch
+    """
+    columns = []
+    for field in schema:
+        values = [doc.get(field.name) for doc in docs]
+        if pa.types.is_dictionary(field.type):
+            columns.append(pa.array(values, pa.string()).dictionary_encode())
+        else:
+            columns.append(pa.array(values, field.type, safe=False))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def _batches(docs, batch_rows: int):
+    """ Iterable of documents -> (schema, generator of record batches), reads one batch at a time """
+    docs = iter(docs)
+    first = list(itertools.islice(docs, batch_rows))
+    schema = schema_for(first)
+
+    def generate():
+        chunk = first
+        while chunk:
+            yield to_batch(chunk, schema)
+            chunk = list(itertools.islice(docs, batch_rows))
+
+    return schema, generate()
+
+
+class _Sink(io.RawIOBase):
+    """ Write-only file collecting bytes until take() is called, for streaming of writer output """
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def encode_arrow(docs, batch_rows: int = BATCH_ROWS):
+    """
+    Encode documents as an Arrow IPC stream.
+    :param docs: Iterable of documents (pymongo cursor)
+    :param batch_rows: Rows per record batch
+    :return: Generator of encoded bytes, one record batch at a time
+    """
+    schema, batches = _batches(docs, batch_rows)
+    sink = _Sink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()
+
+
+def encode_parquet(docs, batch_rows: int = BATCH_ROWS):
+    """
+    Encode documents as one Parquet file, every batch is a row group written as soon as it is ready.
+    :param docs: Iterable of documents (pymongo cursor)
+    :param batch_rows: Rows per row group
+    :return: Generator of encoded bytes, the footer comes in the last chunk
+    """
+    schema, batches = _batches(docs, batch_rows)
+    sink = _Sink()
+    with pq.ParquetWriter(sink, schema, compression=COMPRESSION) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()
+
+
+# format= parametr HTTP serveru -> (content type, encoder)
+ENCODERS = {
+    "parquet": (PARQUET_MIME, encode_parquet),
+    "arrow": (ARROW_MIME, encode_arrow),
+}
+
+
+def _partition_path(root: str, day: datetime.date) -> str:
+    return os.path.join(root, f"{PARTITION_FIELD}={day.isoformat()}", "part-0.parquet")
+
+
+def export_collection(
+    db,
+    collection_name: str,
+    root: str,
+    start: datetime.datetime | None = None,
+    end: datetime.datetime | None = None,
+    row_group_rows: int = ROW_GROUP_ROWS,
+) -> dict[str, int]:
+    """
+    Export machine_data into Parquet files partitioned by day, <root>/date=YYYY-MM-DD/part-0.parquet.
+    The cursor is read in timestamp order and only one row group is held in memory. A day is written
+    to a temporary file and renamed at the end, so an exported day is replaced as a whole and readers
+    never see a half written file.
+    :param db: MongoDB database object
+    :param collection_name: Source collection
+    :param root: Dataset directory
+    :param start: First exported time (inclusive), None = from the beginning
+    :param end: End of the export (exclusive), None = up to the newest document
+    :param row_group_rows: Rows per row group
+    :return: Day (YYYY-MM-DD) -> number of exported rows
+    """
+    time_window = {}
+    if start is not None:
+        time_window["$gte"] = start
+    if end is not None:
+        time_window["$lt"] = end
+    cursor = db[collection_name].find(
+        {"timestamp": time_window} if time_window else {},
+        {"_id": 0},
+        sort=[("timestamp", 1)],
+        batch_size=row_group_rows,
+    )
+
+    exported = {}
+    day, writer, tmp_path, rows = None, None, None, []
+
+    def flush():
+        if rows:
+            writer.write_batch(to_batch(rows, SCHEMA), row_group_size=row_group_rows)
+            exported[day.isoformat()] += len(rows)
+            rows.clear()
+
+    def close():
+        if writer is not None:
+            flush()
+            writer.close()
+            os.replace(tmp_path, _partition_path(root, day))
+            logging.info(f"Exported {exported[day.isoformat()]} rows of {day} into {root}")
+
+    try:
+        for doc in cursor:
+            doc_day = doc["timestamp"].date()
+            if doc_day != day:
+                close()
+                day = doc_day
+                path = _partition_path(root, day)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # tecka na zacatku: pyarrow.dataset rozepsany soubor ignoruje
+                tmp_path = os.path.join(os.path.dirname(path), "." + os.path.basename(path) + ".tmp")
+                writer = pq.ParquetWriter(tmp_path, SCHEMA, compression=COMPRESSION)
+                exported[day.isoformat()] = 0
+            rows.append(doc)
+            if len(rows) >= row_group_rows:
+                flush()
+        close()
+    finally:
+        cursor.close()
+    return exported
+
+
+def _utc_naive(value: datetime.datetime) -> datetime.datetime:
+    """ Mongo (a tedy i export) uklada naive cas v UTC """
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def load(
+    root: str,
+    columns: list[str] | None = None,
+    start: datetime.datetime | None = None,
+    end: datetime.datetime | None = None,
+    filters: dict | None = None,
+):
+    """
+    Load the exported dataset into pandas, reading only the needed columns, partitions and row groups.
+    Days outside start/end are skipped by the partition directory, row groups by their min/max statistics.
+    :param root: Dataset directory written by export_collection
+    :param columns: Columns to read, None = all
+    :param start: First time (inclusive)
+    :param end: End time (exclusive)
+    :param filters: Equality filters, e.g. {"machine_id": "M_01", "status": ["error", "IDLE"]}
+    :return: pandas DataFrame, text columns as category
+    """
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    expression = None
+
+    def add(condition):
+        nonlocal expression
+        expression = condition if expression is None else expression & condition
+
+    if start is not None:
+        start = _utc_naive(start)
+        add(ds.field(PARTITION_FIELD) >= start.date().isoformat())
+        add(ds.field("timestamp") >= pa.scalar(start, pa.timestamp("ms")))
+    if end is not None:
+        end = _utc_naive(end)
+        add(ds.field(PARTITION_FIELD) <= end.date().isoformat())
+        add(ds.field("timestamp") < pa.scalar(end, pa.timestamp("ms")))
+    for name, value in (filters or {}).items():
+        if isinstance(value, (list, tuple, set)):
+            add(ds.field(name).isin(list(value)))
+        else:
+            add(ds.field(name) == value)
+
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != PARTITION_FIELD]
+    table = dataset.to_table(columns=columns, filter=expression)
+    return table.to_pandas()
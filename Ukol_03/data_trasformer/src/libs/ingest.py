@@ -0,0 +1,309 @@
+""" Bulk ingestion helpers for data_transform.py: streaming CSV reader, vectorized records and replay rate policies """
+
+import io
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Explicit dtypes of machine_data.csv, categories and float32 keep the chunks small
+CSV_DTYPES = {
+    "plant_name": "category",
+    "machine_id": "category",
+    "status": "category",
+    "temperature": "float32",
+    "power_usage": "float32",
+}
+CSV_DATE_COLUMNS = ["timestamp"]
+
+
+def float32_to_float(values: np.ndarray) -> np.ndarray:
+    """
+    Widen float32 to float64 without the float32 noise (12.3 -> 12.300000190734863).
+    Values are rounded to the 7 significant digits float32 can hold, so MongoDB
+    stores the same numbers as written in the CSV.
+    :param values: float32 array
+    :return: float64 array
+    """
+    wide = values.astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude = np.floor(np.log10(np.abs(wide)))
+    decimals = np.clip(np.where(np.isfinite(magnitude), 6 - magnitude, 0), 0, 15)
+    scale = 10.0 ** decimals
+    return np.where(np.isfinite(wide), np.round(wide * scale) / scale, wide)
+
+
+def to_records(data: pd.DataFrame) -> list[dict]:
+    """
+    Convert a DataFrame slice to BSON ready documents.
+    Every column is converted at once with tolist() to native Python types
+    (datetime64 -> datetime, numpy float/int -> float/int, category -> str), no per-row pandas calls.
+    :param data: DataFrame with the timestamp column already parsed as datetime64
+    :return: List of documents
+    """
+    columns = []
+    for name in data.columns:
+        column = data[name]
+        if pd.api.types.is_datetime64_any_dtype(column):
+            values = list(column.dt.to_pydatetime())
+        elif column.dtype == np.float32:
+            values = float32_to_float(column.to_numpy()).tolist()
+        else:
+            values = column.tolist()
+        columns.append(values)
+    names = list(data.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+# Bajty ctene najednou pri hledani koncu radku
+READ_BYTES = 4 * 1024 * 1024
+
+
+def _newlines(data: bytes, start: int = 0) -> np.ndarray:
+    """ Positions of the line ends in data, shifted by start """
+    return start + np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n"))
+
+
+def _blank_rows(block: bytes, ends: np.ndarray) -> list[int]:
+    """ Positions of the empty lines of a block, pandas skips them """
+    starts = np.concatenate(([0], ends[:-1]))
+    return [i for i in np.flatnonzero(ends - starts <= 2) if not block[starts[i]:ends[i]].strip()]
+
+
+def read_csv_chunks(path: str, chunk_rows: int, offset: int = 0):
+    """
+    Read a CSV file in chunks with explicit dtypes, only one chunk is in memory.
+    Soubor se cte po blocich bajtu a konce radku se hledaji v numpy, u kazdeho radku je tak znamy
+    jeho konec v souboru a po restartu se skoci seek() rovnou za posledni zapsany radek,
+    driv nactene radky se znovu netokenizuji.
+    Hodnoty s koncem radku uvnitr uvozovek nejsou podporovane, export strojovych dat je nema.
+    :param path: Path to the CSV file
+    :param chunk_rows: Number of rows parsed at once
+    :param offset: Byte offset of the first row to read (see checkpoint.Checkpoint), 0 = right after the header
+    :return: Generator of (DataFrame, byte offset after every row of it)
+    """
+    with open(path, "rb") as f:
+        columns = pd.read_csv(io.BytesIO(f.readline()), nrows=0).columns.tolist()
+        position = max(offset, f.tell())
+        f.seek(position)
+        pending = b""
+        eof = False
+        while True:
+            newlines = _newlines(pending)
+            while len(newlines) < chunk_rows and not eof:
+                data = f.read(READ_BYTES)
+                eof = not data
+                newlines = np.concatenate((newlines, _newlines(data, len(pending))))
+                pending += data
+            ends = newlines[:chunk_rows] + 1
+            if eof and len(ends) < chunk_rows and len(pending) > (ends[-1] if len(ends) else 0):
+                # posledni radek bez koncoveho b"\n"
+                ends = np.append(ends, len(pending))
+            if len(ends) == 0:
+                return
+            block, pending = pending[:ends[-1]], pending[ends[-1]:]
+            row_ends = position + ends
+            position += len(block)
+            blank = _blank_rows(block, ends)
+            if blank:
+                row_ends = np.delete(row_ends, blank)
+            if len(row_ends) == 0:
+                continue
+            chunk = pd.read_csv(
+                io.BytesIO(block), header=None, names=columns,
+                dtype=CSV_DTYPES, parse_dates=CSV_DATE_COLUMNS,
+            )
+            if len(chunk) != len(row_ends):
+                raise ValueError(f"{path}: rows split over several lines are not supported")
+            yield chunk, row_ends
+
+
+def stream_batches(path: str, batch_size: int, chunk_rows: int, max_queued: int, offset: int = 0):
+    """
+    Parse the CSV in a background thread and hand batches over a bounded queue.
+    The reader blocks when max_queued batches wait for insert, so the peak memory
+    is one parsed chunk plus max_queued batches, whatever the file size.
+    :param path: Path to the CSV file
+    :param batch_size: Rows per yielded batch
+    :param chunk_rows: Rows parsed by pandas at once
+    :param max_queued: Maximum number of batches waiting in the queue
+    :param offset: Byte offset to continue from, see read_csv_chunks
+    :return: Generator of (DataFrame batch, byte offset right after its last row)
+    """
+    batches = queue.Queue(maxsize=max_queued)
+    done = object()
+    stop = threading.Event()
+
+    def reader():
+        try:
+            for chunk, ends in read_csv_chunks(path, chunk_rows, offset):
+                for start in range(0, len(chunk), batch_size):
+                    if stop.is_set():
+                        return
+                    batch = chunk.iloc[start:start + batch_size]
+                    batches.put((batch, int(ends[start + len(batch) - 1])))
+            batches.put(done)
+        except Exception as e:
+            batches.put(e)
+
+    thread = threading.Thread(target=reader, name="csv-reader", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = batches.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # konzument skoncil predcasne, uvolni ctecku blokovanou na plne fronte
+        stop.set()
+        while thread.is_alive():
+            try:
+                batches.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+class AsFastAsPossible:
+    """ No pacing, used for backfill """
+
+    def wait(self, batch: pd.DataFrame):
+        pass
+
+
+class FixedRate:
+    """ Insert at most rows_per_second rows per second """
+
+    def __init__(self, rows_per_second: float):
+        self.interval_per_row = 1.0 / rows_per_second
+        self.next_time = None
+
+    def wait(self, batch: pd.DataFrame):
+        now = time.monotonic()
+        if self.next_time is not None and self.next_time > now:
+            time.sleep(self.next_time - now)
+        self.next_time = max(now, self.next_time or now) + len(batch) * self.interval_per_row
+
+
+class RealTimeReplay:
+    """ Replay batches with the same time gaps as in the timestamp column, optionally sped up """
+
+    def __init__(self, speedup: float = 1.0, time_column: str = "timestamp"):
+        self.speedup = speedup
+        self.time_column = time_column
+        self.start_wall = None
+        self.start_data = None
+
+    def wait(self, batch: pd.DataFrame):
+        first = batch[self.time_column].iloc[0]
+        if self.start_wall is None:
+            self.start_wall, self.start_data = time.monotonic(), first
+            return
+        due = self.start_wall + (first - self.start_data).total_seconds() / self.speedup
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def make_rate_policy(name: str, rows_per_second: float, speedup: float):
+    """
+    Create the replay pacing from configuration
+    :param name: fast, fixed or realtime
+    :param rows_per_second: Rate of the fixed policy
+    :param speedup: Speedup of the realtime policy
+    :return: Object with wait(batch) called before every batch
+    """
+    if name == "fast":
+        return AsFastAsPossible()
+    if name == "fixed":
+        return FixedRate(rows_per_second)
+    if name == "realtime":
+        return RealTimeReplay(speedup)
+    raise ValueError(f"Unknown rate policy '{name}', use fast, fixed or realtime")
+
+
+class Throughput:
+    """ Thread-safe counter of inserted rows and rows/s """
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.rows = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, rows: int, seconds: float):
+        """ Record one written batch and the time spent writing it """
+        with self._lock:
+            self.rows += rows
+            self.busy += seconds
+
+    def log(self, logger: logging.Logger):
+        elapsed = time.monotonic() - self.start
+        total_rate = self.rows / elapsed if elapsed else 0.0
+        logger.info(
+            f"Ingested {self.rows} rows in {elapsed:.1f} s, "
+            f"{total_rate:,.0f} rows/s overall, {self.busy:.1f} s spent in writes"
+        )
+
+
+def _write_benchmark_csv(path: str, rows: int, machines: int = 50, block: int = 1_000_000):
+    """ machine_data.csv with rows readings, generated in blocks by numpy """
+    start = np.datetime64("2025-01-01T00:00:00")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("plant_name,machine_id,timestamp,temperature,power_usage,status,machine_hours\n")
+        for first in range(0, rows, block):
+            i = np.arange(first, min(first + block, rows))
+            pd.DataFrame({
+                "plant_name": np.where(i % 2 == 0, "Hala_A", "Hala_B"),
+                "machine_id": np.char.add("M_", (i % machines).astype(str)),
+                "timestamp": (start + i // machines).astype("datetime64[s]"),
+                "temperature": 80.0 + i % 170 * 0.1,
+                "power_usage": 12.0 + i % 30 * 0.1,
+                "status": np.where(i % 97 == 0, "error", "operational"),
+                "machine_hours": 1000 + i // 3600,
+            }).to_csv(f, header=False, index=False, float_format="%.1f")
+
+
+def _peak_rss_mb() -> float:
+    """ VmHWM of this process (Linux), ru_maxrss would include the parent's peak from before fork/exec """
+    with open("/proc/self/status", encoding="ascii") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:")) / 1024
+
+
+def _measure_reader(path: str, chunk_rows: int, result):
+    """ read_csv_chunks + to_records over the whole file in a fresh process, peak RSS of that process """
+    imported_mb = _peak_rss_mb()
+    begin = time.perf_counter()
+    rows = 0
+    for chunk, _ in read_csv_chunks(path, chunk_rows):
+        rows += len(to_records(chunk))
+    result.put((rows, time.perf_counter() - begin, imported_mb, _peak_rss_mb()))
+
+
+if __name__ == "__main__":
+    # python -m libs.ingest: propustnost a spicka pameti (RSS) streamovaneho cteni, bez MongoDB
+    import multiprocessing
+    import os
+    import tempfile
+
+    rows = int(os.getenv("BENCH_ROWS", 10_000_000))
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "machine_data.csv")
+        begin = time.perf_counter()
+        _write_benchmark_csv(path, rows)
+        print(f"{rows:,} rows, {os.path.getsize(path) / 1e6:.0f} MB generated in {time.perf_counter() - begin:.1f} s")
+        for chunk_rows in (10_000, 100_000, 1_000_000):
+            # kazde mereni ve vlastnim procesu, aby spicka RSS nezahrnovala generovani ani predchozi beh
+            result = context.Queue()
+            process = context.Process(target=_measure_reader, args=(path, chunk_rows, result))
+            process.start()
+            parsed, seconds, imported_mb, peak_mb = result.get()
+            process.join()
+            print(f"chunk_rows {chunk_rows:>9,}: {parsed / seconds:>10,.0f} rows/s, {seconds:6.1f} s, "
+                  f"peak RSS {peak_mb:6.0f} MB ({imported_mb:.0f} MB after imports)")
@@ -0,0 +1,386 @@
+""" Asynchronous Modbus TCP polling of the machines, registers are decoded into machine_data batches """
+
+import asyncio
+import datetime
+import json
+import logging
+from dataclasses import dataclass
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from pymodbus.client import AsyncModbusTcpClient
+from pymodbus.exceptions import ModbusException
+
+logger = logging.getLogger(__name__)
+
+# Datove typy registru, hodnoty jsou v registrech big-endian (slovo i bajty)
+REGISTER_DTYPES = {
+    "uint16": ">u2",
+    "int16": ">i2",
+    "uint32": ">u4",
+    "int32": ">i4",
+    "float32": ">f4",
+}
+
+
+class Register(NamedTuple):
+    """ One value of the device: first holding register, data type and scale of integer values """
+    address: int
+    dtype: str
+    scale: float = 1.0
+
+    @property
+    def count(self) -> int:
+        return np.dtype(REGISTER_DTYPES[self.dtype]).itemsize // 2
+
+
+# Rozlozeni holding registru stroje, pole odpovidaji dokumentu machine_data
+REGISTER_MAP = {
+    "temperature": Register(0, "float32"),
+    "power_usage": Register(2, "float32"),
+    "machine_hours": Register(4, "uint32"),
+    "status": Register(6, "uint16"),
+}
+STATUS_CODES = {0: "operational", 1: "IDLE", 2: "maintenance", 3: "error"}
+
+MAX_BLOCK_REGISTERS = 125   # limit protokolu pro jedno cteni holding registru
+MAX_GAP_REGISTERS = 8       # mezera mezi hodnotami, kterou se jeste vyplati precist misto dalsiho dotazu
+STATS_WINDOW = 256          # poslednich N cteni pro latenci a jitter
+
+
+@dataclass
+class Device:
+    machine_id: str
+    plant_name: str
+    host: str
+    port: int = 502
+    unit: int = 1
+
+
+def load_devices(path: str) -> list[Device]:
+    """
+    Devices from a JSON file
+    :param path: JSON list of {"machine_id", "plant_name", "host", "port", "unit"}
+    :return: List of devices
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [Device(**item) for item in json.load(f)]
+
+
+def plan_reads(
+    register_map: dict[str, Register],
+    max_gap: int = MAX_GAP_REGISTERS,
+    max_block: int = MAX_BLOCK_REGISTERS,
+) -> list[tuple[int, int]]:
+    """
+    Coalesce the registers into the fewest block reads
+    :param register_map: Field -> Register
+    :param max_gap: Unused registers between two values that are still read in one block
+    :param max_block: Maximum registers of one read
+    :return: List of (start address, count)
+    """
+    spans = sorted((reg.address, reg.address + reg.count) for reg in register_map.values())
+    blocks = []
+    start, end = spans[0]
+    for span_start, span_end in spans[1:]:
+        if span_start - end <= max_gap and max(end, span_end) - start <= max_block:
+            end = max(end, span_end)
+        else:
+            blocks.append((start, end - start))
+            start, end = span_start, span_end
+    blocks.append((start, end - start))
+    return blocks
+
+
+class ReadPlan:
+    """
+    Block reads of a register map and the position of every field in the concatenated blocks.
+    Registry vsech zarizeni jedne davky jsou jedna matice (zarizeni x registry), kazde pole se
+    dekoduje jednim pohledem na jeji sloupce.
+    """
+
+    def __init__(self, register_map: dict[str, Register] = REGISTER_MAP, max_gap: int = MAX_GAP_REGISTERS, max_block: int = MAX_BLOCK_REGISTERS):
+        self.register_map = register_map
+        self.blocks = plan_reads(register_map, max_gap, max_block)
+        self.width = sum(count for _, count in self.blocks)
+        # adresa registru -> sloupec v matici spojenych bloku
+        column, self.offsets = 0, {}
+        for start, count in self.blocks:
+            for address in range(start, start + count):
+                self.offsets[address] = column
+                column += 1
+
+    def decode(self, registers: np.ndarray) -> dict[str, np.ndarray]:
+        """
+        Decode a batch of readings
+        :param registers: (readings, width) uint16 matrix, blocks concatenated in the order of self.blocks
+        :return: Field -> values of all readings
+        """
+        raw = np.ascontiguousarray(registers, dtype=">u2")
+        result = {}
+        for name, reg in self.register_map.items():
+            offset = self.offsets[reg.address]
+            values = np.ascontiguousarray(raw[:, offset:offset + reg.count]).view(REGISTER_DTYPES[reg.dtype])[:, 0]
+            result[name] = values * reg.scale if reg.scale != 1.0 else values.astype(values.dtype.newbyteorder("="))
+        return result
+
+
+class DeviceStats:
+    """ Poll latency, jitter (spread of the intervals between polls) and error counters of one device """
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.latency = np.zeros(window)
+        self.intervals = np.zeros(window)
+        self.window = window
+        self.polls = 0
+        self.errors = 0
+        self.missed = 0           # vynechane periody, cteni nestihlo interval
+        self.last_start = None
+
+    def record(self, started: float, latency: float):
+        if self.last_start is not None:
+            self.intervals[self.polls % self.window] = started - self.last_start
+        self.latency[self.polls % self.window] = latency
+        self.last_start = started
+        self.polls += 1
+
+    def summary(self) -> dict:
+        n = min(self.polls, self.window)
+        latency = self.latency[:n]
+        intervals = self.intervals[:n][self.intervals[:n] > 0]
+        return {
+            "polls": self.polls,
+            "errors": self.errors,
+            "missed": self.missed,
+            "latency_ms_mean": float(latency.mean() * 1000) if n else None,
+            "latency_ms_p95": float(np.percentile(latency, 95) * 1000) if n else None,
+            "latency_ms_max": float(latency.max() * 1000) if n else None,
+            "jitter_ms": float(intervals.std() * 1000) if len(intervals) > 1 else None,
+        }
+
+
+class ModbusPoller:
+    """
+    Polls all devices concurrently on a fixed interval, every device has its own schedule
+    (rozlozene v ramci intervalu, aby se dotazy nepotkaly najednou). Zarizeni na stejnem
+    host:port sdileji jedno TCP spojeni, dotazy se na nem posilaji soubezne (transaction id).
+    Readings are collected and handed to the sink as one DataFrame per batch, the sink runs
+    in a thread so a slow database write never delays the polls. Kdyz sink nestiha a ceka na nej
+    max_pending davek, dalsi davky se zahodi a pocitaji (dropped), cteni se kvuli tomu nezastavi.
+    """
+
+    def __init__(
+        self,
+        devices: list[Device],
+        sink,
+        interval: float = 1.0,
+        plan: ReadPlan | None = None,
+        max_concurrent: int = 256,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        timeout: float = 1.0,
+        max_pending: int = 4,
+    ):
+        """
+        :param devices: Polled devices
+        :param sink: Callable(DataFrame) with the machine_data columns, called from a worker thread
+        :param interval: Seconds between two polls of one device
+        :param plan: Register map and its block reads
+        :param max_concurrent: Maximum devices read at the same time
+        :param batch_size: Readings per sink call at most
+        :param flush_interval: Seconds after which a non-full batch is handed to the sink
+        :param timeout: Timeout of one Modbus request
+        :param max_pending: Batches waiting for the sink at most, further batches are dropped
+        """
+        self.devices = devices
+        self.sink = sink
+        self.interval = interval
+        self.plan = plan or ReadPlan()
+        self.max_concurrent = max_concurrent
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.stats = [DeviceStats() for _ in devices]
+        self.written = 0
+        self.sink_errors = 0
+        self.dropped = 0
+        self.dropped_batches = 0
+        self._clients: dict[tuple[str, int], AsyncModbusTcpClient] = {}
+        self._connect_locks: dict[tuple[str, int], asyncio.Lock] = {}
+        self._stop = None
+
+    async def _client(self, device: Device) -> AsyncModbusTcpClient:
+        key = (device.host, device.port)
+        # spojeni navazuje jen prvni zarizeni, ostatni na stejnem host:port na nej pockaji
+        async with self._connect_locks.setdefault(key, asyncio.Lock()):
+            client = self._clients.get(key)
+            if client is None:
+                client = AsyncModbusTcpClient(device.host, port=device.port, timeout=self.timeout, retries=0)
+                self._clients[key] = client
+            if not client.connected and not await client.connect():
+                raise ConnectionError(f"Cannot connect to {device.host}:{device.port}")
+        return client
+
+    async def _read(self, device: Device) -> np.ndarray:
+        """ All blocks of one device, read concurrently """
+        client = await self._client(device)
+        responses = await asyncio.gather(*[
+            client.read_holding_registers(start, count=count, device_id=device.unit) for start, count in self.plan.blocks
+        ])
+        for response in responses:
+            if response.isError():
+                raise ModbusException(f"{device.machine_id}: {response}")
+        return np.concatenate([response.registers for response in responses]).astype(np.uint16)
+
+    async def _poll_device(self, index: int, readings: asyncio.Queue, semaphore: asyncio.Semaphore):
+        device, stats = self.devices[index], self.stats[index]
+        loop = asyncio.get_running_loop()
+        scheduled = loop.time() + self.interval * index / len(self.devices)
+        while not self._stop.is_set():
+            await asyncio.sleep(max(scheduled - loop.time(), 0))
+            started = loop.time()
+            # MongoDB uklada cas v milisekundach, klic (machine_id, timestamp) tak odpovida ulozenemu dokumentu
+            now = datetime.datetime.now(datetime.timezone.utc)
+            timestamp = now.replace(tzinfo=None, microsecond=now.microsecond // 1000 * 1000)
+            try:
+                async with semaphore:
+                    registers = await self._read(device)
+                stats.record(started, loop.time() - started)
+                await readings.put((index, timestamp, registers))
+            except (ModbusException, OSError, asyncio.TimeoutError) as e:
+                stats.errors += 1
+                logger.debug(f"Poll of {device.machine_id} failed: {e}")
+            # zpozdene cteni nedohani zmeskane periody, pokracuje dalsi celou periodou
+            scheduled += self.interval
+            behind = loop.time() - scheduled
+            if behind > 0:
+                skipped = int(behind // self.interval) + 1
+                stats.missed += skipped
+                scheduled += skipped * self.interval
+
+    def to_frame(self, batch: list[tuple[int, datetime.datetime, np.ndarray]]) -> pd.DataFrame:
+        """ Readings of one batch as a DataFrame with the machine_data columns """
+        index = np.array([item[0] for item in batch])
+        values = self.plan.decode(np.stack([item[2] for item in batch]))
+        machines = np.array([device.machine_id for device in self.devices])
+        plants = np.array([device.plant_name for device in self.devices])
+        data = {
+            "plant_name": pd.Categorical(plants[index]),
+            "machine_id": pd.Categorical(machines[index]),
+            "timestamp": pd.to_datetime([item[1] for item in batch]),
+        }
+        for name, column in values.items():
+            if name == "status":
+                codes = pd.Series(column).map(STATUS_CODES).fillna("unknown")
+                data[name] = pd.Categorical(codes)
+            else:
+                data[name] = column
+        return pd.DataFrame(data)
+
+    async def _write_loop(self, readings: asyncio.Queue, batches: asyncio.Queue):
+        """ Collects readings into batches until the None sentinel put by run() after the last poll """
+        loop = asyncio.get_running_loop()
+        batch = []
+        deadline = loop.time() + self.flush_interval
+        while True:
+            try:
+                item = await asyncio.wait_for(readings.get(), max(deadline - loop.time(), 0.01))
+            except asyncio.TimeoutError:
+                item = ()
+            if item is None:
+                break
+            if item:
+                batch.append(item)
+            if len(batch) >= self.batch_size or (batch and loop.time() >= deadline):
+                self._hand_over(batches, batch)
+                batch = []
+            if loop.time() >= deadline:
+                deadline = loop.time() + self.flush_interval
+        # posledni davka po zastaveni se nezahazuje, sink uz nic dalsiho nedostane
+        if batch:
+            await batches.put(batch)
+        await batches.put(None)
+
+    def _hand_over(self, batches: asyncio.Queue, batch: list):
+        """ Batch to the sink task without waiting, dropped when max_pending batches already wait """
+        try:
+            batches.put_nowait(batch)
+        except asyncio.QueueFull:
+            self.dropped += len(batch)
+            self.dropped_batches += 1
+            logger.warning(f"Sink is behind by {self.max_pending} batches, {len(batch)} readings dropped")
+
+    async def _sink_loop(self, batches: asyncio.Queue):
+        """ Hands batches to the sink one at a time until the None sentinel of _write_loop """
+        while (batch := await batches.get()) is not None:
+            await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        frame = self.to_frame(batch)
+        try:
+            await asyncio.to_thread(self.sink, frame)
+            self.written += len(frame)
+        except Exception as e:
+            self.sink_errors += 1
+            logger.error(f"Writing {len(frame)} readings failed: {e}")
+
+    async def run(self, duration: float | None = None):
+        """
+        Poll until stop() is called or for duration seconds
+        :param duration: Seconds of polling, None = until stop()
+        """
+        self._stop = asyncio.Event()
+        readings = asyncio.Queue(maxsize=self.batch_size * 4)
+        batches = asyncio.Queue(maxsize=self.max_pending)
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        pollers = [asyncio.create_task(self._poll_device(i, readings, semaphore)) for i in range(len(self.devices))]
+        writer = asyncio.create_task(self._write_loop(readings, batches))
+        sink = asyncio.create_task(self._sink_loop(batches))
+        try:
+            if duration is None:
+                await self._stop.wait()
+            else:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), duration)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._stop.set()
+            await asyncio.gather(*pollers, return_exceptions=True)
+            await readings.put(None)
+            await writer
+            await sink
+            for client in self._clients.values():
+                client.close()
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    def summary(self) -> dict:
+        """ Totals over all devices: polls, errors, latency percentiles and the worst jitter """
+        per_device = [stats.summary() for stats in self.stats]
+        latency = np.concatenate([stats.latency[:min(stats.polls, stats.window)] for stats in self.stats])
+        jitter = [item["jitter_ms"] for item in per_device if item["jitter_ms"] is not None]
+        return {
+            "devices": len(self.devices),
+            "polls": sum(item["polls"] for item in per_device),
+            "errors": sum(item["errors"] for item in per_device),
+            "missed": sum(item["missed"] for item in per_device),
+            "written": self.written,
+            "sink_errors": self.sink_errors,
+            "dropped": self.dropped,
+            "latency_ms_p50": float(np.percentile(latency, 50) * 1000) if len(latency) else None,
+            "latency_ms_p95": float(np.percentile(latency, 95) * 1000) if len(latency) else None,
+            "jitter_ms_max": max(jitter) if jitter else None,
+        }
+
+    def log(self, log: logging.Logger = logger):
+        summary = self.summary()
+        log.info(
+            f"Modbus: {summary['devices']} devices, {summary['polls']} polls, {summary['errors']} errors, "
+            f"{summary['missed']} missed, {summary['written']} written, {summary['dropped']} dropped, latency p50 {summary['latency_ms_p50'] or 0:.1f} ms "
+            f"p95 {summary['latency_ms_p95'] or 0:.1f} ms, max jitter {summary['jitter_ms_max'] or 0:.1f} ms"
+        )
@@ -1,21 +1,49 @@
 """ Script for basic operations with mongoDB database for ukol03 """
 
 import logging
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+import threading
+from contextlib import ExitStack
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import ConnectionFailure, BulkWriteError, OperationFailure, CollectionInvalid
 from datetime import datetime, timezone
 import time
 
-def connect_to_mongoDB(path: str, db_name: str) -> MongoClient:
+# Collection with the data version of other collections, see bump_data_version
+DATA_VERSION_COLLECTION = "data_versions"
+
+# Pre-aggregated rollups of machine_data: name -> bucket length in seconds (coarsest last)
+ROLLUP_RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+# Fields of machine_data returned by analyze_machine_data, the rest is dropped before the window stage
+ANALYSIS_FIELDS = ["plant_name", "machine_id", "timestamp", "temperature", "power_usage", "status", "machine_hours"]
+
+# Server error code of create_collection on an existing collection
+NAMESPACE_EXISTS = 48
+
+# Zamky zapisu do time-series kolekci: (kolekce, hodnoty klice bez casu, napr. machine_id) -> Lock
+_series_locks: dict[tuple, threading.Lock] = {}
+_series_locks_guard = threading.Lock()
+
+# Indexes of machine_data used by the HTTP server filters and by the idempotent ingestion
+MACHINE_DATA_INDEXES = [
+    # klic dokumentu (machine_id, timestamp), unikatni jen u obycejne kolekce
+    ([("machine_id", 1), ("timestamp", 1)], {"unique": True}),
+    ([("status", 1), ("timestamp", 1)], {}),
+    # (timestamp, _id) je klic strankovani HTTP serveru
+    ([("timestamp", 1), ("_id", 1)], {}),
+]
+
+def connect_to_mongoDB(path: str, db_name: str, max_pool_size: int = 100) -> MongoClient:
     """ 
     Connect to MongoDB database 
     :param path: MongoDB connection string
     :param db_name: Name of the database to connect to
+    :param max_pool_size: Maximum number of connections, should be at least the number of writer threads
     
     :return: MongoDB database object    
     """
     try:
-        client = MongoClient(path, serverSelectionTimeoutMS=5000)
+        client = MongoClient(path, serverSelectionTimeoutMS=5000, maxPoolSize=max_pool_size)
         # Trigger a server selection to verify connection
         client.server_info()
         db = client[db_name]
@@ -59,6 +87,221 @@ def insert_multiple_data(db, collection_name: str, data_list: list[dict]):
     result = collection.insert_many(data_list)
     logging.info(f"Inserted {len(result.inserted_ids)} documents into collection '{collection_name}'")
 
+def insert_bulk(db, collection_name: str, data_list: list[dict], ordered: bool = False) -> int:
+    """ 
+    Insert a batch of documents with one bulk write
+    :param db: MongoDB database object
+    :param collection_name: Name of the collection to insert data into
+    :param data_list: List of data dictionaries to insert
+    :param ordered: False = the server may apply the writes in parallel and continues after an error
+    :return: Number of inserted documents
+    """
+    collection = db[collection_name]
+    try:
+        inserted = len(collection.insert_many(data_list, ordered=ordered).inserted_ids)
+    except BulkWriteError as e:
+        logging.error(f"Bulk insert into '{collection_name}' failed for {len(e.details['writeErrors'])} documents")
+        inserted = e.details["nInserted"]
+    if inserted:
+        bump_data_version(db, collection_name)
+    return inserted
+
+def upsert_bulk(db, collection_name: str, data_list: list[dict], keys: tuple[str, ...], timeseries: bool = False) -> list[int]:
+    """ 
+    Idempotent bulk insert, a document whose key already exists is left untouched.
+    Plain collection: upserts on the unique index of keys, no key is ever stored twice, whoever writes.
+    Time-series collection (no unique index): see _insert_new_only, the guarantee holds only within one process.
+    :param db: MongoDB database object
+    :param collection_name: Name of the collection to write to
+    :param data_list: List of data dictionaries
+    :param keys: Fields identifying a document, e.g. ("machine_id", "timestamp")
+    :param timeseries: True for a time-series collection, which supports neither upserts nor unique indexes
+    :return: Positions in data_list of the newly inserted documents
+    """
+    collection = db[collection_name]
+    if timeseries:
+        inserted = _insert_new_only(collection, data_list, keys)
+    else:
+        operations = [
+            UpdateOne({key: doc[key] for key in keys}, {"$setOnInsert": doc}, upsert=True)
+            for doc in data_list
+        ]
+        try:
+            inserted = sorted(collection.bulk_write(operations, ordered=False).upserted_ids)
+        except BulkWriteError as e:
+            logging.error(f"Bulk upsert into '{collection_name}' failed for {len(e.details['writeErrors'])} documents")
+            inserted = sorted(item["index"] for item in e.details["upserted"])
+    if inserted:
+        bump_data_version(db, collection_name)
+    return inserted
+
+def _lock_series(stack: ExitStack, collection_name: str, series: set[tuple]):
+    """ Take the locks of all series of a batch, always in the same order, so two writers never deadlock """
+    with _series_locks_guard:
+        locks = [_series_locks.setdefault((collection_name,) + item, threading.Lock()) for item in sorted(series)]
+    for lock in locks:
+        stack.enter_context(lock)
+
+def _insert_new_only(collection, data_list: list[dict], keys: tuple[str, ...]) -> list[int]:
+    """ 
+    Insert only documents whose key is neither stored yet nor repeated earlier in the batch, one indexed lookup per batch.
+    Time-series kolekce nema unikatni index, hledani a vlozeni se proto pro kazdou serii (klic bez casu,
+    napr. machine_id) serializuje zamkem: vlakna jednoho procesu (zapisovaci vlakna, Modbus poller) klic
+    nikdy nevlozi dvakrat. Dva procesy zapisujici soucasne stejny stroj to zarucit nemohou, pro takove
+    nasazeni je potreba obycejna kolekce s unikatnim indexem (TIMESERIES=0).
+    :param collection: Time-series collection
+    :param data_list: List of data dictionaries
+    :param keys: Fields identifying a document, the time field last
+    :return: Positions in data_list of the newly inserted documents
+    """
+    time_key, other_keys = keys[-1], keys[:-1]
+    first = {}
+    for i, doc in enumerate(data_list):
+        first.setdefault(tuple(doc[key] for key in keys), i)
+
+    with ExitStack() as stack:
+        _lock_series(stack, collection.name, {key[:-1] for key in first})
+        times = [key[-1] for key in first]
+        lookup = {time_key: {"$gte": min(times), "$lte": max(times)}}
+        for position, key in enumerate(other_keys):
+            lookup[key] = {"$in": list({item[position] for item in first})}
+        projection = {key: 1 for key in keys}
+        projection["_id"] = 0
+        existing = {tuple(doc[key] for key in keys) for doc in collection.find(lookup, projection)}
+
+        positions = sorted(i for key, i in first.items() if key not in existing)
+        if not positions:
+            return []
+        try:
+            collection.insert_many([data_list[i] for i in positions], ordered=False)
+            return positions
+        except BulkWriteError as e:
+            logging.error(f"Bulk insert into '{collection.name}' failed for {len(e.details['writeErrors'])} documents")
+            failed = {error["index"] for error in e.details["writeErrors"]}
+            return [position for i, position in enumerate(positions) if i not in failed]
+
+def bump_data_version(db, collection_name: str):
+    """ 
+    Increase the data version of a collection after a write.
+    Readers (HTTP server cache) compare it to find out that new data arrived.
+    :param db: MongoDB database object
+    :param collection_name: Name of the written collection
+    """
+    db[DATA_VERSION_COLLECTION].update_one(
+        {"_id": collection_name},
+        {"$inc": {"version": 1}, "$currentDate": {"updated": True}},
+        upsert=True,
+    )
+
+def read_data_version(db, collection_name: str) -> tuple:
+    """ 
+    Cheap fingerprint of the collection content: version from bump_data_version
+    and the newest (timestamp, _id) key, both read by a single index seek
+    :param db: MongoDB database object
+    :param collection_name: Name of the collection
+    :return: Version tuple
+    """
+    marker = db[DATA_VERSION_COLLECTION].find_one({"_id": collection_name})
+    newest = db[collection_name].find_one(
+        {}, {"timestamp": 1}, sort=[("timestamp", -1), ("_id", -1)]
+    )
+    return (
+        marker["version"] if marker else 0,
+        (str(newest.get("timestamp")), str(newest["_id"])) if newest else None,
+    )
+
+def rollup_collection_name(collection_name: str, resolution: str) -> str:
+    """ machine_data, 1h -> machine_data_rollup_1h """
+    return f"{collection_name}_rollup_{resolution}"
+
+def setup_machine_data(
+    db,
+    collection_name: str = "machine_data",
+    timeseries: bool = False,
+    granularity: str = "seconds",
+    retention_days: float = 0,
+) -> bool:
+    """ 
+    Create the machine_data collection with its indexes and retention, safe to call at every start
+    :param db: MongoDB database object
+    :param collection_name: Name of the collection
+    :param timeseries: Create a new collection as time-series (timeField=timestamp, metaField=machine_id),
+        without the unique key index, see _insert_new_only
+    :param granularity: Time-series granularity: seconds, minutes or hours
+    :param retention_days: Documents older than this are removed automatically, 0 = keep forever
+    :return: True if the collection is a time-series collection
+    """
+    expire_after = int(retention_days * 24 * 3600) if retention_days > 0 else None
+    existing = {c["name"]: c for c in db.list_collections(filter={"name": collection_name})}
+
+    if collection_name not in existing:
+        options = {}
+        if timeseries:
+            # machine_id jako metaField - jedna serie na stroj, dotazy na stroj ctou jen jeho buckety
+            options["timeseries"] = {"timeField": "timestamp", "metaField": "machine_id", "granularity": granularity}
+            if expire_after:
+                options["expireAfterSeconds"] = expire_after
+        try:
+            db.create_collection(collection_name, **options)
+            logging.info(f"Created collection '{collection_name}' ({'time-series' if timeseries else 'plain'})")
+        except (CollectionInvalid, OperationFailure) as e:
+            if isinstance(e, OperationFailure) and e.code != NAMESPACE_EXISTS:
+                raise
+            # http_server a data_transformer startuji soucasne, kolekci mezitim zalozil ten druhy
+            logging.info(f"Collection '{collection_name}' was created by another process")
+            existing = {c["name"]: c for c in db.list_collections(filter={"name": collection_name})}
+
+    if collection_name not in existing:
+        is_timeseries = timeseries
+    else:
+        is_timeseries = existing[collection_name].get("type") == "timeseries"
+        if timeseries and not is_timeseries:
+            logging.warning(f"Collection '{collection_name}' already exists as a plain collection, it is not converted.")
+
+    collection = db[collection_name]
+    for keys, options in MACHINE_DATA_INDEXES:
+        if is_timeseries:
+            # time-series kolekce nepodporuje unikatni indexy
+            options = {k: v for k, v in options.items() if k != "unique"}
+        try:
+            collection.create_index(keys, **options)
+        except OperationFailure as e:
+            # napr. unikatni index nad kolekci, ve ktere uz jsou duplicity
+            logging.error(f"Could not create index {keys} on '{collection_name}': {e}")
+
+    # Rollup collections, one document per machine and bucket
+    for resolution in ROLLUP_RESOLUTIONS:
+        db[rollup_collection_name(collection_name, resolution)].create_index(
+            [("machine_id", 1), ("bucket", 1)], unique=True
+        )
+
+    # Retention
+    if is_timeseries and collection_name in existing:
+        if existing[collection_name].get("options", {}).get("expireAfterSeconds") != expire_after:
+            try:
+                db.command("collMod", collection_name, expireAfterSeconds=expire_after or "off")
+            except OperationFailure as e:
+                logging.error(f"Could not change retention of '{collection_name}': {e}")
+    elif not is_timeseries:
+        if expire_after:
+            collection.create_index([("timestamp", 1)], expireAfterSeconds=expire_after, name="timestamp_ttl")
+        elif "timestamp_ttl" in collection.index_information():
+            collection.drop_index("timestamp_ttl")
+    return is_timeseries
+
+def setup_alerts(db, collection_name: str = "alerts", keys: tuple[str, ...] = ("rule", "machine_id", "timestamp")):
+    """ 
+    Unique index of the alerts collection, alerts are written with upsert_bulk on this key
+    :param db: MongoDB database object
+    :param collection_name: Name of the alerts collection
+    :param keys: Fields identifying one alert
+    """
+    try:
+        db[collection_name].create_index([(key, 1) for key in keys], unique=True)
+    except OperationFailure as e:
+        # napr. duplicitni alarmy zapsane starsi verzi
+        logging.error(f"Could not create index {keys} on '{collection_name}': {e}")
+
 def clear_collection(db, collection_name: str):
     """ 
     Clear all data from a MongoDB collection
@@ -69,42 +312,133 @@ def clear_collection(db, collection_name: str):
     result = collection.delete_many({})
     logging.info(f"Cleared {result.deleted_count} documents from collection '{collection_name}'")
 
-def read_data_from_collection(db, collection_name: str):
+def analysis_pipeline(
+    context_size: int = 3,
+    temperature_limit: float = 95,
+    power_limit: float = 14,
+    error_status: str = "error",
+    max_documents: int = 1000,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> list[dict]:
+    """ 
+    Aggregation of analyze_machine_data: errors with their preceding context and threshold violations in one $facet.
+    Casovy rozsah se filtruje jako prvni (index timestamp) a z dokumentu zustanou jen ANALYSIS_FIELDS, az pak
+    bezi $facet. Stage uvnitr $facet index nepouziji: $setWindowFields radi cely vybrany rozsah podle
+    (machine_id, timestamp) v pameti, nad limit 100 MB na stage jen s allowDiskUse (viz analyze_machine_data).
+    :param context_size: Number of preceding documents of the same machine returned with every error
+    :param temperature_limit: Temperature above this value is a violation (°C)
+    :param power_limit: Power usage above this value is a violation (kW)
+    :param error_status: Value of status marking an error
+    :param max_documents: Maximum number of returned documents per category
+    :param start: First analyzed time (inclusive), None = from the beginning
+    :param end: End of the analyzed range (exclusive), None = up to the newest document
+    :return: Aggregation pipeline
+    """
+    time_window = {}
+    if start is not None:
+        time_window["$gte"] = start
+    if end is not None:
+        time_window["$lt"] = end
+    stages = [{"$match": {"timestamp": time_window}}] if time_window else []
+    return stages + [
+        {"$project": {"_id": 0, **{name: 1 for name in ANALYSIS_FIELDS}}},
+        {"$facet": {
+            "errors": [
+                # predchozi zaznamy stejneho stroje, misto jednoho find() na kazdou chybu;
+                # kontext chyb tesne po start je jen z dokumentu uvnitr rozsahu
+                {"$setWindowFields": {
+                    "partitionBy": "$machine_id",
+                    "sortBy": {"timestamp": 1},
+                    "output": {"previous": {"$push": "$$ROOT", "window": {"documents": [-context_size, -1]}}},
+                }},
+                {"$match": {"status": error_status}},
+                {"$sort": {"timestamp": -1}},
+                {"$limit": max_documents},
+            ],
+            "errors_count": [{"$match": {"status": error_status}}, {"$count": "n"}],
+            "high_temperature": [
+                {"$match": {"temperature": {"$gt": temperature_limit}}},
+                {"$limit": max_documents},
+            ],
+            "high_temperature_count": [{"$match": {"temperature": {"$gt": temperature_limit}}}, {"$count": "n"}],
+            "high_power": [
+                {"$match": {"power_usage": {"$gt": power_limit}}},
+                {"$limit": max_documents},
+            ],
+            "high_power_count": [{"$match": {"power_usage": {"$gt": power_limit}}}, {"$count": "n"}],
+        }},
+    ]
+
+def analyze_machine_data(
+    db,
+    collection_name: str,
+    context_size: int = 3,
+    temperature_limit: float = 95,
+    power_limit: float = 14,
+    error_status: str = "error",
+    max_documents: int = 1000,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> dict:
     """ 
-    Read data from a MongoDB collection
+    Errors with their preceding context and threshold violations in one aggregation (one round trip).
+    Runs with allowDiskUse=True: the window stage sorts the whole analyzed range and would fail over
+    the 100 MB memory limit without it, on a large collection limit the range by start/end.
     :param db: MongoDB database object
-    :param collection_name: Name of the collection to read data from
-    :return: List of documents in the collection
+    :param collection_name: Name of the collection to analyze
+    :param context_size: Number of preceding documents of the same machine returned with every error
+    :param temperature_limit: Temperature above this value is a violation (°C)
+    :param power_limit: Power usage above this value is a violation (kW)
+    :param error_status: Value of status marking an error
+    :param max_documents: Maximum number of returned documents per category, counts are always complete
+    :param start: First analyzed time (inclusive), None = from the beginning
+    :param end: End of the analyzed range (exclusive), None = up to the newest document
+    :return: Dictionary with total (documents in the range), errors, high_temperature, high_power and their counts
     """
     collection = db[collection_name]
-    documents = list(collection.find())
-    logging.info(f"Read {len(documents)} documents from collection '{collection_name}'")
-
-    # Read documents with status "error" and log three previous documents
-    read_errors = list(collection.find({"status": "error"}).sort("timestamp", - 1))
-    count_errors = len(read_errors)
-    logging.info(f"Found {count_errors} error documents.")
-    for error in read_errors:
+    pipeline = analysis_pipeline(context_size, temperature_limit, power_limit, error_status, max_documents, start, end)
+    result = next(collection.aggregate(pipeline, allowDiskUse=True))
+    if start is None and end is None:
+        analysis = {"total": collection.estimated_document_count()}
+    else:
+        analysis = {"total": collection.count_documents(pipeline[0]["$match"])}
+    for name in ["errors", "high_temperature", "high_power"]:
+        counted = result[f"{name}_count"]
+        analysis[name] = result[name]
+        analysis[f"{name}_count"] = counted[0]["n"] if counted else 0
+    return analysis
+
+def read_data_from_collection(db, collection_name: str, temperature_limit: float = 95, power_limit: float = 14):
+    """ 
+    Read data from a MongoDB collection and log errors and threshold violations
+    :param db: MongoDB database object
+    :param collection_name: Name of the collection to read data from
+    :param temperature_limit: Temperature warning threshold (°C)
+    :param power_limit: Power usage warning threshold (kW)
+    :return: Result of analyze_machine_data
+    """
+    analysis = analyze_machine_data(db, collection_name, 3, temperature_limit, power_limit)
+    logging.info(f"Collection '{collection_name}' holds {analysis['total']} documents")
+
+    # Documents with status "error" and three previous documents of the same machine
+    logging.info(f"Found {analysis['errors_count']} error documents.")
+    for error in analysis["errors"]:
+        previous = error.pop("previous")
         logging.info(f"Error document: {error}")
-        three_previous = collection.find(
-            {"timestamp": {"$lt": error["timestamp"]}}
-        ).sort("timestamp", -1).limit(3)
-        for prev in three_previous:
+        for prev in reversed(previous):
             logging.info(f"Previous document before error: {prev}")
 
-    # Read documents with temperature above 95°C and warn in log
-    high_temp_docs = collection.find({"temperature": {"$gt": 95}})
-    count_temperature_warnings = collection.count_documents({"temperature": {"$gt": 95}})
-    logging.info(f"Found {count_temperature_warnings} high temperature documents.")
-    for doc in high_temp_docs:
+    # Documents with temperature above the limit
+    logging.info(f"Found {analysis['high_temperature_count']} high temperature documents.")
+    for doc in analysis["high_temperature"]:
         logging.warning(f"High temperature document: {doc}")
-    
-    # Read documents with power usage over 14 kW and warn in log
-    high_power_docs = collection.find({"power_usage": {"$gt": 14 }})
-    count_power_warnings = collection.count_documents({"power_usage": {"$gt": 14}})
-    logging.info(f"Found {count_power_warnings} high power usage documents.")
-    for doc in high_power_docs:
+
+    # Documents with power usage above the limit
+    logging.info(f"Found {analysis['high_power_count']} high power usage documents.")
+    for doc in analysis["high_power"]:
         logging.warning(f"High power usage document: {doc}")
+    return analysis
 
 
 def main():
@@ -0,0 +1,233 @@
+""" Parallel ingestion of many CSV files: parsing in a process pool, writing in a pool of threads """
+
+import glob
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from libs import ingest, mongo_basic, checkpoint, rollups
+
+# Fronta davek z procesu parseru, nastavi ji _init_worker v kazdem procesu
+_record_queue = None
+_batch_size = 0
+_chunk_rows = 0
+
+
+def resolve_inputs(path: str) -> list[str]:
+    """
+    Expand the input to a list of CSV files
+    :param path: Single file, directory (all *.csv inside) or glob pattern
+    :return: Sorted list of paths
+    """
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*.csv")))
+    return sorted(glob.glob(path))
+
+
+def is_multi_file(path: str) -> bool:
+    """ True if the input is a directory or a glob pattern """
+    return os.path.isdir(path) or glob.has_magic(path)
+
+
+def _init_worker(record_queue, batch_size: int, chunk_rows: int):
+    global _record_queue, _batch_size, _chunk_rows
+    _record_queue, _batch_size, _chunk_rows = record_queue, batch_size, chunk_rows
+
+
+def parse_file(path: str) -> int:
+    """
+    Parse one CSV file in a worker process and put its documents to the shared queue
+    :param path: Path to the CSV file
+    :return: Number of parsed rows
+    """
+    rows = 0
+    for chunk, _ in ingest.read_csv_chunks(path, _chunk_rows):
+        records = ingest.to_records(chunk)
+        for start in range(0, len(records), _batch_size):
+            _record_queue.put(records[start:start + _batch_size])
+        rows += len(records)
+    return rows
+
+
+def run_pipeline(
+    files: list[str],
+    write,
+    parse_workers: int,
+    writer_threads: int,
+    batch_size: int,
+    chunk_rows: int,
+    max_queued: int,
+    throughput: ingest.Throughput,
+) -> tuple[dict[str, int], bool]:
+    """
+    Parse the files in parse_workers processes and hand their batches to write() in writer_threads threads
+    :param files: CSV files
+    :param write: Callable(list of documents) called from the writer threads
+    :param throughput: Counter of the written rows
+    :return: (path -> parsed rows of the successfully parsed files, True if a write failed)
+    """
+    # spawn: procesy parseru nededi MongoClient ani vlakna rodice
+    context = multiprocessing.get_context("spawn")
+    record_queue = context.Queue(maxsize=max_queued)
+    failed = threading.Event()
+
+    def writer():
+        while True:
+            batch = record_queue.get()
+            if batch is None:
+                return
+            write_start = time.monotonic()
+            try:
+                write(batch)
+            except Exception as e:
+                logging.error(f"Writer failed: {e}")
+                failed.set()
+                continue
+            throughput.add(len(batch), time.monotonic() - write_start)
+
+    writers = [threading.Thread(target=writer, name=f"mongo-writer-{i}") for i in range(writer_threads)]
+    for thread in writers:
+        thread.start()
+
+    parsed = {}
+    try:
+        with ProcessPoolExecutor(
+            max_workers=parse_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(record_queue, batch_size, chunk_rows),
+        ) as pool:
+            futures = {path: pool.submit(parse_file, path) for path in files}
+            for path, future in futures.items():
+                try:
+                    parsed[path] = future.result()
+                except Exception as e:
+                    logging.error(f"Parsing {path} failed: {e}")
+    finally:
+        for _ in writers:
+            record_queue.put(None)
+        for thread in writers:
+            thread.join()
+    return parsed, failed.is_set()
+
+
+def ingest_files(
+    db,
+    collection_name: str,
+    files: list[str],
+    keys: tuple[str, ...],
+    timeseries: bool,
+    checkpoint_dir: str,
+    parse_workers: int,
+    writer_threads: int,
+    batch_size: int,
+    chunk_rows: int,
+    max_queued: int,
+) -> ingest.Throughput:
+    """
+    Ingest many CSV files at once.
+    CPU bound parsing runs in parse_workers processes, I/O bound writes run in
+    writer_threads threads sharing the MongoClient connection pool of db.
+    Already completed files (see checkpoint.Checkpoint) are skipped.
+    :param db: MongoDB database object
+    :param collection_name: Target collection
+    :param files: CSV files to ingest
+    :param keys: Unique document key for the idempotent upserts
+    :param timeseries: True if the collection is a time-series collection, see mongo_basic.upsert_bulk
+    :param checkpoint_dir: Directory with one checkpoint per CSV file
+    :param parse_workers: Number of parser processes
+    :param writer_threads: Number of writer threads
+    :param batch_size: Documents per bulk write
+    :param chunk_rows: Rows parsed by pandas at once
+    :param max_queued: Maximum number of batches waiting between parsers and writers
+    :return: Throughput of the run
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    states = {}
+    for path in files:
+        state = checkpoint.Checkpoint(os.path.join(checkpoint_dir, os.path.basename(path) + ".checkpoint.json"), path)
+        state.load()
+        if state.is_complete():
+            logging.info(f"{path} was already ingested, skipping.")
+        else:
+            states[path] = state
+
+    throughput = ingest.Throughput()
+    if not states:
+        return throughput
+
+    rollup_builder = rollups.RollupBuilder(collection_name)
+
+    def write(batch: list[dict]):
+        mongo_basic.upsert_bulk(db, collection_name, batch, keys, timeseries)
+        # davky prichazeji mimo poradi, rollup se prepocita z kolekce (viz rollups.RollupBuilder)
+        rollup_builder.apply(db, pd.DataFrame(batch))
+
+    parsed, failed = run_pipeline(list(states), write, parse_workers, writer_threads, batch_size, chunk_rows, max_queued, throughput)
+
+    # soubor je hotovy, az kdyz jsou zapsane vsechny jeho davky; pri chybe zapisu se prijde znovu (upsert)
+    if not failed:
+        for path, rows in parsed.items():
+            states[path].save(rows, os.path.getsize(path), complete=True)
+            logging.info(f"Ingested {path}: {rows} rows.")
+    return throughput
+
+
+def benchmark(files: list[str], steps=(1, 2, 4, 8), make_write=None, writer_threads: int = 4, batch_size: int = 1000, chunk_rows: int = 100_000) -> dict[int, float]:
+    """
+    Rows per second of run_pipeline for 1/2/4/8 parser processes
+    :param files: CSV files parsed in every step
+    :param make_write: Called before every step, returns the write callable of the writers; None = parse only
+    :return: Parser processes -> rows/s
+    """
+    result = {}
+    for workers in steps:
+        write = make_write() if make_write else None
+        throughput = ingest.Throughput()
+        start = time.perf_counter()
+        run_pipeline(files, write or (lambda batch: None), workers, writer_threads, batch_size, chunk_rows, 64, throughput)
+        result[workers] = throughput.rows / (time.perf_counter() - start)
+    return result
+
+
+def scratch_writer(db, collection_name: str):
+    """ Write path of ingest_files into an emptied scratch collection, for benchmark() """
+    # kazdy krok zapisuje do prazdne kolekce, jinak by upserty nic nevkladaly
+    for name in [collection_name] + [mongo_basic.rollup_collection_name(collection_name, r) for r in mongo_basic.ROLLUP_RESOLUTIONS]:
+        db.drop_collection(name)
+    mongo_basic.setup_machine_data(db, collection_name, timeseries=False)
+    builder = rollups.RollupBuilder(collection_name)
+
+    def write(batch: list[dict]):
+        mongo_basic.upsert_bulk(db, collection_name, batch, ("machine_id", "timestamp"))
+        builder.apply(db, pd.DataFrame(batch))
+    return write
+
+
+if __name__ == "__main__":
+    # python -m libs.parallel_ingest; MONGO_HOST=... zapisuje i do MongoDB (scratch kolekce), jinak jen parsovani
+    import datetime
+    import tempfile
+
+    file_count, rows = 8, int(os.getenv("BENCH_ROWS", 250_000))
+    with tempfile.TemporaryDirectory() as directory:
+        for n in range(file_count):
+            with open(os.path.join(directory, f"machine_data_{n}.csv"), "w", encoding="utf-8") as f:
+                f.write("plant_name,machine_id,timestamp,temperature,power_usage,status,machine_hours\n")
+                start_time = datetime.datetime(2025, 1, 1) + datetime.timedelta(days=n)
+                f.writelines(
+                    f"Hala_A,M_{n:02d}{i % 10},{start_time + datetime.timedelta(seconds=i // 10):%Y-%m-%d %H:%M:%S},"
+                    f"{80 + i % 20}.5,12.3,operational,{1000 + i}\n" for i in range(rows)
+                )
+        make_write = None
+        if os.getenv("MONGO_HOST"):
+            client, db = mongo_basic.connect_to_mongoDB(os.environ["MONGO_HOST"], os.getenv("DB_NAME", "ukol03_mongodb"))
+            make_write = lambda: scratch_writer(db, "machine_data_parallel_benchmark")
+        print(f"{file_count} files x {rows} rows, {os.cpu_count()} CPUs, {'MongoDB' if make_write else 'parse only'}")
+        for workers, rate in benchmark(resolve_inputs(directory), make_write=make_write).items():
+            print(f"{workers} parser processes: {rate:,.0f} rows/s")
@@ -0,0 +1,195 @@
+""" 1 min / 1 h / 1 day rollups of machine_data, the buckets touched by every inserted batch are recomputed """
+
+import datetime
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from libs import mongo_basic
+
+# Mezera mezi dvema merenimi stroje, nad kterou se cas nepocita do energie ani do casu ve stavu
+MAX_GAP_SECONDS = 300
+
+# Jak se pole rollupu slucuji do hrubsiho bucketu
+SUM_FIELDS = ["count", "temperature_sum", "power_usage_sum", "machine_hours_sum", "energy_kwh"]
+MIN_FIELDS = ["temperature_min", "power_usage_min"]
+MAX_FIELDS = ["temperature_max", "power_usage_max", "machine_hours_max"]
+STATUS_PREFIX = "status_seconds."
+
+
+def _numeric(frame: pd.DataFrame, name: str) -> np.ndarray:
+    """ Column as float64, NaN where the documents do not have it """
+    if name not in frame:
+        return np.full(len(frame), np.nan)
+    return pd.to_numeric(frame[name], errors="coerce").to_numpy(dtype=np.float64)
+
+
+def reading_frame(docs: list[dict], previous: dict[str, datetime.datetime]) -> pd.DataFrame:
+    """
+    Raw readings as one-reading rollups: dt since the previous reading of the same machine,
+    energy and seconds in the status of the reading
+    :param docs: Raw documents, any order
+    :param previous: machine_id -> last reading before the documents (for dt of the first one)
+    :return: DataFrame with machine_id, plant_name, timestamp and the rollup fields
+    """
+    frame = pd.DataFrame(docs).sort_values(["machine_id", "timestamp"], kind="stable")
+    timestamp = pd.to_datetime(frame["timestamp"])
+    before = timestamp.groupby(frame["machine_id"].to_numpy()).shift(1)
+    carried = pd.to_datetime(frame["machine_id"].map(previous))
+    before = before.where(before.notna(), carried)
+    dt = (timestamp - before).dt.total_seconds().to_numpy()
+    # prvni mereni stroje nebo mezera v datech se nepocitaji
+    dt = np.where((dt > 0) & (dt <= MAX_GAP_SECONDS), dt, 0.0)
+
+    temperature, power = _numeric(frame, "temperature"), _numeric(frame, "power_usage")
+    hours = _numeric(frame, "machine_hours")
+    readings = pd.DataFrame({
+        "machine_id": frame["machine_id"].astype(str).to_numpy(),
+        "plant_name": frame["plant_name"].astype(str).to_numpy() if "plant_name" in frame else None,
+        "timestamp": timestamp.to_numpy(),
+        "count": 1,
+        "temperature_sum": temperature, "temperature_min": temperature, "temperature_max": temperature,
+        "power_usage_sum": power, "power_usage_min": power, "power_usage_max": power,
+        "machine_hours_sum": hours, "machine_hours_max": hours,
+        "energy_kwh": np.nan_to_num(power) * dt / 3600.0,
+    })
+    status = frame["status"].astype(str).to_numpy()
+    for name in np.unique(status):
+        readings[STATUS_PREFIX + name] = np.where(status == name, dt, np.nan)
+    return readings
+
+
+def rollup_frame(docs: list[dict]) -> pd.DataFrame:
+    """ Stored rollup documents with status_seconds flattened to status_seconds.<status> columns """
+    frame = pd.DataFrame(docs)
+    statuses = frame.pop("status_seconds") if "status_seconds" in frame else pd.Series(None, index=frame.index)
+    statuses = pd.DataFrame([item or {} for item in statuses], index=frame.index)
+    return frame.join(statuses.add_prefix(STATUS_PREFIX))
+
+
+def summarize(frame: pd.DataFrame, seconds: int, time_column: str) -> list[dict]:
+    """
+    Readings or finer rollups merged into buckets of the given length
+    :param frame: Output of reading_frame or rollup_frame
+    :param seconds: Bucket length
+    :param time_column: timestamp (readings) or bucket (finer rollups)
+    :return: Rollup documents (machine_id, bucket, plant_name, fields, status_seconds)
+    """
+    frame = frame.assign(bucket=pd.to_datetime(frame[time_column]).dt.floor(f"{seconds}s"))
+    grouped = frame.groupby(["machine_id", "bucket"], sort=False)
+    status_columns = [name for name in frame.columns if name.startswith(STATUS_PREFIX)]
+    parts = [
+        grouped["plant_name"].first(),
+        grouped[SUM_FIELDS].sum(min_count=1),
+        grouped[MIN_FIELDS].min(),
+        grouped[MAX_FIELDS].max(),
+        grouped[status_columns].sum(min_count=1),
+    ]
+    docs = []
+    for (machine_id, bucket), row in zip(parts[0].index, pd.concat(parts, axis=1).to_dict("records")):
+        doc = {"machine_id": machine_id, "bucket": bucket.to_pydatetime(), "plant_name": row["plant_name"]}
+        for name in SUM_FIELDS + MIN_FIELDS + MAX_FIELDS:
+            doc[name] = None if pd.isna(row[name]) else row[name]
+        doc["count"] = int(doc["count"] or 0)
+        doc["energy_kwh"] = doc["energy_kwh"] or 0.0
+        # jen stavy, ve kterych stroj v bucketu byl
+        doc["status_seconds"] = {
+            name[len(STATUS_PREFIX):]: float(row[name]) for name in status_columns if not pd.isna(row[name])
+        }
+        docs.append(doc)
+    return docs
+
+
+class RollupBuilder:
+    """
+    Keeps the rollup collections up to date. The buckets touched by a batch are recomputed and
+    replaced: the finest resolution from the raw readings, every coarser one from the finer rollup.
+    Prepocet nezavisi na tom, co uz v rollupu je, takze zopakovana davka (pad mezi zapisem a checkpointem),
+    davky mimo poradi i vice zapisujicich vlaken daji stejny vysledek. Prepocty jedne instance se
+    serializuji zamkem; dva procesy zapisujici soucasne stejne stroje by se mohly prepsat starsim stavem.
+    """
+
+    def __init__(self, collection_name: str, resolutions: dict[str, int] = mongo_basic.ROLLUP_RESOLUTIONS):
+        """
+        :param collection_name: Raw collection, rollups are stored next to it (see mongo_basic.rollup_collection_name)
+        :param resolutions: Rollup name -> bucket length in seconds, finest first, each a multiple of the previous one
+        """
+        self.collection_name = collection_name
+        self.resolutions = resolutions
+        self._lock = threading.Lock()
+
+    def _previous_readings(self, db, machines: list[str], start: datetime.datetime) -> dict[str, datetime.datetime]:
+        """ Last reading of every machine at most MAX_GAP_SECONDS before start, one index seek per machine """
+        pipeline = [
+            {"$match": {
+                "machine_id": {"$in": machines},
+                "timestamp": {"$gte": start - datetime.timedelta(seconds=MAX_GAP_SECONDS), "$lt": start},
+            }},
+            {"$sort": {"machine_id": 1, "timestamp": -1}},
+            {"$group": {"_id": "$machine_id", "timestamp": {"$first": "$timestamp"}}},
+        ]
+        return {doc["_id"]: doc["timestamp"] for doc in db[self.collection_name].aggregate(pipeline)}
+
+    def _write(self, db, resolution: str, docs: list[dict]):
+        rollup_name = mongo_basic.rollup_collection_name(self.collection_name, resolution)
+        operations = [
+            UpdateOne({"machine_id": doc["machine_id"], "bucket": doc["bucket"]}, {"$set": doc}, upsert=True)
+            for doc in docs
+        ]
+        try:
+            db[rollup_name].bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            logging.error(f"Rollup update of '{rollup_name}' failed for {len(e.details['writeErrors'])} buckets")
+
+    def rebuild(self, db, machines: list[str], first: datetime.datetime, last: datetime.datetime):
+        """
+        Recompute all rollup buckets of the machines that a reading in [first, last] can change.
+        Novy zaznam meni dt i nasledujiciho mereni, proto se prepocita jeste MAX_GAP_SECONDS za last.
+        :param db: MongoDB database object
+        :param machines: machine_id of the written readings
+        :param first: Oldest written timestamp
+        :param last: Newest written timestamp
+        """
+        (finest, seconds), *coarser = self.resolutions.items()
+        start = pd.Timestamp(first).floor(f"{seconds}s").to_pydatetime()
+        end = (pd.Timestamp(last) + pd.Timedelta(seconds=MAX_GAP_SECONDS)).floor(f"{seconds}s").to_pydatetime() \
+            + datetime.timedelta(seconds=seconds)
+        with self._lock:
+            raw = list(db[self.collection_name].find(
+                {"machine_id": {"$in": machines}, "timestamp": {"$gte": start, "$lt": end}}, {"_id": 0}
+            ))
+            if not raw:
+                return
+            readings = reading_frame(raw, self._previous_readings(db, machines, start))
+            self._write(db, finest, summarize(readings, seconds, "timestamp"))
+
+            finer = finest
+            for resolution, seconds in coarser:
+                start = pd.Timestamp(start).floor(f"{seconds}s").to_pydatetime()
+                end = (pd.Timestamp(end) - pd.Timedelta(microseconds=1)).floor(f"{seconds}s").to_pydatetime() \
+                    + datetime.timedelta(seconds=seconds)
+                parts = list(db[mongo_basic.rollup_collection_name(self.collection_name, finer)].find(
+                    {"machine_id": {"$in": machines}, "bucket": {"$gte": start, "$lt": end}}, {"_id": 0}
+                ))
+                self._write(db, resolution, summarize(rollup_frame(parts), seconds, "bucket"))
+                finer = resolution
+
+    def apply(self, db, data: pd.DataFrame):
+        """
+        Bring all rollups up to date after a batch was written.
+        Volat s celou davkou, i s radky, ktere uz v kolekci byly: po padu pred aktualizaci rollupu
+        upsert zopakovane davky nic noveho nevlozi, ale rollup se musi dopocitat.
+        :param db: MongoDB database object
+        :param data: Written batch, only machine_id and timestamp are used
+        """
+        if data.empty:
+            return
+        timestamp = pd.to_datetime(data["timestamp"])
+        machines = sorted(data["machine_id"].astype(str).unique().tolist())
+        self.rebuild(db, machines, timestamp.min().to_pydatetime(), timestamp.max().to_pydatetime())
+        # cache HTTP serveru nesmi drzet odpoved spocitanou z rollupu pred touto aktualizaci
+        mongo_basic.bump_data_version(db, self.collection_name)
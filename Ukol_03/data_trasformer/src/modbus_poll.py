@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import os
+import time
+from libs import mongo_basic, ingest, alerts, rollups, modbus_poller
+# kolekce, klic dokumentu a pravidla alarmu stejne jako pri nacitani CSV
+from data_transform import COLLECTION_NAME, ALERTS_COLLECTION, ALERT_KEY, DOCUMENT_KEY, ALERT_RULES, write_alerts
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MONGO_HOST = os.getenv("MONGO_HOST", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("DB_NAME", "ukol03_mongodb")
+
+# Polling configuration
+MODBUS_DEVICES = os.getenv("MODBUS_DEVICES", "data/modbus_devices.json")   # seznam stroju, viz modbus_poller.load_devices
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", 1.0))                     # s mezi dvema ctenimi jednoho stroje
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", 256))                 # stroju ctenych soucasne
+MODBUS_TIMEOUT = float(os.getenv("MODBUS_TIMEOUT", 1.0))
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", 500))                             # cteni na jeden bulk zapis
+FLUSH_INTERVAL = float(os.getenv("FLUSH_INTERVAL", 1.0))                   # s, nejdele ceka necela davka
+MAX_PENDING = int(os.getenv("MAX_PENDING", 4))                             # davek cekajicich na zapis, dalsi se zahodi
+STATS_INTERVAL = float(os.getenv("STATS_INTERVAL", 60))                    # s mezi vypisy latence a jitteru
+TIMESERIES = os.getenv("TIMESERIES", "0") == "1"               # viz data_transform.py
+TIMESERIES_GRANULARITY = os.getenv("TIMESERIES_GRANULARITY", "seconds")
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", 0))
+
+
+def make_sink(mongo_name, timeseries: bool, throughput: ingest.Throughput):
+    """Write path of one batch of readings: alerts, idempotent upsert and rollups, as in data_transform.py."""
+    alert_engine = alerts.AlertEngine(ALERT_RULES)
+    rollup_builder = rollups.RollupBuilder(COLLECTION_NAME)
+
+    def write_batch(batch):
+        write_alerts(mongo_name, alert_engine.evaluate(batch))
+
+        write_start = time.monotonic()
+        records = ingest.to_records(batch)
+        new_rows = mongo_basic.upsert_bulk(mongo_name, COLLECTION_NAME, records, DOCUMENT_KEY, timeseries)
+        rollup_builder.apply(mongo_name, batch)
+        throughput.add(len(records), time.monotonic() - write_start)
+        logger.debug(f"Inserted batch of {len(new_rows)} new readings into MongoDB.")
+
+    return write_batch
+
+
+async def log_stats(poller: modbus_poller.ModbusPoller, throughput: ingest.Throughput):
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        poller.log(logger)
+        throughput.log(logger)
+
+
+async def poll(mongo_name, timeseries: bool):
+    devices = modbus_poller.load_devices(MODBUS_DEVICES)
+    logger.info(f"Polling {len(devices)} Modbus devices every {POLL_INTERVAL} s.")
+    throughput = ingest.Throughput()
+    poller = modbus_poller.ModbusPoller(
+        devices, make_sink(mongo_name, timeseries, throughput), POLL_INTERVAL,
+        max_concurrent=POLL_CONCURRENCY, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, timeout=MODBUS_TIMEOUT,
+        max_pending=MAX_PENDING,
+    )
+    reporter = asyncio.create_task(log_stats(poller, throughput))
+    try:
+        await poller.run()
+    finally:
+        reporter.cancel()
+        poller.log(logger)
+
+
+def main():
+    mongo_client, mongo_name = mongo_basic.connect_to_mongoDB(MONGO_HOST, DB_NAME)
+    if mongo_client is None:
+        logger.error("Failed to connect to MongoDB.")
+        return
+
+    timeseries = mongo_basic.setup_machine_data(
+        mongo_name, COLLECTION_NAME, TIMESERIES, TIMESERIES_GRANULARITY, RETENTION_DAYS
+    )
+    mongo_basic.setup_alerts(mongo_name, ALERTS_COLLECTION, ALERT_KEY)
+    try:
+        asyncio.run(poll(mongo_name, timeseries))
+    except KeyboardInterrupt:
+        logger.info("Polling stopped.")
+
+
+if __name__ == "__main__":
+    main()
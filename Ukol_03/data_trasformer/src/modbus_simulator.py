@@ -0,0 +1,117 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import struct
+import time
+from pymodbus.server import ModbusTcpServer
+from pymodbus.simulator import DataType, SimData, SimDevice
+from libs import modbus_poller
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Simulovane stroje pro vyvoj a zatezovy test modbus_poll.py, bez skutecnych PLC
+SIM_HOST = os.getenv("SIM_HOST", "127.0.0.1")
+SIM_PORT = int(os.getenv("SIM_PORT", 5020))                   # prvni port, dalsi servery na SIM_PORT + 1, ...
+SIM_DEVICES = int(os.getenv("SIM_DEVICES", 400))               # pocet stroju
+SIM_UNITS_PER_PORT = int(os.getenv("SIM_UNITS_PER_PORT", 100)) # Modbus unit id 1-247 na jednom serveru
+SIM_DEVICES_FILE = os.getenv("SIM_DEVICES_FILE", "data/modbus_devices.json")  # seznam stroju pro modbus_poll.py
+SIM_BENCHMARK_SECONDS = float(os.getenv("SIM_BENCHMARK_SECONDS", 0))  # > 0: poller proti simulatoru bez MongoDB
+SIM_POLL_INTERVAL = float(os.getenv("SIM_POLL_INTERVAL", 1.0))        # s, interval polleru v benchmarku
+
+
+# datovy typ registru -> format modulu struct
+STRUCT_FORMATS = {"float32": "f", "uint32": "I", "int32": "i", "uint16": "H", "int16": "h"}
+
+
+def _registers(dtype: str, value: float) -> list[int]:
+    """ Value packed big-endian into 16 bit registers """
+    fmt = STRUCT_FORMATS[dtype]
+    data = struct.pack(f">{fmt}", value if fmt == "f" else int(round(value)))
+    return list(struct.unpack(f">{len(data) // 2}H", data))
+
+
+def machine_action(rng: random.Random):
+    """ Registers of a machine change at every read: temperature and power walk, hours grow, status sometimes changes """
+    state = {"temperature": rng.uniform(70, 90), "power_usage": rng.uniform(10, 13), "machine_hours": rng.randint(500, 5000), "status": 0}
+    register_map = modbus_poller.REGISTER_MAP
+
+    async def action(function_code, start_address, address, count, registers, set_values):
+        state["temperature"] = min(max(state["temperature"] + rng.gauss(0, 0.5), 40), 110)
+        state["power_usage"] = min(max(state["power_usage"] + rng.gauss(0, 0.2), 0), 20)
+        state["machine_hours"] += 1 if rng.random() < 0.01 else 0
+        if rng.random() < 0.01:
+            state["status"] = rng.choice(list(modbus_poller.STATUS_CODES))
+        for name, reg in register_map.items():
+            offset = reg.address - start_address
+            registers[offset:offset + reg.count] = _registers(reg.dtype, state[name] / reg.scale)
+        return None
+
+    return action
+
+
+def simulated_device(unit: int, rng: random.Random) -> SimDevice:
+    size = max(reg.address + reg.count for reg in modbus_poller.REGISTER_MAP.values())
+    return SimDevice(id=unit, simdata=[SimData(0, count=size, datatype=DataType.REGISTERS)], action=machine_action(rng))
+
+
+def device_list() -> list[modbus_poller.Device]:
+    """ Simulated machines spread over SIM_UNITS_PER_PORT unit ids per server port """
+    return [
+        modbus_poller.Device(
+            machine_id=f"SIM_{i + 1:04d}",
+            plant_name=f"Hala_{chr(ord('A') + i // SIM_UNITS_PER_PORT)}",
+            host=SIM_HOST,
+            port=SIM_PORT + i // SIM_UNITS_PER_PORT,
+            unit=i % SIM_UNITS_PER_PORT + 1,
+        )
+        for i in range(SIM_DEVICES)
+    ]
+
+
+async def start_servers(devices: list[modbus_poller.Device]) -> list[ModbusTcpServer]:
+    rng = random.Random(0)
+    ports = sorted({device.port for device in devices})
+    servers = []
+    for port in ports:
+        units = [device.unit for device in devices if device.port == port]
+        server = ModbusTcpServer([simulated_device(unit, rng) for unit in units], address=(SIM_HOST, port))
+        asyncio.create_task(server.serve_forever())
+        servers.append(server)
+    await asyncio.sleep(0.5)
+    return servers
+
+
+async def benchmark(devices: list[modbus_poller.Device], seconds: float):
+    """ Poller against the simulator for a while, batches are only counted (no MongoDB) """
+    rows = []
+    poller = modbus_poller.ModbusPoller(devices, lambda batch: rows.append(len(batch)), interval=SIM_POLL_INTERVAL)
+    start = time.perf_counter()
+    await poller.run(seconds)
+    elapsed = time.perf_counter() - start
+    poller.log(logger)
+    logger.info(f"{sum(rows)} readings in {len(rows)} batches, {sum(rows) / elapsed:.0f} readings/s, "
+                f"{len(poller.plan.blocks)} block read(s) per device")
+
+
+async def main():
+    devices = device_list()
+    servers = await start_servers(devices)
+    logger.info(f"Simulating {len(devices)} machines on {SIM_HOST}:{SIM_PORT}-{SIM_PORT + len(servers) - 1}.")
+    if SIM_BENCHMARK_SECONDS > 0:
+        await benchmark(devices, SIM_BENCHMARK_SECONDS)
+        for server in servers:
+            await server.shutdown()
+        return
+
+    os.makedirs(os.path.dirname(SIM_DEVICES_FILE) or ".", exist_ok=True)
+    with open(SIM_DEVICES_FILE, "w", encoding="utf-8") as f:
+        json.dump([device.__dict__ for device in devices], f, indent=1)
+    logger.info(f"Device list for modbus_poll.py written to {SIM_DEVICES_FILE}.")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
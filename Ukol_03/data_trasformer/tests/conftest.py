@@ -0,0 +1,68 @@
+import datetime
+
+import mongomock
+import pytest
+
+CSV_HEADER = "plant_name,machine_id,timestamp,temperature,power_usage,status,machine_hours\n"
+
+
+def csv_row(i: int, machines: int = 3) -> str:
+    """ Row i of a generated machine_data.csv, one reading per second and machine """
+    timestamp = datetime.datetime(2025, 1, 1) + datetime.timedelta(seconds=i // machines)
+    status = "error" if i % 7 == 0 else "operational"
+    return f"Hala_A,M_{i % machines:02d},{timestamp:%Y-%m-%d %H:%M:%S},{80 + i % 20}.5,12.3,{status},{1000 + i}\n"
+
+
+@pytest.fixture
+def machine_csv(tmp_path):
+    """ Factory writing a machine_data.csv with the given number of rows, starting at row first """
+
+    def write(rows: int, name: str = "machine_data.csv", first: int = 0) -> str:
+        path = tmp_path / name
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(CSV_HEADER)
+            f.writelines(csv_row(i) for i in range(first, first + rows))
+        return str(path)
+
+    return write
+
+
+class BulkResult:
+    def __init__(self, upserted_ids: dict):
+        self.upserted_ids = upserted_ids
+
+
+class Collection:
+    """ mongomock collection whose bulk_write accepts UpdateOne of current pymongo (mongomock passes it sort=) """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def bulk_write(self, operations, ordered=True):
+        upserted = {}
+        for index, operation in enumerate(operations):
+            result = self.collection.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+            if result.upserted_id is not None:
+                upserted[index] = result.upserted_id
+        return BulkResult(upserted)
+
+
+class Database:
+    """ mongomock database handing out Collection wrappers """
+
+    def __init__(self, name: str):
+        self.db = mongomock.MongoClient()[name]
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    def __getitem__(self, name):
+        return Collection(self.db[name])
+
+
+@pytest.fixture
+def mongo_db():
+    return Database("test_data_trasformer")
@@ -0,0 +1,59 @@
+import logging
+
+import pandas as pd
+
+import data_transform
+from libs import alerts, mongo_basic
+
+
+def machine_batch(rows: int, start: int = 0) -> pd.DataFrame:
+    times = pd.date_range("2025-01-01", periods=rows, freq="s") + pd.Timedelta(seconds=start)
+    return pd.DataFrame({
+        "plant_name": "Hala_A",
+        "machine_id": ["M_01", "M_02"] * (rows // 2),
+        "timestamp": times,
+        "temperature": [96.0 if i % 5 == 0 else 80.0 for i in range(rows)],
+        "power_usage": [15.0 if i % 4 == 0 else 12.0 for i in range(rows)],
+        "status": ["error"] * rows,
+    })
+
+
+def test_threshold_and_consecutive_rules():
+    engine = alerts.AlertEngine([
+        alerts.ThresholdRule("high_temperature", "temperature", 95),
+        alerts.ConsecutiveStatusRule("repeated_errors", "error", 3),
+    ])
+
+    raised = engine.evaluate(machine_batch(10))
+
+    assert sum(alert["rule"] == "high_temperature" for alert in raised) == 2
+    # tri chyby po sobe u kazdeho stroje, jednou za beh
+    assert sorted(alert["machine_id"] for alert in raised if alert["rule"] == "repeated_errors") == ["M_01", "M_02"]
+
+
+def test_consecutive_rule_continues_over_batches():
+    engine = alerts.AlertEngine([alerts.ConsecutiveStatusRule("repeated_errors", "error", 3)])
+
+    assert engine.evaluate(machine_batch(4)) == []
+    assert len(engine.evaluate(machine_batch(2, start=4))) == 2
+
+
+def test_replayed_batch_stores_alerts_once(mongo_db, caplog):
+    db = mongo_db
+    mongo_basic.setup_alerts(db, data_transform.ALERTS_COLLECTION, data_transform.ALERT_KEY)
+    batch = machine_batch(20)
+
+    with caplog.at_level(logging.WARNING):
+        first = data_transform.write_alerts(db, alerts.AlertEngine(data_transform.ALERT_RULES).evaluate(batch))
+        # po obnoveni z checkpointu se davka vyhodnoti znovu s novym stavem pravidel
+        replayed = data_transform.write_alerts(db, alerts.AlertEngine(data_transform.ALERT_RULES).evaluate(batch))
+
+    assert first
+    assert replayed == []
+    assert db[data_transform.ALERTS_COLLECTION].count_documents({}) == len(first)
+    assert len([record for record in caplog.records if "ALERT" in record.getMessage()]) == len(first)
+
+
+def test_no_alerts_writes_nothing(mongo_db):
+    assert data_transform.write_alerts(mongo_db, []) == []
+    assert data_transform.ALERTS_COLLECTION not in mongo_db.list_collection_names()
@@ -0,0 +1,51 @@
+import json
+
+from libs import checkpoint, ingest
+
+
+def test_save_and_load(tmp_path, machine_csv):
+    path = machine_csv(100)
+    state = checkpoint.Checkpoint(str(tmp_path / "state.json"), path)
+    state.save(40, 2345)
+
+    loaded = checkpoint.Checkpoint(str(tmp_path / "state.json"), path)
+
+    assert loaded.load() == 40
+    assert loaded.offset == 2345
+    assert not loaded.is_complete()
+
+
+def test_complete_file_is_skipped_until_it_grows(tmp_path, machine_csv):
+    path = machine_csv(10)
+    state = checkpoint.Checkpoint(str(tmp_path / "state.json"), path)
+    state.save(10, 500, complete=True)
+    assert state.is_complete()
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("Hala_A,M_01,2025-01-02 00:00:00,85.5,12.3,operational,1\n")
+
+    assert not state.is_complete()
+
+
+def test_checkpoint_of_another_file_is_ignored(tmp_path, machine_csv):
+    state = checkpoint.Checkpoint(str(tmp_path / "state.json"), machine_csv(10, "a.csv"))
+    state.save(10, 500)
+
+    other = checkpoint.Checkpoint(str(tmp_path / "state.json"), machine_csv(10, "b.csv"))
+
+    assert other.load() == 0
+    assert other.offset == 0
+
+
+def test_checkpoint_without_offset_is_migrated(tmp_path, machine_csv):
+    path = machine_csv(100)
+    expected = [int(ends[29]) for _, ends in ingest.read_csv_chunks(path, chunk_rows=100)][0]
+    state_path = tmp_path / "state.json"
+    state_path.write_text(json.dumps({
+        "csv_path": path, "fingerprint": checkpoint.file_fingerprint(path), "rows": 30, "size": 0,
+    }))
+
+    state = checkpoint.Checkpoint(str(state_path), path)
+
+    assert state.load() == 30
+    assert state.offset == expected
@@ -0,0 +1,145 @@
+import datetime
+import io
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import export_columnar
+from libs import columnar, mongo_basic
+
+START = datetime.datetime(2025, 1, 1, 22)
+
+
+def machine_docs(hours: int, machines: int = 3, start: datetime.datetime = START) -> list[dict]:
+    """ One reading per minute and machine, from start for the given number of hours """
+    return [{
+        "plant_name": "Hala_A" if m < 2 else "Hala_B",
+        "machine_id": f"M_{m:02d}",
+        "timestamp": start + datetime.timedelta(minutes=minute),
+        "temperature": 80.0 + minute % 20 * 0.5,
+        "power_usage": 12.25,
+        "status": "error" if minute % 7 == 0 else "operational",
+        "machine_hours": 1000 + minute // 60,
+    } for minute in range(hours * 60) for m in range(machines)]
+
+
+def partition_files(root) -> list[str]:
+    return sorted(os.path.relpath(os.path.join(path, name), root) for path, _, names in os.walk(root) for name in names)
+
+
+@pytest.fixture
+def exported(mongo_db, tmp_path):
+    """ 30 hours from 2025-01-01 22:00 exported into three daily partitions """
+    mongo_db["machine_data"].insert_many(machine_docs(30))
+    root = str(tmp_path / "parquet")
+    counts = columnar.export_collection(mongo_db, "machine_data", root, row_group_rows=500)
+    return root, counts
+
+
+def test_export_is_partitioned_by_day(exported):
+    root, counts = exported
+
+    assert counts == {"2025-01-01": 2 * 60 * 3, "2025-01-02": 24 * 60 * 3, "2025-01-03": 4 * 60 * 3}
+    assert partition_files(root) == [f"date=2025-01-0{day}{os.sep}part-0.parquet" for day in (1, 2, 3)]
+    metadata = pq.ParquetFile(os.path.join(root, "date=2025-01-02", "part-0.parquet")).metadata
+    assert metadata.num_rows == 24 * 60 * 3
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [500] * 8 + [320]
+
+
+def test_exported_schema_and_dtypes(exported):
+    root, _ = exported
+
+    assert pq.read_schema(os.path.join(root, "date=2025-01-01", "part-0.parquet")).remove_metadata() == columnar.SCHEMA
+    data = columnar.load(root)
+
+    assert len(data) == 30 * 60 * 3
+    assert list(data.columns) == columnar.SCHEMA.names
+    assert {name: str(dtype) for name, dtype in data.dtypes.items()} == {
+        "plant_name": "category", "machine_id": "category", "timestamp": "datetime64[ms]",
+        "temperature": "float32", "power_usage": "float32", "status": "category", "machine_hours": "int32",
+    }
+    assert data["timestamp"].is_monotonic_increasing
+    assert data["timestamp"].iloc[0] == START
+
+
+def test_load_prunes_partitions(exported):
+    root, _ = exported
+    # poskozeny soubor mimo rozsah: kdyby ho load otevrel, cteni by selhalo
+    with open(os.path.join(root, "date=2025-01-03", "part-0.parquet"), "wb") as f:
+        f.write(b"not parquet")
+
+    data = columnar.load(
+        root, columns=["machine_id", "timestamp", "temperature"],
+        start=datetime.datetime(2025, 1, 1, 23, 30), end=datetime.datetime(2025, 1, 2, 1),
+    )
+
+    assert list(data.columns) == ["machine_id", "timestamp", "temperature"]
+    assert len(data) == 90 * 3
+    assert data["timestamp"].min() == datetime.datetime(2025, 1, 1, 23, 30)
+    assert data["timestamp"].max() == datetime.datetime(2025, 1, 2, 0, 59)
+
+
+def test_load_with_filters_and_aware_times(exported):
+    root, _ = exported
+    start = datetime.datetime(2025, 1, 2, 1, tzinfo=datetime.timezone(datetime.timedelta(hours=1)))
+
+    data = columnar.load(root, start=start, end=START + datetime.timedelta(hours=3),
+                         filters={"machine_id": "M_01", "status": ["error"]})
+
+    # 1:00 +01:00 je 0:00 UTC, do 1:00 UTC jsou v datech minuty 120-179 od START
+    assert set(data["machine_id"]) == {"M_01"}
+    assert set(data["status"]) == {"error"}
+    assert len(data) == len([minute for minute in range(120, 180) if minute % 7 == 0])
+
+
+def test_reexport_replaces_the_day(exported, mongo_db):
+    root, _ = exported
+    mongo_db["machine_data"].insert_many(machine_docs(1, start=datetime.datetime(2025, 1, 3, 5)))
+
+    counts = columnar.export_collection(mongo_db, "machine_data", root, start=datetime.datetime(2025, 1, 3))
+
+    assert counts == {"2025-01-03": 5 * 60 * 3}
+    assert partition_files(root) == [f"date=2025-01-0{day}{os.sep}part-0.parquet" for day in (1, 2, 3)]
+    assert len(columnar.load(root)) == 31 * 60 * 3
+
+
+def test_export_columnar_main(mongo_db, tmp_path, monkeypatch):
+    mongo_db["machine_data"].insert_many(machine_docs(3))
+    monkeypatch.setattr(mongo_basic, "connect_to_mongoDB", lambda host, name: (object(), mongo_db))
+    monkeypatch.setattr(export_columnar, "EXPORT_DIR", str(tmp_path))
+
+    export_columnar.main()
+
+    assert len(columnar.load(str(tmp_path))) == 3 * 60 * 3
+
+
+def test_arrow_stream_round_trip():
+    docs = machine_docs(1)
+
+    chunks = list(columnar.encode_arrow(iter(docs), batch_rows=50))
+    table = pa.ipc.open_stream(io.BytesIO(b"".join(chunks))).read_all()
+
+    assert table.schema == columnar.SCHEMA
+    assert table.num_rows == len(docs)
+    # 180 radku po 50: ctyri record batche a konec proudu
+    assert len(chunks) == 4 + 1
+    assert table.column("machine_id").to_pylist() == [doc["machine_id"] for doc in docs]
+
+
+def test_parquet_of_projected_documents():
+    docs = [{"machine_id": doc["machine_id"], "temperature": doc["temperature"]} for doc in machine_docs(1)]
+
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(columnar.encode_parquet(iter(docs), batch_rows=100))))
+    table = parquet.read()
+
+    assert table.schema.names == ["machine_id", "temperature"]
+    assert table.schema.field("temperature").type == pa.float32()
+    assert parquet.num_row_groups == 2
+    assert table.column("temperature").to_pylist() == [doc["temperature"] for doc in docs]
+
+
+def test_empty_result_is_a_valid_file():
+    assert pq.read_table(io.BytesIO(b"".join(columnar.encode_parquet(iter([]))))).num_rows == 0
+    assert pa.ipc.open_stream(io.BytesIO(b"".join(columnar.encode_arrow(iter([]))))).read_all().num_rows == 0
@@ -0,0 +1,194 @@
+import datetime
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from libs import ingest
+
+
+def test_chunks_have_explicit_dtypes(machine_csv):
+    chunks = [chunk for chunk, _ in ingest.read_csv_chunks(machine_csv(250), chunk_rows=100)]
+
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    chunk = chunks[0]
+    assert chunk["machine_id"].dtype == "category"
+    assert chunk["status"].dtype == "category"
+    assert chunk["temperature"].dtype == np.float32
+    assert pd.api.types.is_datetime64_any_dtype(chunk["timestamp"])
+
+
+def test_row_offsets_point_after_every_row(machine_csv):
+    path = machine_csv(250)
+    with open(path, "rb") as f:
+        data = f.read()
+
+    offsets = np.concatenate([ends for _, ends in ingest.read_csv_chunks(path, chunk_rows=100)])
+
+    assert len(offsets) == 250
+    assert all(data[offset - 1:offset] == b"\n" for offset in offsets)
+    assert offsets[-1] == len(data)
+
+
+def test_resume_from_offset(machine_csv):
+    path = machine_csv(250)
+    _, ends = next(ingest.read_csv_chunks(path, chunk_rows=120))
+
+    chunks = [chunk for chunk, _ in ingest.read_csv_chunks(path, chunk_rows=100, offset=int(ends[-1]))]
+
+    assert sum(len(chunk) for chunk in chunks) == 130
+    assert chunks[0]["machine_hours"].iloc[0] == 1120
+    assert chunks[0]["temperature"].dtype == np.float32
+
+
+def test_resume_does_not_parse_ingested_rows(tmp_path):
+    # radky pred offsetem nejsou validni CSV, obnoveni je vubec nesmi cist
+    path = tmp_path / "machine_data.csv"
+    good = "Hala_A,M_01,2025-01-01 00:00:01,85.5,12.3,operational,1500\n"
+    path.write_text("plant_name,machine_id,timestamp,temperature,power_usage,status,machine_hours\n" + '"broken\n' * 1000 + good)
+    offset = path.stat().st_size - len(good)
+
+    chunks = [chunk for chunk, _ in ingest.read_csv_chunks(str(path), chunk_rows=100, offset=offset)]
+
+    assert [len(chunk) for chunk in chunks] == [1]
+
+
+def test_blank_lines_are_skipped(tmp_path):
+    path = tmp_path / "machine_data.csv"
+    path.write_text(
+        "plant_name,machine_id,timestamp,temperature,power_usage,status,machine_hours\n"
+        "Hala_A,M_01,2025-01-01 00:00:01,85.5,12.3,operational,1500\n\n"
+        "Hala_A,M_01,2025-01-01 00:00:02,85.5,12.3,operational,1501\n"
+    )
+
+    (chunk, ends), = list(ingest.read_csv_chunks(str(path), chunk_rows=10))
+
+    assert chunk["machine_hours"].tolist() == [1500, 1501]
+    assert ends[-1] == path.stat().st_size
+
+
+def test_stream_batches_returns_every_row_in_order(machine_csv):
+    path = machine_csv(1003)
+    batches = list(ingest.stream_batches(path, batch_size=25, chunk_rows=100, max_queued=2))
+
+    assert all(len(batch) == 25 for batch, _ in batches[:-1])
+    hours = pd.concat([batch for batch, _ in batches])["machine_hours"].tolist()
+    assert hours == list(range(1000, 2003))
+    offsets = [offset for _, offset in batches]
+    assert offsets == sorted(offsets)
+    assert offsets[-1] == os.path.getsize(path)
+
+
+def test_reader_waits_for_the_consumer(machine_csv, monkeypatch):
+    # ctecka smi byt napred nanejvys o max_queued davek (plus jednu rozpracovanou)
+    parsed = []
+    read_chunks = ingest.read_csv_chunks
+
+    def counting_reader(*args, **kwargs):
+        for chunk, ends in read_chunks(*args, **kwargs):
+            parsed.append(len(chunk))
+            yield chunk, ends
+
+    monkeypatch.setattr(ingest, "read_csv_chunks", counting_reader)
+    batches = ingest.stream_batches(machine_csv(1000), batch_size=10, chunk_rows=10, max_queued=3)
+    next(batches)
+    threading.Event().wait(0.3)
+
+    assert len(parsed) <= 1 + 3 + 1
+    batches.close()
+
+
+def test_early_stop_releases_the_reader(machine_csv):
+    batches = ingest.stream_batches(machine_csv(1000), batch_size=10, chunk_rows=10, max_queued=1)
+    next(batches)
+    batches.close()
+
+    assert not any(thread.name == "csv-reader" for thread in threading.enumerate())
+
+
+def test_parse_error_is_raised_in_the_consumer(tmp_path):
+    path = tmp_path / "broken.csv"
+    path.write_text("plant_name,machine_id,timestamp,temperature\nHala_A,M_01,2025-01-01,hot\n")
+
+    with pytest.raises(ValueError):
+        list(ingest.stream_batches(str(path), batch_size=10, chunk_rows=10, max_queued=1))
+
+
+def test_to_records_has_native_types(machine_csv):
+    chunk, _ = next(ingest.read_csv_chunks(machine_csv(3), chunk_rows=10))
+
+    record = ingest.to_records(chunk)[0]
+
+    assert record == {
+        "plant_name": "Hala_A",
+        "machine_id": "M_00",
+        "timestamp": datetime.datetime(2025, 1, 1),
+        "temperature": 80.5,
+        "power_usage": 12.3,
+        "status": "error",
+        "machine_hours": 1000,
+    }
+    assert type(record["timestamp"]) is datetime.datetime
+    assert type(record["machine_hours"]) is int
+
+
+def test_float32_to_float_keeps_csv_values():
+    values = np.array([12.3, 85.5, 0.001234, np.nan, 0.0], dtype=np.float32)
+
+    widened = ingest.float32_to_float(values)
+
+    assert widened[:3].tolist() == [12.3, 85.5, 0.001234]
+    assert np.isnan(widened[3]) and widened[4] == 0.0
+
+
+class FakeClock:
+    """ time.monotonic and time.sleep of the ingest module, sleeping only moves the clock """
+
+    def __init__(self, monkeypatch):
+        self.now = 100.0
+        self.sleeps = []
+        monkeypatch.setattr(ingest.time, "monotonic", lambda: self.now)
+        monkeypatch.setattr(ingest.time, "sleep", self.sleep)
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def batch_at(*seconds: float) -> pd.DataFrame:
+    return pd.DataFrame({"timestamp": [pd.Timestamp("2025-01-01") + pd.Timedelta(seconds=s) for s in seconds]})
+
+
+def test_fixed_rate_spaces_batches_by_their_rows(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    policy = ingest.make_rate_policy("fixed", rows_per_second=10, speedup=1.0)
+
+    policy.wait(batch_at(0, 0, 0, 0, 0))
+    policy.wait(batch_at(0, 0))
+    clock.now += 1.0     # pomaly zapis, dalsi davka uz na nic neceka
+    policy.wait(batch_at(0))
+
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_real_time_replay_follows_data_time(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    policy = ingest.make_rate_policy("realtime", rows_per_second=1, speedup=2.0)
+
+    policy.wait(batch_at(0, 1))
+    policy.wait(batch_at(10, 11))
+    clock.now += 10.0
+    policy.wait(batch_at(20))
+
+    assert clock.sleeps == [pytest.approx(5.0)]
+
+
+def test_fast_policy_and_unknown_name(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    ingest.make_rate_policy("fast", 1, 1).wait(batch_at(0))
+
+    assert clock.sleeps == []
+    with pytest.raises(ValueError):
+        ingest.make_rate_policy("slow", 1, 1)
@@ -0,0 +1,156 @@
+import asyncio
+import datetime
+import socket
+import time
+
+import numpy as np
+import pandas as pd
+
+import modbus_simulator
+from libs.modbus_poller import REGISTER_MAP, STATUS_CODES, Device, ModbusPoller, ReadPlan, Register, plan_reads
+
+
+def registers(value, dtype: str) -> np.ndarray:
+    """ Holding registers of one value, big-endian as sent by the device """
+    return np.array([value], dtype=dtype).view(">u2").astype(np.uint16)
+
+
+def test_machine_map_is_one_read():
+    assert plan_reads(REGISTER_MAP) == [(0, 7)]
+
+
+def test_small_gap_is_read_large_gap_is_split():
+    register_map = {"a": Register(0, "uint16"), "b": Register(5, "float32"), "c": Register(30, "uint16")}
+
+    assert plan_reads(register_map, max_gap=8) == [(0, 7), (30, 1)]
+    assert plan_reads(register_map, max_gap=3) == [(0, 1), (5, 2), (30, 1)]
+    assert plan_reads(register_map, max_gap=30) == [(0, 31)]
+
+
+def test_block_limit_and_unsorted_map():
+    register_map = {"c": Register(8, "uint32"), "a": Register(0, "float32"), "b": Register(4, "int16")}
+
+    assert plan_reads(register_map, max_gap=8, max_block=6) == [(0, 5), (8, 2)]
+    assert plan_reads(register_map, max_gap=8, max_block=10) == [(0, 10)]
+
+
+def test_decode_values_of_all_types():
+    plan = ReadPlan()
+    row = np.zeros(plan.width, dtype=np.uint16)
+    row[0:2] = registers(81.5, ">f4")
+    row[2:4] = registers(12.25, ">f4")
+    row[4:6] = registers(70000, ">u4")
+    row[6] = 3
+
+    values = plan.decode(np.stack([row, row]))
+
+    assert values["temperature"].tolist() == [81.5, 81.5]
+    assert values["power_usage"].tolist() == [12.25, 12.25]
+    assert values["machine_hours"].tolist() == [70000, 70000]
+    assert values["status"].tolist() == [3, 3]
+    assert values["machine_hours"].dtype.isnative
+
+
+def test_decode_over_several_blocks_with_scale():
+    register_map = {"pressure": Register(40, "int16", 0.1), "temperature": Register(0, "float32"), "count": Register(2, "int32")}
+    plan = ReadPlan(register_map, max_gap=2)
+    assert plan.blocks == [(0, 4), (40, 1)]
+    row = np.concatenate([registers(-4.0, ">f4"), registers(-5, ">i4"), registers(-123, ">i2")])
+
+    values = plan.decode(row.reshape(1, -1))
+
+    assert values["temperature"].tolist() == [-4.0]
+    assert values["count"].tolist() == [-5]
+    assert np.allclose(values["pressure"], [-12.3])
+
+
+def test_readings_as_machine_data_frame():
+    devices = [Device("M_01", "Hala_A", "127.0.0.1"), Device("M_02", "Hala_B", "127.0.0.1")]
+    poller = ModbusPoller(devices, sink=None)
+    row = np.zeros(poller.plan.width, dtype=np.uint16)
+    unknown = row.copy()
+    unknown[6] = 9
+
+    frame = poller.to_frame([(1, np.datetime64("2025-01-01T00:00:00"), row), (0, np.datetime64("2025-01-01T00:00:01"), unknown)])
+
+    assert frame["machine_id"].tolist() == ["M_02", "M_01"]
+    assert frame["plant_name"].tolist() == ["Hala_B", "Hala_A"]
+    assert frame["status"].tolist() == ["operational", "unknown"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def simulated_devices(count: int, units_per_port: int) -> list[Device]:
+    """ count machines on the modbus_simulator servers, units_per_port unit ids on every port """
+    ports = [free_port() for _ in range((count + units_per_port - 1) // units_per_port)]
+    return [
+        Device(f"SIM_{i + 1:04d}", "Hala_A", "127.0.0.1", port=ports[i // units_per_port], unit=i % units_per_port + 1)
+        for i in range(count)
+    ]
+
+
+def poll_simulator(devices: list[Device], sink, duration: float, **options) -> ModbusPoller:
+    """ ModbusPoller.run against modbus_simulator servers started for the devices """
+
+    async def scenario():
+        servers = await modbus_simulator.start_servers(devices)
+        try:
+            poller = ModbusPoller(devices, sink, **options)
+            await poller.run(duration)
+            return poller
+        finally:
+            for server in servers:
+                await server.shutdown()
+
+    return asyncio.run(scenario())
+
+
+def test_poller_against_simulator_many_units():
+    devices = simulated_devices(60, units_per_port=40)
+    frames = []
+    started = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+    poller = poll_simulator(devices, frames.append, duration=1.5, interval=0.25, batch_size=50, flush_interval=0.1)
+
+    ended = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    summary = poller.summary()
+    data = pd.concat(frames, ignore_index=True)
+    assert summary["errors"] == 0 and summary["dropped"] == 0 and summary["sink_errors"] == 0
+    assert len(data) == summary["polls"] == summary["written"]
+    # 1,5 s po 0,25 s: kazdy stroj 6 cteni, na pomalem stroji muze nejake periody vynechat
+    counts = data.groupby("machine_id", observed=True).size()
+    assert sorted(counts.index) == [device.machine_id for device in devices]
+    assert counts.min() >= 3 and counts.max() <= 7
+    for _, timestamps in data.groupby("machine_id", observed=True)["timestamp"]:
+        steps = timestamps.diff().dt.total_seconds().dropna()
+        assert (steps >= 0.2).all()
+    assert data["timestamp"].min() >= started - datetime.timedelta(milliseconds=1)
+    assert data["timestamp"].max() <= ended
+    assert (data["timestamp"].dt.microsecond % 1000 == 0).all()
+    assert data["temperature"].between(40, 110).all()
+    assert set(data["status"]) <= set(STATUS_CODES.values())
+
+
+def test_slow_sink_drops_batches_and_polling_goes_on():
+    devices = simulated_devices(20, units_per_port=20)
+    calls = []
+
+    def slow_sink(batch):
+        calls.append(len(batch))
+        time.sleep(0.5)
+
+    poller = poll_simulator(
+        devices, slow_sink, duration=2.0, interval=0.1, batch_size=10, flush_interval=0.05, max_pending=2,
+    )
+
+    summary = poller.summary()
+    # sink zvladne 2 davky/s, cteni dava 20: davky navic se zahodi misto zastaveni cteni
+    assert poller.dropped_batches > 0
+    assert summary["written"] == sum(calls)
+    assert summary["written"] + summary["dropped"] == summary["polls"]
+    # fronta cteni (batch_size * 4) by se se zablokovanym zapisem naplnila po 40 ctenich
+    assert summary["polls"] >= 0.5 * len(devices) * 2.0 / 0.1
@@ -0,0 +1,240 @@
+import datetime
+import threading
+import time
+
+import mongomock
+import pytest
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from libs import mongo_basic
+
+
+class Database:
+    """ mongomock database with list_collections, which mongomock does not implement """
+
+    def __init__(self):
+        self.db = mongomock.MongoClient()["test_mongo_basic"]
+
+    def __getitem__(self, name):
+        return self.db[name]
+
+    def list_collections(self, filter=None):
+        names = [name for name in self.db.list_collection_names() if name == (filter or {}).get("name", name)]
+        return iter([{"name": name, "type": "collection", "options": {}} for name in names])
+
+    def create_collection(self, name, **options):
+        return self.db.create_collection(name)
+
+
+class RacingDatabase(Database):
+    """ Another process creates the collection between the check and create_collection """
+
+    def __init__(self, error: Exception):
+        super().__init__()
+        self.error = error
+        self.checked = False
+
+    def list_collections(self, filter=None):
+        if not self.checked:
+            self.checked = True
+            return iter([])
+        return super().list_collections(filter)
+
+    def create_collection(self, name, **options):
+        super().create_collection(name)
+        raise self.error
+
+
+@pytest.mark.parametrize("error", [
+    CollectionInvalid("collection machine_data already exists"),
+    OperationFailure("Collection already exists", code=mongo_basic.NAMESPACE_EXISTS),
+])
+def test_setup_tolerates_concurrent_create(error):
+    db = RacingDatabase(error)
+
+    is_timeseries = mongo_basic.setup_machine_data(db, "machine_data", timeseries=False)
+
+    assert is_timeseries is False
+    assert "machine_id_1_timestamp_1" in db.db["machine_data"].index_information()
+
+
+def test_setup_raises_other_errors():
+    db = RacingDatabase(OperationFailure("not authorized", code=13))
+
+    with pytest.raises(OperationFailure):
+        mongo_basic.setup_machine_data(db, "machine_data", timeseries=False)
+
+
+def test_setup_is_idempotent():
+    db = Database()
+
+    assert mongo_basic.setup_machine_data(db, "machine_data", timeseries=False) is False
+    assert mongo_basic.setup_machine_data(db, "machine_data", timeseries=False, retention_days=1) is False
+    assert "timestamp_ttl" in db["machine_data"].index_information()
+
+
+def machine_docs(count: int) -> list[dict]:
+    return [{
+        "machine_id": f"M_{i % 3:02d}",
+        "timestamp": datetime.datetime(2025, 1, 1) + datetime.timedelta(seconds=i),
+        "temperature": 90.0 + i % 10,
+        "power_usage": 12.0 + i % 4,
+        "status": "error" if i % 7 == 0 else "operational",
+    } for i in range(count)]
+
+
+class CountingCollection:
+    """ Collection answering the analysis from mongomock, with the window stage evaluated in Python """
+
+    def __init__(self, docs: list[dict]):
+        self.collection = mongomock.MongoClient()["test_mongo_basic"]["machine_data"]
+        self.collection.insert_many(docs)
+        self.calls = []
+
+    def aggregate(self, pipeline, **kwargs):
+        # mongomock nezna $setWindowFields, predchozi zaznamy stroje se doplni tady
+        self.calls.append("aggregate")
+        *head, facet = pipeline
+        facets = dict(facet["$facet"])
+        window = facets["errors"][0]["$setWindowFields"]
+        size = -window["output"]["previous"]["window"]["documents"][0]
+        docs = list(self.collection.aggregate(head + [{"$sort": {"timestamp": 1}}]))
+        docs = [
+            {**doc, "previous": [prev for prev in docs[:i] if prev["machine_id"] == doc["machine_id"]][-size:]}
+            for i, doc in enumerate(docs)
+        ]
+        scratch = mongomock.MongoClient()["test_mongo_basic"]["window"]
+        scratch.drop()
+        scratch.insert_many(docs)
+        result = next(self.collection.aggregate(head + [{"$facet": {k: v for k, v in facets.items() if k != "errors"}}]))
+        result["errors"] = list(scratch.aggregate(facets["errors"][1:] + [{"$project": {"_id": 0}}]))
+        return iter([result])
+
+    def estimated_document_count(self):
+        self.calls.append("estimated_document_count")
+        return self.collection.count_documents({})
+
+    def count_documents(self, query):
+        self.calls.append("count_documents")
+        return self.collection.count_documents(query)
+
+
+def test_analysis_pipeline_parameters():
+    facet = mongo_basic.analysis_pipeline(5, 80, 10, "fault", 50)[-1]["$facet"]
+
+    assert facet["errors"][0]["$setWindowFields"]["output"]["previous"]["window"] == {"documents": [-5, -1]}
+    assert facet["errors"][1] == {"$match": {"status": "fault"}}
+    assert facet["errors"][-1] == {"$limit": 50}
+    assert facet["high_temperature"][0] == {"$match": {"temperature": {"$gt": 80}}}
+    assert facet["high_power_count"][0] == {"$match": {"power_usage": {"$gt": 10}}}
+
+
+def test_analysis_pipeline_filters_and_projects_before_the_window():
+    start, end = datetime.datetime(2025, 1, 1), datetime.datetime(2025, 1, 2)
+
+    pipeline = mongo_basic.analysis_pipeline(start=start, end=end)
+
+    assert pipeline[0] == {"$match": {"timestamp": {"$gte": start, "$lt": end}}}
+    assert pipeline[1] == {"$project": {"_id": 0, **{name: 1 for name in mongo_basic.ANALYSIS_FIELDS}}}
+    assert list(pipeline[2]) == ["$facet"]
+    assert mongo_basic.analysis_pipeline()[0] == pipeline[1]
+    assert mongo_basic.analysis_pipeline(start=start)[0] == {"$match": {"timestamp": {"$gte": start}}}
+
+
+def test_analysis_of_a_time_range():
+    docs = [{**doc, "_id": i, "debug": "x" * 100} for i, doc in enumerate(machine_docs(100))]
+    collection = CountingCollection(docs)
+    start, end = datetime.datetime(2025, 1, 1, 0, 0, 30), datetime.datetime(2025, 1, 1, 0, 1)
+
+    analysis = mongo_basic.analyze_machine_data({"machine_data": collection}, "machine_data", start=start, end=end)
+
+    in_range = [doc for doc in docs if start <= doc["timestamp"] < end]
+    assert collection.calls == ["aggregate", "count_documents"]
+    assert analysis["total"] == 30
+    assert analysis["errors_count"] == len([doc for doc in in_range if doc["status"] == "error"])
+    assert analysis["high_temperature_count"] == len([doc for doc in in_range if doc["temperature"] > 95])
+    assert all(start <= doc["timestamp"] < end for doc in analysis["errors"] + analysis["high_power"])
+    # jen ANALYSIS_FIELDS, i v kontextu chyb; kontext nesaha pred start
+    oldest = analysis["errors"][-1]
+    assert set(oldest) == set(mongo_basic.ANALYSIS_FIELDS) - {"plant_name", "machine_hours"} | {"previous"}
+    assert all(set(prev) == set(oldest) - {"previous"} for prev in oldest["previous"])
+    assert all(prev["timestamp"] >= start for prev in oldest["previous"])
+
+
+def test_analysis_in_one_round_trip():
+    docs = machine_docs(100)
+    collection = CountingCollection(docs)
+
+    analysis = mongo_basic.analyze_machine_data({"machine_data": collection}, "machine_data", context_size=3, max_documents=5)
+
+    assert collection.calls == ["aggregate", "estimated_document_count"]
+    assert analysis["total"] == 100
+    assert analysis["errors_count"] == len([doc for doc in docs if doc["status"] == "error"])
+    assert analysis["high_temperature_count"] == len([doc for doc in docs if doc["temperature"] > 95])
+    assert analysis["high_power_count"] == len([doc for doc in docs if doc["power_usage"] > 14])
+    assert len(analysis["errors"]) == 5
+    assert len(analysis["high_temperature"]) == 5
+
+
+def test_error_context_is_from_the_same_machine():
+    collection = CountingCollection(machine_docs(100))
+
+    analysis = mongo_basic.analyze_machine_data({"machine_data": collection}, "machine_data", context_size=3)
+
+    newest = analysis["errors"][0]
+    assert newest["timestamp"] == datetime.datetime(2025, 1, 1, 0, 1, 38)
+    assert len(newest["previous"]) == 3
+    assert {prev["machine_id"] for prev in newest["previous"]} == {newest["machine_id"]}
+    assert all(prev["timestamp"] < newest["timestamp"] for prev in newest["previous"])
+
+
+class SlowCollection:
+    """ mongomock collection whose lookups take a while, so concurrent writers overlap """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def find(self, *args, **kwargs):
+        docs = list(self.collection.find(*args, **kwargs))
+        time.sleep(0.05)
+        return docs
+
+
+class TimeSeriesDatabase:
+    def __init__(self):
+        self.db = mongomock.MongoClient()["test_mongo_basic"]
+
+    def __getitem__(self, name):
+        return SlowCollection(self.db[name])
+
+
+def test_time_series_insert_skips_stored_and_repeated_keys():
+    db = TimeSeriesDatabase()
+    docs = machine_docs(6)
+    mongo_basic.upsert_bulk(db, "machine_data", docs[:2], ("machine_id", "timestamp"), timeseries=True)
+
+    positions = mongo_basic.upsert_bulk(db, "machine_data", docs + [dict(docs[4]), dict(docs[5])], ("machine_id", "timestamp"), timeseries=True)
+
+    assert positions == [2, 3, 4, 5]
+    assert db.db["machine_data"].count_documents({}) == 6
+
+
+def test_concurrent_time_series_writers_insert_every_key_once():
+    db = TimeSeriesDatabase()
+    docs = machine_docs(30)
+    results = []
+
+    def write():
+        results.append(mongo_basic.upsert_bulk(db, "machine_data", [dict(doc) for doc in docs], ("machine_id", "timestamp"), timeseries=True))
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert db.db["machine_data"].count_documents({}) == 30
+    assert sorted(len(positions) for positions in results) == [0, 0, 0, 30]
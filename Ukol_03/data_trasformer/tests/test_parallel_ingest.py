@@ -0,0 +1,59 @@
+import data_transform
+from libs import parallel_ingest
+
+COLLECTIONS = ["machine_data", "machine_data_rollup_1m", "machine_data_rollup_1h", "machine_data_rollup_1d"]
+
+
+def contents(db) -> dict[str, list[dict]]:
+    """ Documents of machine_data and its rollups without _id, in key order """
+    result = {}
+    for name in COLLECTIONS:
+        time_field = "timestamp" if name == "machine_data" else "bucket"
+        result[name] = list(db[name].find({}, {"_id": 0}).sort([("machine_id", 1), (time_field, 1)]))
+    return result
+
+
+def ingest_serially(db, files: list[str], tmp_path, monkeypatch):
+    """ data_transform.py path: one file after another, batch by batch """
+    monkeypatch.setattr(data_transform, "RATE_POLICY", "fast")
+    monkeypatch.setattr(data_transform, "BATCH_SIZE", 25)
+    for path in files:
+        monkeypatch.setattr(data_transform, "CSV_PATH", path)
+        monkeypatch.setattr(data_transform, "CHECKPOINT_PATH", str(tmp_path / "serial" / "checkpoint.json"))
+        (tmp_path / "serial").mkdir(exist_ok=True)
+        (tmp_path / "serial" / "checkpoint.json").unlink(missing_ok=True)
+        data_transform.ingest_single_file(db, False)
+
+
+def test_parallel_result_matches_serial(machine_csv, mongo_db, tmp_path, monkeypatch):
+    files = [machine_csv(300, "first.csv"), machine_csv(300, "second.csv", first=300)]
+
+    throughput = parallel_ingest.ingest_files(
+        mongo_db, "machine_data", parallel_ingest.resolve_inputs(str(tmp_path / "*.csv")), data_transform.DOCUMENT_KEY,
+        False, str(tmp_path / "checkpoints"), parse_workers=2, writer_threads=3, batch_size=25, chunk_rows=70, max_queued=4,
+    )
+    serial_db = type(mongo_db)("serial")
+    ingest_serially(serial_db, files, tmp_path, monkeypatch)
+
+    assert throughput.rows == 600
+    parallel, serial = contents(mongo_db), contents(serial_db)
+    assert len(parallel["machine_data"]) == 600
+    for name in COLLECTIONS:
+        assert parallel[name] == serial[name], name
+
+
+def test_completed_files_are_skipped(machine_csv, mongo_db, tmp_path):
+    files = [machine_csv(30, "first.csv"), machine_csv(30, "second.csv", first=30)]
+    arguments = (mongo_db, "machine_data", files, data_transform.DOCUMENT_KEY, False, str(tmp_path / "checkpoints"), 1, 2, 10, 100, 4)
+
+    assert parallel_ingest.ingest_files(*arguments).rows == 60
+    assert parallel_ingest.ingest_files(*arguments).rows == 0
+    assert mongo_db["machine_data"].count_documents({}) == 60
+
+
+def test_inputs_of_directory_and_glob(machine_csv, tmp_path):
+    files = [machine_csv(1, "b.csv"), machine_csv(1, "a.csv")]
+
+    assert parallel_ingest.resolve_inputs(str(tmp_path)) == sorted(files)
+    assert parallel_ingest.is_multi_file(str(tmp_path / "*.csv"))
+    assert not parallel_ingest.is_multi_file(files[0])
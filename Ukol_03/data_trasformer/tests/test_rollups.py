@@ -0,0 +1,108 @@
+import datetime
+import threading
+
+import pandas as pd
+import pytest
+
+from libs import rollups
+
+START = datetime.datetime(2025, 1, 1)
+
+# (sekundy od START, stav, teplota, prikon kW); dt: 0, 10, 10, 30, mezera 550 s -> 0, presne 300 s
+READINGS = [
+    (0, "operational", 80.0, 36.0),
+    (10, "operational", 82.0, 36.0),
+    (20, "error", 90.0, 72.0),
+    (50, "operational", 85.0, 12.0),
+    (600, "operational", 81.0, 36.0),
+    (900, "operational", 83.0, 36.0),
+]
+
+
+def reading_docs(readings=READINGS, machine_id: str = "M_01") -> list[dict]:
+    return [{
+        "plant_name": "Hala_A", "machine_id": machine_id, "timestamp": START + datetime.timedelta(seconds=second),
+        "status": status, "temperature": temperature, "power_usage": power, "machine_hours": 100 + i,
+    } for i, (second, status, temperature, power) in enumerate(readings)]
+
+
+def write(db, docs: list[dict], builder: rollups.RollupBuilder):
+    """ Write path of data_transform.py: raw documents first, then the rollups from the whole batch """
+    db["machine_data"].insert_many([dict(doc) for doc in docs])
+    builder.apply(db, pd.DataFrame(docs))
+
+
+def stored(db, resolution: str) -> list[dict]:
+    return list(db[f"machine_data_rollup_{resolution}"].find({}, {"_id": 0}).sort([("machine_id", 1), ("bucket", 1)]))
+
+
+def test_minute_buckets_of_known_batch(mongo_db):
+    write(mongo_db, reading_docs(), rollups.RollupBuilder("machine_data"))
+
+    first, gap, after_gap = stored(mongo_db, "1m")
+    assert first["bucket"] == START
+    assert first["count"] == 4
+    assert first["energy_kwh"] == pytest.approx(36 * 10 / 3600 + 72 * 10 / 3600 + 12 * 30 / 3600)
+    assert first["status_seconds"] == {"operational": 40.0, "error": 10.0}
+    assert (first["temperature_min"], first["temperature_max"], first["temperature_sum"]) == (80.0, 90.0, 337.0)
+    assert (first["power_usage_min"], first["power_usage_max"]) == (12.0, 72.0)
+    assert first["machine_hours_max"] == 103
+    # mezera nad MAX_GAP_SECONDS se nezapocita, presne MAX_GAP_SECONDS ano
+    assert gap["energy_kwh"] == 0.0
+    assert gap["status_seconds"] == {"operational": 0.0}
+    assert after_gap["energy_kwh"] == pytest.approx(36 * 300 / 3600)
+    assert after_gap["status_seconds"] == {"operational": 300.0}
+
+
+def test_coarser_buckets_are_merged_from_minutes(mongo_db):
+    write(mongo_db, reading_docs(), rollups.RollupBuilder("machine_data"))
+
+    hour, = stored(mongo_db, "1h")
+    day, = stored(mongo_db, "1d")
+    assert hour["count"] == 6
+    assert hour["energy_kwh"] == pytest.approx(0.4 + 3.0)
+    assert hour["status_seconds"] == {"operational": 340.0, "error": 10.0}
+    assert (hour["temperature_min"], hour["temperature_max"]) == (80.0, 90.0)
+    assert {key: value for key, value in day.items() if key != "bucket"} == \
+        {key: value for key, value in hour.items() if key != "bucket"}
+
+
+def test_replayed_batch_is_not_counted_twice(mongo_db):
+    builder = rollups.RollupBuilder("machine_data")
+    docs = reading_docs()
+    write(mongo_db, docs, builder)
+    expected = stored(mongo_db, "1m")
+
+    builder.apply(mongo_db, pd.DataFrame(docs))
+
+    assert stored(mongo_db, "1m") == expected
+
+
+def test_rollup_missed_before_crash_is_completed_on_replay(mongo_db):
+    docs = reading_docs()
+    write(mongo_db, docs[:3], rollups.RollupBuilder("machine_data"))
+    # pad po zapisu do machine_data, pred aktualizaci rollupu
+    mongo_db["machine_data"].insert_many([dict(doc) for doc in docs[3:]])
+
+    rollups.RollupBuilder("machine_data").apply(mongo_db, pd.DataFrame(docs[3:]))
+
+    reference = rollups.RollupBuilder("machine_data", {"1m": 60})
+    clean = type(mongo_db)("reference")
+    write(clean, docs, reference)
+    assert stored(mongo_db, "1m") == stored(clean, "1m")
+
+
+def test_batches_out_of_order_and_from_threads(mongo_db):
+    builder = rollups.RollupBuilder("machine_data")
+    docs = reading_docs() + reading_docs(machine_id="M_02")
+    batches = [docs[i:i + 2] for i in range(0, len(docs), 2)][::-1]
+    threads = [threading.Thread(target=write, args=(mongo_db, batch, builder)) for batch in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    minutes = stored(mongo_db, "1m")
+    assert [doc["machine_id"] for doc in minutes] == ["M_01"] * 3 + ["M_02"] * 3
+    assert minutes[0]["energy_kwh"] == minutes[3]["energy_kwh"] == pytest.approx(0.4)
+    assert minutes[2]["status_seconds"] == minutes[5]["status_seconds"] == {"operational": 300.0}
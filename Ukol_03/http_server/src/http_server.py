@@ -1,9 +1,36 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import json
-from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import importlib
+import importlib.util
+import itertools
+from urllib.parse import urlparse, parse_qs, urlencode
 from pymongo import MongoClient
-import datetime
 import os
+from libs import query_parser, pagination, aggregations, response_cache, encoding
+
+
+def _import_shared(name: str):
+    """ Module shared with data_trasformer, in the Docker image it is copied to libs (see Dockerfile) """
+    try:
+        return importlib.import_module(f"libs.{name}")
+    except ModuleNotFoundError as e:
+        if e.name != f"libs.{name}":
+            raise
+    # lokalni spusteni primo z repozitare
+    spec = importlib.util.spec_from_file_location(
+        f"libs.{name}",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data_trasformer", "src", "libs", f"{name}.py"),
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+mongo_basic = _import_shared("mongo_basic")
+try:
+    columnar = _import_shared("columnar")
+except ImportError:
+    # bez pyarrow funguje server dal, jen bez format=parquet|arrow
+    columnar = None
 
 # Server configuration
 HOST = os.getenv("HOST", "localhost")
@@ -13,47 +40,274 @@ PORT = int(os.getenv("PORT", 8000))
 MONGO_HOST = os.getenv("MONGO_HOST", "mongodb://localhost:27017/")
 DB_NAME = os.getenv("DB_NAME", "ukol03_mongodb")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "machine_data")
+TIMESERIES = os.getenv("TIMESERIES", "0") == "1"               # nova kolekce jako time-series (bez unikatniho indexu)
+TIMESERIES_GRANULARITY = os.getenv("TIMESERIES_GRANULARITY", "seconds")
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", 0))         # 0 = data se nemazou
+
+# Streaming configuration
+CURSOR_BATCH_SIZE = int(os.getenv("CURSOR_BATCH_SIZE", 500))   # dokumentu na jeden getMore
+CHUNK_DOCS = int(os.getenv("CHUNK_DOCS", 200))                 # dokumentu na jeden HTTP chunk
+COMPRESSION = os.getenv("COMPRESSION", "1") == "1"             # gzip/zstd podle Accept-Encoding klienta
 
+# Response cache configuration
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))        # pametovy limit cele cache
+CACHE_MAX_ENTRY_BYTES = int(os.getenv("CACHE_MAX_ENTRY_BYTES", 4 * 1024 * 1024))  # vetsi odpovedi se necachuji
+CACHE_TTL = float(os.getenv("CACHE_TTL", 300))                               # max. stari zaznamu v sekundach
+
+# MongoClient je thread-safe a ma vlastni connection pool, sdili ho vsechna vlakna serveru
 client = MongoClient(MONGO_HOST)
 db = client[DB_NAME]
 collection = db[COLLECTION_NAME]
 
-# --- JSON encoder for datetime objects ---
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, (datetime.datetime, datetime.date)):
-            return obj.isoformat()
-        return super().default(obj)
+cache = response_cache.ResponseCache(CACHE_MAX_BYTES, CACHE_TTL, CACHE_MAX_ENTRY_BYTES)
 
 # --- HTTP request handler ---
 class MyHandler(BaseHTTPRequestHandler):
-    # GET request handler
-    def do_GET(self):
-        parsed = urlparse(self.path)
+    # HTTP/1.1 je potreba pro Transfer-Encoding: chunked
+    protocol_version = "HTTP/1.1"
 
-        if parsed.path.startswith("/machine_data"):
-            try:
-                # Filter parameters from query string 
-                query_params = parse_qs(parsed.query)
-                mongo_filter = {}
+    # (key, version, etag) aktualniho pozadavku, None = odpoved se necachuje
+    cache_slot = None
+    # gzip/zstd dohodnute s klientem pro aktualni pozadavek, None = bez komprese
+    content_encoding = None
+
+    def send_cache_headers(self, hit: bool):
+        """ Vary header of every response, ETag and X-Cache headers of a cacheable response """
+        # format i komprese zavisi na hlavickach pozadavku, sdilene cache je nesmi zamenit
+        self.send_header("Vary", "Accept, Accept-Encoding")
+        if self.cache_slot is not None:
+            self.send_header("ETag", self.cache_slot[2])
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("X-Cache", "HIT" if hit else "MISS")
+
+    def store_in_cache(self, content_type: str, headers: dict | None, body: bytes):
+        """ Store the finished response body in the cache """
+        if self.cache_slot is not None:
+            key, version, etag = self.cache_slot
+            cache.put(key, version, etag, content_type, headers or {}, body)
+
+    def send_body(self, body: bytes, content_type: str, headers: dict | None = None, hit: bool = False):
+        """ Send a complete 200 response with Content-Length, compressed if negotiated (a cached body already is) """
+        if not hit and self.content_encoding and len(body) >= encoding.MIN_COMPRESS_BYTES:
+            body = encoding.compress(body, self.content_encoding)
+            headers = {**(headers or {}), "Content-Encoding": self.content_encoding}
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_cache_headers(hit)
+        self.end_headers()
+        self.wfile.write(body)
+        if not hit:
+            self.store_in_cache(content_type, headers, body)
+
+    def write_chunk(self, data: bytes):
+        """ Write one chunk of a chunked HTTP response """
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+    def end_chunks(self):
+        """ Write the terminating zero-length chunk """
+        self.wfile.write(b"0\r\n\r\n")
+
+    def response_format(self) -> str:
+        """ JSON, NDJSON or BSON according to the Accept header """
+        return encoding.negotiate(self.headers.get("Accept", ""))
+
+    def negotiate_compression(self, content_type: str):
+        """ Set content_encoding from Accept-Encoding, Parquet is compressed already """
+        self.content_encoding = None
+        if COMPRESSION and content_type != getattr(columnar, "PARQUET_MIME", None):
+            self.content_encoding = encoding.negotiate_encoding(self.headers.get("Accept-Encoding", ""))
+
+    def send_stream(self, chunks, content_type: str, headers: dict | None = None, cursor=None):
+        """
+        Send a chunked 200 response
+        :param chunks: Generator of encoded bytes
+        :param content_type: Value of the Content-Type header
+        :param headers: Additional response headers
+        :param cursor: Mongo cursor closed after the response is written
+        """
+        if self.content_encoding:
+            chunks = encoding.compress_stream(chunks, self.content_encoding)
+            headers = {**(headers or {}), "Content-Encoding": self.content_encoding}
+        try:
+            # prvni chunk pred odeslanim hlavicek, aby chyba dotazu vratila 500 a ne useknutou odpoved
+            first_chunk = next(chunks)
+        except Exception as e:
+            if cursor is not None:
+                cursor.close()
+            self.send_error(500, f"Server error: {e}")
+            return
 
-                for key, value in query_params.items():
-                    # parse_qs vrací list, např. {"machine_id": ["M_01"]}
-                    mongo_filter[key] = value[0]
+        # odpověď
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_cache_headers(hit=False)
+        self.end_headers()
 
-                # načti data podle filtru
-                docs = list(collection.find(mongo_filter, {"_id": 0}))
+        # kopie odpovedi pro cache, jen dokud nepresahne CACHE_MAX_ENTRY_BYTES
+        copy = [] if self.cache_slot is not None else None
+        copy_size = 0
+        try:
+            for chunk in itertools.chain([first_chunk], chunks):
+                self.write_chunk(chunk)
+                if copy is not None:
+                    copy_size += len(chunk)
+                    if copy_size > CACHE_MAX_ENTRY_BYTES:
+                        copy = None
+                    else:
+                        copy.append(chunk)
+            # do cache jeste pred koncovym chunkem, dalsi pozadavek stejneho klienta uz ji najde
+            if copy is not None:
+                self.store_in_cache(content_type, headers, b"".join(copy))
+            self.end_chunks()
+        except (BrokenPipeError, ConnectionResetError):
+            # klient zavrel spojeni, kurzor se uvolni na serveru
+            self.close_connection = True
+        except Exception as e:
+            # hlavicky uz jsou odeslane, chybu lze jen zalogovat a spojeni ukoncit bez koncoveho chunku
+            self.log_error("Streaming error: %s", e)
+            self.close_connection = True
+        finally:
+            if cursor is not None:
+                cursor.close()
 
-                # serializace
-                response = json.dumps(docs, cls=CustomJSONEncoder).encode("utf-8")
+    def get_machine_data(self, parsed):
+        """ GET /machine_data - filtered documents, streamed or one page of them """
+        query_params = parse_qs(parsed.query)
+        content_type = self.response_format()
+        encoder = encoding.ENCODERS[content_type]
 
-                # odpověď
-                self.send_response(200)
-                self.send_header("Content-Type", "application/json")
-                self.send_header("Content-Length", str(len(response)))
-                self.end_headers()
-                self.wfile.write(response)
+        # Filter, projection, sort and limit from query string, hodnoty maji typ podle schematu
+        query = query_parser.parse_query(query_params)
 
+        if "format" in query_params:
+            self.get_columnar(query, query_params["format"][-1])
+            return
+
+        if "page_size" in query_params or "next" in query_params:
+            # jedna stranka ma omezenou velikost, muze se nacist cela a token se posle v hlavicce
+            page_query, page_size, direction = pagination.paginate(query, query_params)
+            docs = list(collection.find(
+                page_query.filter, page_query.projection,
+                sort=page_query.sort, limit=page_query.limit,
+            ))
+            docs, next_token = pagination.split_page(docs, query, page_size, direction)
+            headers = {}
+            if next_token:
+                next_params = {k: v for k, v in query_params.items() if k != "next"}
+                next_params["next"] = [next_token]
+                headers["X-Next-Token"] = next_token
+                headers["Link"] = f'<{parsed.path}?{urlencode(next_params, doseq=True)}>; rel="next"'
+            self.send_stream(encoder(docs, CHUNK_DOCS), content_type, headers)
+            return
+
+        if content_type == encoding.BSON_MIME:
+            # BSON davky ze serveru jdou klientovi beze zmeny, dokumenty se v Pythonu vubec nedekoduji
+            cursor = collection.find_raw_batches(
+                query.filter, query.projection,
+                sort=query.sort or None, limit=query.limit, batch_size=CURSOR_BATCH_SIZE,
+            )
+            self.send_stream(encoding.encode_raw_batches(cursor), content_type, cursor=cursor)
+            return
+
+        # kurzor se cte po davkach, dokumenty se nikdy nedrzi v pameti vsechny najednou
+        cursor = collection.find(
+            query.filter, query.projection,
+            sort=query.sort or None, limit=query.limit, batch_size=CURSOR_BATCH_SIZE,
+        )
+        self.send_stream(encoder(cursor, CHUNK_DOCS), content_type, cursor=cursor)
+
+    def get_columnar(self, query, data_format: str):
+        """ GET /machine_data?format=parquet|arrow - filtered documents as a columnar file, streamed by row groups """
+        if columnar is None:
+            raise query_parser.QueryError("format is not available, pyarrow is not installed")
+        if data_format not in columnar.ENCODERS:
+            raise query_parser.QueryError(f"Unknown format '{data_format}', allowed: {', '.join(columnar.ENCODERS)}")
+        content_type, encoder = columnar.ENCODERS[data_format]
+        cursor = collection.find(
+            query.filter, query.projection,
+            sort=query.sort or None, limit=query.limit, batch_size=CURSOR_BATCH_SIZE,
+        )
+        self.send_stream(encoder(cursor), content_type, cursor=cursor)
+
+    def get_aggregation(self, parsed, pipeline_builder):
+        """ GET /machine_data/stats|rollup|top - vysledek agregace v MongoDB, jen par kB misto surovych dat """
+        query_params = parse_qs(parsed.query)
+        if pipeline_builder is aggregations.rollup_pipeline:
+            # dotaz na cele bucket-y jde do predpocitaneho rollupu, misto milionu surovych zaznamu par stovek
+            source = aggregations.rollup_source(query_params, mongo_basic.ROLLUP_RESOLUTIONS)
+            if source is not None:
+                resolution, pipeline = source
+                rollup = db[mongo_basic.rollup_collection_name(COLLECTION_NAME, resolution)]
+                docs = aggregations.merge_status_seconds(list(rollup.aggregate(pipeline)))
+                self.send_body(encoding.dumps(docs), encoding.JSON_MIME, {"X-Rollup-Source": resolution})
+                return
+        pipeline = pipeline_builder(query_params)
+        docs = list(collection.aggregate(pipeline))
+        headers = {"X-Rollup-Source": "raw"} if pipeline_builder is aggregations.rollup_pipeline else None
+        self.send_body(encoding.dumps(docs), encoding.JSON_MIME, headers)
+
+    def get_cache_stats(self):
+        """ GET /cache_stats - hit/miss counters of the response cache """
+        self.send_body(encoding.dumps(cache.stats()), encoding.JSON_MIME)
+
+    def prepare_cache(self, path: str, query_params: dict) -> bool:
+        """
+        Set cache_slot for the request and answer it from the cache if possible
+        :return: True if the response was already sent (304 or cached body)
+        """
+        self.cache_slot = None
+        content_type = self.response_format() if path == "/machine_data" else encoding.JSON_MIME
+        if path == "/machine_data" and columnar is not None and "format" in query_params:
+            content_type, _ = columnar.ENCODERS.get(query_params["format"][-1], (content_type, None))
+        self.negotiate_compression(content_type)
+        if not response_cache.is_cacheable(query_params):
+            return False
+
+        key = response_cache.make_key(path, query_params, content_type, self.content_encoding)
+        # verze dat se overuje u kazdeho pozadavku, po vlozeni nove davky se stara odpoved nikdy nevrati
+        version = mongo_basic.read_data_version(db, COLLECTION_NAME)
+        etag = response_cache.make_etag(key, version)
+        self.cache_slot = (key, version, etag)
+
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.send_cache_headers(hit=True)
+            self.end_headers()
+            return True
+
+        entry = cache.get(key, version)
+        if entry is not None:
+            self.send_body(entry.body, entry.content_type, entry.headers, hit=True)
+            return True
+        return False
+
+    # GET request handler
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        path = parsed.path.rstrip("/")
+        # handler obsluhuje vic pozadavku na jednom keep-alive spojeni
+        self.cache_slot = None
+        self.content_encoding = None
+
+        if path == "/cache_stats":
+            self.get_cache_stats()
+
+        elif path in aggregations.PIPELINES or path == "/machine_data":
+            try:
+                if self.prepare_cache(path, parse_qs(parsed.query)):
+                    return
+                if path in aggregations.PIPELINES:
+                    self.get_aggregation(parsed, aggregations.PIPELINES[path])
+                else:
+                    self.get_machine_data(parsed)
+            except query_parser.QueryError as e:
+                self.send_error(400, f"Bad request: {e}")
             except Exception as e:
                 self.send_error(500, f"Server error: {e}")
 
@@ -62,7 +316,12 @@ class MyHandler(BaseHTTPRequestHandler):
 
 
 def run():
-    server = HTTPServer((HOST, PORT), MyHandler)
+    # stejne nastaveni kolekce jako v data_transform.py: time-series, indexy pro filtry, retence
+    mongo_basic.setup_machine_data(db, COLLECTION_NAME, TIMESERIES, TIMESERIES_GRANULARITY, RETENTION_DAYS)
+
+    # kazdy pozadavek bezi ve vlastnim vlakne, pomaly dotaz neblokuje ostatni klienty
+    server = ThreadingHTTPServer((HOST, PORT), MyHandler)
+    server.daemon_threads = True
     print(f"Server běží na http://{HOST}:{PORT}")
     server.serve_forever()
 
@@ -0,0 +1,254 @@
+""" Aggregation pipelines for the /machine_data/stats, /rollup and /top endpoints """
+
+import datetime
+import re
+
+from libs.query_parser import QueryError, parse_filter
+
+# Numeric fields which can be aggregated
+METRICS = ["temperature", "power_usage", "machine_hours"]
+
+# Fields which can be used for grouping
+GROUP_FIELDS = ["machine_id", "plant_name", "status"]
+
+# Percentiles returned by /stats ($percentile needs MongoDB 7.0+)
+PERCENTILES = [0.5, 0.95]
+
+MAX_TOP_N = 100
+
+_INTERVAL = re.compile(r"^(\d+)([smhd])$")
+_UNITS = {"s": "second", "m": "minute", "h": "hour", "d": "day"}
+_UNIT_SECONDS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Fields stored in the rollup collections next to the bucket (see data_trasformer libs/rollups.py)
+ROLLUP_FILTER_FIELDS = ["machine_id", "plant_name"]
+
+
+def parse_group(query_params: dict, default: str | None = "machine_id") -> list[str]:
+    """
+    group=machine_id,status -> ["machine_id", "status"]
+    :param query_params: Output of urllib.parse.parse_qs
+    :param default: Group field used when group is not given, None = no grouping
+    :return: List of group fields
+    """
+    if "group" not in query_params:
+        return [default] if default else []
+    groups = [g for g in query_params["group"][-1].split(",") if g]
+    for name in groups:
+        if name not in GROUP_FIELDS:
+            raise QueryError(f"Cannot group by '{name}', allowed: {', '.join(GROUP_FIELDS)}")
+    return groups
+
+
+def parse_metric(query_params: dict, default: str = "temperature") -> str:
+    """ Parse the by= parameter, the metric used for ranking """
+    metric = query_params.get("by", [default])[-1]
+    if metric not in METRICS:
+        raise QueryError(f"Unknown metric '{metric}', allowed: {', '.join(METRICS)}")
+    return metric
+
+
+def parse_interval(value: str) -> dict:
+    """
+    interval=15m -> {"unit": "minute", "binSize": 15}, arguments of $dateTrunc
+    :param value: Number followed by s, m, h or d
+    :return: Arguments for $dateTrunc
+    """
+    match = _INTERVAL.match(value)
+    if not match or int(match.group(1)) <= 0:
+        raise QueryError(f"Invalid interval {value!r}, use e.g. 30s, 1m, 15m, 1h, 1d")
+    amount, unit = match.groups()
+    return {"unit": _UNITS[unit], "binSize": int(amount)}
+
+
+def group_key(groups: list[str]) -> dict | None:
+    """ _id of the $group stage for the given group fields """
+    if not groups:
+        return None
+    return {name: f"${name}" for name in groups}
+
+
+def flatten_group(groups: list[str], extra: list[str] | None = None) -> dict:
+    """ $project stage which moves the group keys from _id to top level fields """
+    projection = {"_id": 0}
+    for name in groups + (extra or []):
+        projection[name] = f"$_id.{name}"
+    return {"$project": projection}
+
+
+def stats_pipeline(query_params: dict) -> list[dict]:
+    """
+    Count, avg, min, max, std and percentiles of every metric per group
+    :param query_params: Output of urllib.parse.parse_qs
+    :return: Aggregation pipeline
+    """
+    groups = parse_group(query_params)
+    accumulators = {
+        "count": {"$sum": 1},
+        "first_timestamp": {"$min": "$timestamp"},
+        "last_timestamp": {"$max": "$timestamp"},
+    }
+    for metric in METRICS:
+        accumulators[f"{metric}_avg"] = {"$avg": f"${metric}"}
+        accumulators[f"{metric}_min"] = {"$min": f"${metric}"}
+        accumulators[f"{metric}_max"] = {"$max": f"${metric}"}
+        accumulators[f"{metric}_std"] = {"$stdDevPop": f"${metric}"}
+        accumulators[f"{metric}_pct"] = {
+            "$percentile": {"input": f"${metric}", "p": PERCENTILES, "method": "approximate"}
+        }
+
+    projection = flatten_group(groups)
+    fields = projection["$project"]
+    fields.update({"count": 1, "first_timestamp": 1, "last_timestamp": 1})
+    for metric in METRICS:
+        for suffix in ["avg", "min", "max", "std"]:
+            fields[f"{metric}_{suffix}"] = 1
+        for i, p in enumerate(PERCENTILES):
+            fields[f"{metric}_p{int(p * 100)}"] = {"$arrayElemAt": [f"${metric}_pct", i]}
+
+    return [
+        {"$match": parse_filter(query_params)},
+        {"$group": {"_id": group_key(groups), **accumulators}},
+        projection,
+        {"$sort": {name: 1 for name in groups} or {"count": -1}},
+    ]
+
+
+def rollup_pipeline(query_params: dict) -> list[dict]:
+    """
+    Time buckets (interval=1m) per group with avg/max of every metric
+    :param query_params: Output of urllib.parse.parse_qs
+    :return: Aggregation pipeline
+    """
+    groups = parse_group(query_params)
+    interval = parse_interval(query_params.get("interval", ["1m"])[-1])
+    bucket = {"$dateTrunc": {"date": "$timestamp", **interval}}
+
+    accumulators = {"count": {"$sum": 1}}
+    for metric in METRICS:
+        accumulators[f"{metric}_avg"] = {"$avg": f"${metric}"}
+        accumulators[f"{metric}_max"] = {"$max": f"${metric}"}
+
+    projection = flatten_group(groups, ["bucket"])
+    projection["$project"].update({name: 1 for name in accumulators})
+    return [
+        {"$match": parse_filter(query_params)},
+        {"$group": {"_id": {"bucket": bucket, **(group_key(groups) or {})}, **accumulators}},
+        projection,
+        {"$sort": {"bucket": 1, **{name: 1 for name in groups}}},
+    ]
+
+
+def _aligned(value: datetime.datetime, seconds: int) -> bool:
+    """ True if the time is a multiple of seconds since the epoch (a bucket boundary) """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp() % seconds == 0
+
+
+def rollup_source(query_params: dict, resolutions: dict[str, int]) -> tuple[str, list[dict]] | None:
+    """
+    Pipeline of /machine_data/rollup over a pre-aggregated rollup collection, if the query allows it:
+    group and filter only by machine_id/plant_name, interval a multiple of the rollup resolution
+    and from/to on the bucket boundaries. The coarsest such resolution is used.
+    :param query_params: Output of urllib.parse.parse_qs
+    :param resolutions: Rollup name -> bucket length in seconds
+    :return: (rollup name, aggregation pipeline), None if the raw collection must be used
+    """
+    groups = parse_group(query_params)
+    if any(name not in ROLLUP_FILTER_FIELDS for name in groups):
+        return None
+    interval = parse_interval(query_params.get("interval", ["1m"])[-1])
+    interval_seconds = interval["binSize"] * _UNIT_SECONDS[interval["unit"]]
+
+    mongo_filter = parse_filter(query_params)
+    time_window = mongo_filter.pop("timestamp", {})
+    if any(name not in ROLLUP_FILTER_FIELDS for name in mongo_filter):
+        return None
+    if not isinstance(time_window, dict) or set(time_window) - {"$gte", "$lt"}:
+        return None
+
+    candidates = [
+        (seconds, name) for name, seconds in resolutions.items()
+        if interval_seconds % seconds == 0 and all(_aligned(t, seconds) for t in time_window.values())
+    ]
+    if not candidates:
+        return None
+    _, resolution = max(candidates)
+
+    if time_window:
+        mongo_filter["bucket"] = time_window
+    accumulators = {"count": {"$sum": "$count"}, "energy_kwh": {"$sum": "$energy_kwh"}}
+    for metric in METRICS:
+        accumulators[f"{metric}_sum"] = {"$sum": f"${metric}_sum"}
+        accumulators[f"{metric}_max"] = {"$max": f"${metric}_max"}
+    accumulators["status_seconds"] = {"$push": "$status_seconds"}
+
+    projection = flatten_group(groups, ["bucket"])
+    fields = projection["$project"]
+    fields.update({"count": 1, "energy_kwh": 1, "status_seconds": 1})
+    for metric in METRICS:
+        fields[f"{metric}_avg"] = {"$divide": [f"${metric}_sum", "$count"]}
+        fields[f"{metric}_max"] = 1
+    return resolution, [
+        {"$match": mongo_filter},
+        {"$group": {
+            "_id": {"bucket": {"$dateTrunc": {"date": "$bucket", **interval}}, **(group_key(groups) or {})},
+            **accumulators,
+        }},
+        projection,
+        {"$sort": {"bucket": 1, **{name: 1 for name in groups}}},
+    ]
+
+
+def merge_status_seconds(docs: list[dict]) -> list[dict]:
+    """ Sum the status_seconds of the rollup buckets merged into one result bucket """
+    for doc in docs:
+        total = {}
+        for part in doc.get("status_seconds") or []:
+            for status, seconds in (part or {}).items():
+                total[status] = total.get(status, 0.0) + seconds
+        doc["status_seconds"] = total
+    return docs
+
+
+def top_pipeline(query_params: dict) -> list[dict]:
+    """
+    Top N groups by the maximum of a metric (by=temperature&n=5), with the time of the maximum
+    :param query_params: Output of urllib.parse.parse_qs
+    :return: Aggregation pipeline
+    """
+    groups = parse_group(query_params)
+    metric = parse_metric(query_params)
+    try:
+        n = int(query_params.get("n", ["10"])[-1])
+    except ValueError:
+        raise QueryError("Invalid n")
+    if not 0 < n <= MAX_TOP_N:
+        raise QueryError(f"n must be between 1 and {MAX_TOP_N}")
+
+    projection = flatten_group(groups)
+    projection["$project"].update({"max": "$peak.value", "timestamp": "$peak.timestamp", "avg": 1, "count": 1})
+    return [
+        {"$match": parse_filter(query_params)},
+        {"$group": {
+            "_id": group_key(groups),
+            "peak": {"$top": {
+                "sortBy": {metric: -1},
+                "output": {"value": f"${metric}", "timestamp": "$timestamp"},
+            }},
+            "avg": {"$avg": f"${metric}"},
+            "count": {"$sum": 1},
+        }},
+        projection,
+        {"$sort": {"max": -1}},
+        {"$limit": n},
+    ]
+
+
+# Endpoint path -> pipeline builder
+PIPELINES = {
+    "/machine_data/stats": stats_pipeline,
+    "/machine_data/rollup": rollup_pipeline,
+    "/machine_data/top": top_pipeline,
+}
@@ -0,0 +1,228 @@
+""" Response encodings of the HTTP server: JSON, NDJSON and raw BSON, negotiated gzip/zstd compression """
+
+import datetime
+import json
+import zlib
+
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+
+# orjson serializuje datetime nativne v C, bez volani default() pro kazdy dokument
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_MIME = "application/json"
+NDJSON_MIME = "application/x-ndjson"
+BSON_MIME = "application/bson"
+
+MIN_COMPRESS_BYTES = 1024       # mensi odpovedi se nekomprimuji
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _default(obj):
+    """ Types orjson / json do not know """
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, RawBSONDocument):
+        return bson.decode(obj.raw)
+    raise TypeError(f"Type {type(obj).__name__} is not JSON serializable")
+
+
+_json_encoder = json.JSONEncoder(default=_default, separators=(",", ":"))
+
+
+def dumps(obj) -> bytes:
+    """ Object as UTF-8 JSON, orjson if installed """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return _json_encoder.encode(obj).encode("utf-8")
+
+
+def encode_json(docs, chunk_docs: int):
+    """
+    Documents as one JSON array, piece by piece
+    :param docs: Iterable of documents (pymongo cursor or list)
+    :param chunk_docs: Number of documents joined into one yielded chunk
+    :return: Generator of bytes, only one chunk is held in memory at a time
+    """
+    parts = [b"["]
+    first = True
+    for doc in docs:
+        parts.append(dumps(doc) if first else b"," + dumps(doc))
+        first = False
+        if len(parts) >= chunk_docs:
+            yield b"".join(parts)
+            parts = []
+    parts.append(b"]")
+    yield b"".join(parts)
+
+
+def encode_ndjson(docs, chunk_docs: int):
+    """ Documents as newline delimited JSON, see encode_json """
+    parts = []
+    for doc in docs:
+        parts.append(dumps(doc) + b"\n")
+        if len(parts) >= chunk_docs:
+            yield b"".join(parts)
+            parts = []
+    if parts:
+        yield b"".join(parts)
+
+
+def encode_bson(docs, chunk_docs: int):
+    """
+    Documents as concatenated BSON (stejny format jako mongodump / bson.decode_all).
+    RawBSONDocument se posle tak, jak prisel ze serveru, ostatni dokumenty se zakoduji.
+    """
+    parts = []
+    for doc in docs:
+        parts.append(doc.raw if isinstance(doc, RawBSONDocument) else bson.encode(doc))
+        if len(parts) >= chunk_docs:
+            yield b"".join(parts)
+            parts = []
+    if parts:
+        yield b"".join(parts)
+
+
+def encode_raw_batches(batches):
+    """
+    Output of Collection.find_raw_batches as BSON, kazda davka uz je retezec BSON dokumentu
+    primo ze serveru, dokumenty se vubec nedekoduji (ani do RawBSONDocument)
+    :param batches: RawBatchCursor, one bytes object per getMore
+    :return: Generator of bytes
+    """
+    for batch in batches:
+        if batch:
+            yield batch
+
+
+ENCODERS = {
+    JSON_MIME: encode_json,
+    NDJSON_MIME: encode_ndjson,
+    BSON_MIME: encode_bson,
+}
+
+
+def negotiate(accept: str) -> str:
+    """
+    Response format from the Accept header, BSON and NDJSON only if the client asks for them
+    :param accept: Value of the Accept header
+    :return: MIME type, one of ENCODERS
+    """
+    accept = accept or ""
+    if BSON_MIME in accept:
+        return BSON_MIME
+    if NDJSON_MIME in accept:
+        return NDJSON_MIME
+    return JSON_MIME
+
+
+def available_encodings() -> list[str]:
+    """ Content encodings supported by this server, in the order of preference """
+    return (["zstd"] if zstandard is not None else []) + ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """
+    Content encoding from the Accept-Encoding header, highest q wins, a tie goes to the order of available_encodings
+    :param accept_encoding: Value of the Accept-Encoding header
+    :return: "zstd", "gzip" or None (no compression)
+    """
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for name in available_encodings():
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """ Whole response body compressed with the negotiated encoding """
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return zlib.compress(body, GZIP_LEVEL, wbits=31)
+
+
+def compress_stream(chunks, encoding: str):
+    """
+    Chunks compressed as one stream. Po kazdem chunku se kompresor vyprazdni (sync flush),
+    klient tak dostava data prubezne stejne jako bez komprese a zadny chunk neni prazdny.
+    :param chunks: Generator of bytes
+    :param encoding: "zstd" or "gzip"
+    :return: Generator of compressed bytes
+    """
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        sync, finish = zstandard.COMPRESSOBJ_FLUSH_BLOCK, zstandard.COMPRESSOBJ_FLUSH_FINISH
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        sync, finish = zlib.Z_SYNC_FLUSH, zlib.Z_FINISH
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(sync)
+        if data:
+            yield data
+    tail = compressor.flush(finish)
+    if tail:
+        yield tail
+
+
+if __name__ == "__main__":
+    # microbenchmark: cas kodovani a bajty na draze pro kazdy format a kompresi, bez MongoDB
+    import time
+
+    rows = 100_000
+    start_time = datetime.datetime(2025, 1, 1)
+    wire = b"".join(bson.encode({
+        "plant_name": f"Hala_{'ABC'[i % 3]}", "machine_id": f"M_{i % 50:02d}",
+        "timestamp": start_time + datetime.timedelta(seconds=i), "temperature": 80.0 + i % 17 * 0.5,
+        "power_usage": 12.3 + i % 7 * 0.1, "status": "operational", "machine_hours": 1500 + i // 3600,
+    }) for i in range(rows))
+    print(f"{rows} documents, orjson {'yes' if orjson else 'no'}, zstd {'yes' if zstandard else 'no'}")
+
+    begin = time.perf_counter()
+    dict_docs = bson.decode_all(wire)
+    decode_time = time.perf_counter() - begin
+    baseline = json.JSONEncoder(default=_default)
+    begin = time.perf_counter()
+    body = ("[" + ",".join(baseline.encode(doc) for doc in dict_docs) + "]").encode("utf-8")
+    print(f"{'json.JSONEncoder (before)':<28} decode {decode_time * 1000:6.0f} ms  encode {(time.perf_counter() - begin) * 1000:6.0f} ms  {len(body) / 1e6:6.2f} MB")
+
+    # find_raw_batches: davky po ~CURSOR_BATCH_SIZE dokumentech jako bajty, bez dekodovani
+    offsets, position = [], 0
+    while position < len(wire):
+        offsets.append(position)
+        position += int.from_bytes(wire[position:position + 4], "little")
+    raw_batches = [wire[offsets[i]:offsets[i + 500] if i + 500 < len(offsets) else len(wire)] for i in range(0, len(offsets), 500)]
+
+    formats = [(mime, encoder, dict_docs, decode_time) for mime, encoder in ENCODERS.items()]
+    formats.append(("application/bson raw batches", lambda batches, _: encode_raw_batches(batches), raw_batches, 0.0))
+    for name, encoder, docs, decode in formats:
+        begin = time.perf_counter()
+        body = b"".join(encoder(docs, 200))
+        encode_time = time.perf_counter() - begin
+        print(f"{name:<28} decode {decode * 1000:6.0f} ms  encode {encode_time * 1000:6.0f} ms  {len(body) / 1e6:6.2f} MB")
+        for content_encoding in available_encodings():
+            begin = time.perf_counter()
+            compressed = b"".join(compress_stream(encoder(docs, 200), content_encoding))
+            print(f"  + {content_encoding:<24} {'':>16}encode {(time.perf_counter() - begin) * 1000:6.0f} ms  {len(compressed) / 1e6:6.2f} MB")
@@ -0,0 +1,118 @@
+""" Keyset (cursor based) pagination of GET /machine_data over the (timestamp, _id) key """
+
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from libs.query_parser import MAX_LIMIT, MongoQuery, QueryError
+
+DEFAULT_PAGE_SIZE = 1000
+
+
+def encode_token(doc: dict, direction: int) -> str:
+    """
+    Build the opaque next token from the last document of a page
+    :param doc: Last returned document, must contain timestamp and _id
+    :param direction: 1 = ascending, -1 = descending by timestamp
+    :return: URL safe token
+    """
+    raw = json.dumps([doc["timestamp"].isoformat(), str(doc["_id"]), direction])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_token(token: str) -> tuple[datetime, ObjectId, int]:
+    """
+    Decode the next token back to (timestamp, _id, direction)
+    :param token: Token returned by encode_token
+    :return: Tuple of the last seen key and sort direction
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        timestamp, object_id, direction = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(timestamp), ObjectId(object_id), int(direction)
+    except (ValueError, TypeError, InvalidId):
+        raise QueryError("Invalid next token")
+
+
+def parse_page_size(value: str) -> int:
+    """ Parse page_size parameter, capped to MAX_LIMIT """
+    try:
+        page_size = int(value)
+    except ValueError:
+        raise QueryError(f"Invalid page_size: {value!r}")
+    if page_size <= 0:
+        raise QueryError("page_size must be positive")
+    return min(page_size, MAX_LIMIT)
+
+
+def paginate(query: MongoQuery, query_params: dict) -> tuple[MongoQuery, int, int]:
+    """
+    Turn a parsed query into a query for one page.
+    The sort is always (timestamp, _id) so the order is stable and the next page
+    starts with an index seek right after the last key, not with skip. A limit is rejected.
+    :param query: Output of query_parser.parse_query
+    :param query_params: Output of urllib.parse.parse_qs
+    :return: (query for the page, page size, sort direction)
+    """
+    # limit by se se strankovanim nedal splnit (kazda stranka by ho pocitala znovu), proto se odmita
+    if "limit" in query_params:
+        raise QueryError("limit cannot be combined with page_size or next, use page_size")
+    page_size = parse_page_size(query_params.get("page_size", [str(DEFAULT_PAGE_SIZE)])[-1])
+
+    direction = 1
+    if query.sort:
+        if len(query.sort) != 1 or query.sort[0][0] != "timestamp":
+            raise QueryError("Paginated queries can be sorted only by timestamp")
+        direction = query.sort[0][1]
+
+    mongo_filter = query.filter
+    if "next" in query_params:
+        last_timestamp, last_id, token_direction = decode_token(query_params["next"][-1])
+        if token_direction != direction:
+            raise QueryError("Next token does not match the sort order")
+        op = "$gt" if direction == 1 else "$lt"
+        after_key = {"$or": [
+            {"timestamp": {op: last_timestamp}},
+            {"timestamp": last_timestamp, "_id": {op: last_id}},
+        ]}
+        mongo_filter = {"$and": [mongo_filter, after_key]} if mongo_filter else after_key
+
+    # _id a timestamp jsou potreba pro token, klientovi se vraci jen pokud o ne pozadal
+    projection = dict(query.projection)
+    projection.pop("_id", None)
+    if len(projection) > 0:
+        projection["timestamp"] = 1
+
+    page_query = MongoQuery(
+        filter=mongo_filter,
+        projection=projection or None,
+        sort=[("timestamp", direction), ("_id", direction)],
+        # o jeden dokument navic, aby bylo poznat, jestli existuje dalsi stranka
+        limit=page_size + 1,
+    )
+    return page_query, page_size, direction
+
+
+def split_page(docs: list[dict], query: MongoQuery, page_size: int, direction: int) -> tuple[list[dict], str | None]:
+    """
+    Cut the fetched documents to one page and build the next token
+    :param docs: Documents fetched with the query from paginate (page_size + 1 at most)
+    :param query: Original query from the client, decides which fields are returned
+    :param page_size: Requested page size
+    :param direction: Sort direction
+    :return: (documents for the client, next token or None on the last page)
+    """
+    next_token = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        next_token = encode_token(docs[-1], direction)
+
+    keep_timestamp = len(query.projection) == 1 or "timestamp" in query.projection
+    for doc in docs:
+        doc.pop("_id", None)
+        if not keep_timestamp:
+            doc.pop("timestamp", None)
+    return docs, next_token
@@ -0,0 +1,187 @@
+""" Parser of the query string for GET /machine_data into a typed MongoDB query """
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+# Schema of the machine_data documents written by data_transform.py
+SCHEMA = {
+    "timestamp": datetime,
+    "temperature": float,
+    "power_usage": float,
+    "machine_hours": int,
+    "status": str,
+    "machine_id": str,
+    "plant_name": str,
+}
+
+# Query operators, used as suffix of the field name, e.g. temperature__gt=95
+OPERATORS = {
+    "gt": "$gt",
+    "gte": "$gte",
+    "lt": "$lt",
+    "lte": "$lte",
+    "ne": "$ne",
+    "in": "$in",
+}
+
+# Parameters with special meaning, they are never used as a filter on a field
+RESERVED = {
+    "fields", "sort", "limit", "from", "to", "page_size", "next", "format",
+    # parametry agregacnich endpointu, viz aggregations.py
+    "group", "interval", "by", "n",
+}
+
+MAX_LIMIT = 10_000
+
+RELATIVE_TIME = re.compile(r"^-(\d+)([smhd])$")
+_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}
+
+
+class QueryError(ValueError):
+    """ Invalid query string, the server answers with 400 Bad Request """
+
+
+@dataclass
+class MongoQuery:
+    """ Result of parse_query, ready for collection.find() """
+    filter: dict = field(default_factory=dict)
+    projection: dict = field(default_factory=lambda: {"_id": 0})
+    sort: list = field(default_factory=list)
+    limit: int = 0
+
+
+def parse_datetime(value: str) -> datetime:
+    """
+    Parse a time value from the query string
+    :param value: ISO 8601 string, unix timestamp in seconds or relative time like -10m, -2h, -1d
+    :return: datetime
+    """
+    match = RELATIVE_TIME.match(value)
+    if match:
+        amount, unit = match.groups()
+        return datetime.now(timezone.utc) - timedelta(**{_UNITS[unit]: int(amount)})
+    try:
+        return datetime.fromtimestamp(float(value), tz=timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise QueryError(f"Invalid datetime: {value!r}")
+
+
+def coerce(field_name: str, value: str):
+    """
+    Convert a string value from the query string to the type of the field
+    :param field_name: Name of the field from SCHEMA
+    :param value: Raw string value
+    :return: Value with the real type of the field
+    """
+    field_type = SCHEMA[field_name]
+    if field_type is datetime:
+        return parse_datetime(value)
+    try:
+        return field_type(value)
+    except ValueError:
+        raise QueryError(f"Invalid value {value!r} for field '{field_name}' ({field_type.__name__})")
+
+
+def check_field(name: str) -> str:
+    """ Raise QueryError if the name is not a field of machine_data """
+    if name not in SCHEMA:
+        raise QueryError(f"Unknown field '{name}', allowed: {', '.join(SCHEMA)}")
+    return name
+
+
+def parse_filter(query_params: dict) -> dict:
+    """
+    Build the MongoDB filter from parsed query string
+    :param query_params: Output of urllib.parse.parse_qs
+    :return: MongoDB filter
+    """
+    mongo_filter = {}
+    for key, values in query_params.items():
+        if key in RESERVED:
+            continue
+        name, _, op = key.partition("__")
+        check_field(name)
+        if op and op not in OPERATORS:
+            raise QueryError(f"Unknown operator '{op}', allowed: {', '.join(OPERATORS)}")
+
+        value = values[-1]
+        if not op:
+            mongo_filter[name] = coerce(name, value)
+            continue
+        if op == "in":
+            # status__in=IDLE,error nebo status__in=IDLE&status__in=error
+            items = [v for raw in values for v in raw.split(",") if v]
+            condition = {"$in": [coerce(name, v) for v in items]}
+        else:
+            condition = {OPERATORS[op]: coerce(name, value)}
+
+        existing = mongo_filter.get(name)
+        if existing is not None and not isinstance(existing, dict):
+            raise QueryError(f"Field '{name}' has both equality and operator condition")
+        mongo_filter.setdefault(name, {}).update(condition)
+
+    # Casove okno from/to, from je vcetne, to neni
+    time_window = {}
+    if "from" in query_params:
+        time_window["$gte"] = parse_datetime(query_params["from"][-1])
+    if "to" in query_params:
+        time_window["$lt"] = parse_datetime(query_params["to"][-1])
+    if time_window:
+        existing = mongo_filter.get("timestamp")
+        if existing is not None and not isinstance(existing, dict):
+            raise QueryError("Field 'timestamp' has both equality and from/to condition")
+        mongo_filter.setdefault("timestamp", {}).update(time_window)
+    return mongo_filter
+
+
+def parse_projection(value: str) -> dict:
+    """ fields=timestamp,temperature -> {"_id": 0, "timestamp": 1, "temperature": 1} """
+    projection = {"_id": 0}
+    for name in value.split(","):
+        if name:
+            projection[check_field(name)] = 1
+    return projection
+
+
+def parse_sort(value: str) -> list:
+    """ sort=-timestamp,machine_id -> [("timestamp", -1), ("machine_id", 1)] """
+    sort = []
+    for name in value.split(","):
+        if not name:
+            continue
+        direction = -1 if name.startswith("-") else 1
+        sort.append((check_field(name.lstrip("+-")), direction))
+    return sort
+
+
+def parse_limit(value: str) -> int:
+    """ Parse the limit parameter, capped to MAX_LIMIT """
+    try:
+        limit = int(value)
+    except ValueError:
+        raise QueryError(f"Invalid limit: {value!r}")
+    if limit < 0:
+        raise QueryError("Limit must not be negative")
+    return min(limit, MAX_LIMIT)
+
+
+def parse_query(query_params: dict) -> MongoQuery:
+    """
+    Parse the whole query string of GET /machine_data
+    :param query_params: Output of urllib.parse.parse_qs
+    :return: MongoQuery with filter, projection, sort and limit
+    """
+    query = MongoQuery(filter=parse_filter(query_params))
+    if "fields" in query_params:
+        query.projection = parse_projection(query_params["fields"][-1])
+    if "sort" in query_params:
+        query.sort = parse_sort(query_params["sort"][-1])
+    if "limit" in query_params:
+        query.limit = parse_limit(query_params["limit"][-1])
+    return query
+
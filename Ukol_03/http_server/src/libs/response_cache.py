@@ -0,0 +1,110 @@
+""" In-process LRU/TTL cache of encoded HTTP responses with invalidation on new data """
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from libs.query_parser import RELATIVE_TIME
+
+
+@dataclass
+class CacheEntry:
+    """ One cached response """
+    version: tuple
+    etag: str
+    content_type: str
+    headers: dict
+    body: bytes
+    created: float
+
+
+def make_key(path: str, query_params: dict, content_type: str, content_encoding: str | None = None) -> str:
+    """
+    Normalized cache key, the order of parameters and values does not matter
+    :param path: Request path
+    :param query_params: Output of urllib.parse.parse_qs
+    :param content_type: Negotiated content type of the response
+    :param content_encoding: Negotiated compression, the cached body is stored compressed
+    :return: Cache key
+    """
+    params = "&".join(f"{k}={','.join(sorted(v))}" for k, v in sorted(query_params.items()))
+    return f"{path}?{params}|{content_type}|{content_encoding or 'identity'}"
+
+
+def make_etag(key: str, version: tuple) -> str:
+    """ ETag of a response, changes whenever the data version changes """
+    return '"' + hashlib.sha1(f"{key}|{version}".encode("utf-8")).hexdigest() + '"'
+
+
+def is_cacheable(query_params: dict) -> bool:
+    """ Queries with relative time (from=-10m) change without new data, they are not cached """
+    return not any(RELATIVE_TIME.match(v) for values in query_params.values() for v in values)
+
+
+class ResponseCache:
+    """ Thread-safe LRU cache of response bytes limited by total size and by age """
+
+    def __init__(self, max_bytes: int, ttl: float, max_entry_bytes: int):
+        """
+        :param max_bytes: Memory cap of all cached bodies
+        :param ttl: Maximum age of an entry in seconds
+        :param max_entry_bytes: Bigger responses are not cached at all
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._size -= len(entry.body)
+
+    def get(self, key: str, version: tuple) -> CacheEntry | None:
+        """
+        Return the cached response if it is fresh and was built from the same data version
+        :param key: Key from make_key
+        :param version: Current data version from mongo_basic.read_data_version
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.version != version or time.monotonic() - entry.created > self.ttl):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, version: tuple, etag: str, content_type: str, headers: dict, body: bytes):
+        """ Store a response, least recently used entries are evicted above max_bytes """
+        if len(body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CacheEntry(version, etag, content_type, headers, body, time.monotonic())
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """ Hit/miss counters and current size """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,63 @@
+import datetime
+import http.client
+import threading
+from http.server import ThreadingHTTPServer
+
+import mongomock
+import pytest
+
+# http_server a jeho libs importuje az fixture, sys.path nastavuje conftest.py v koreni repozitare
+
+
+class Server:
+    """ http_server.MyHandler on a free local port over a mongomock database """
+
+    def __init__(self, http_server, db):
+        self.db = db
+        self.collection = db[http_server.COLLECTION_NAME]
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), http_server.MyHandler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def get(self, path: str, headers: dict | None = None) -> http.client.HTTPResponse:
+        """ One GET request on a new connection, the body is read completely """
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        connection.request("GET", path, headers=headers or {})
+        response = connection.getresponse()
+        response.data = response.read()
+        connection.close()
+        return response
+
+
+@pytest.fixture
+def server(monkeypatch):
+    import http_server
+    db = mongomock.MongoClient()["test_http_server"]
+    monkeypatch.setattr(http_server, "db", db)
+    monkeypatch.setattr(http_server, "collection", db[http_server.COLLECTION_NAME])
+    monkeypatch.setattr(http_server, "cache", http_server.response_cache.ResponseCache(1024 * 1024, 300, 256 * 1024))
+    monkeypatch.setattr(http_server, "COMPRESSION", False)
+    running = Server(http_server, db)
+    running.thread.start()
+    yield running
+    running.httpd.shutdown()
+    running.httpd.server_close()
+
+
+@pytest.fixture
+def machine_docs():
+    """ Factory of machine_data documents, one reading per second and machine """
+
+    def make(count: int, machines: int = 3, start: datetime.datetime = datetime.datetime(2025, 1, 1)) -> list[dict]:
+        return [{
+            "plant_name": "Hala_A",
+            "machine_id": f"M_{i % machines:02d}",
+            "timestamp": start + datetime.timedelta(seconds=i // machines),
+            "temperature": 80.0 + i % 20,
+            "power_usage": 12.0 + i % 5 * 0.5,
+            "status": "error" if i % 7 == 0 else "operational",
+            "machine_hours": 1000 + i,
+        } for i in range(count)]
+
+    return make
@@ -0,0 +1,107 @@
+import datetime
+
+import pytest
+
+from libs import aggregations
+from libs.query_parser import QueryError
+
+RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+
+def test_stats_pipeline_groups_and_flattens():
+    pipeline = aggregations.stats_pipeline({"group": ["machine_id,status"], "plant_name": ["Hala_A"]})
+
+    match, group, project, sort = pipeline
+    assert match == {"$match": {"plant_name": "Hala_A"}}
+    assert group["$group"]["_id"] == {"machine_id": "$machine_id", "status": "$status"}
+    assert group["$group"]["temperature_avg"] == {"$avg": "$temperature"}
+    assert project["$project"]["machine_id"] == "$_id.machine_id"
+    assert project["$project"]["power_usage_p95"] == {"$arrayElemAt": ["$power_usage_pct", 1]}
+    assert sort == {"$sort": {"machine_id": 1, "status": 1}}
+
+
+def test_stats_pipeline_without_group_sorts_by_count():
+    pipeline = aggregations.stats_pipeline({"group": [""]})
+
+    assert pipeline[1]["$group"]["_id"] is None
+    assert pipeline[-1] == {"$sort": {"count": -1}}
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("30s", {"unit": "second", "binSize": 30}),
+    ("15m", {"unit": "minute", "binSize": 15}),
+    ("1d", {"unit": "day", "binSize": 1}),
+])
+def test_parse_interval(value, expected):
+    assert aggregations.parse_interval(value) == expected
+
+
+@pytest.mark.parametrize("params", [
+    {"interval": ["0m"]},
+    {"interval": ["5w"]},
+    {"group": ["temperature"]},
+])
+def test_rollup_pipeline_rejects_invalid_parameters(params):
+    with pytest.raises(QueryError):
+        aggregations.rollup_pipeline(params)
+
+
+def test_rollup_pipeline_buckets_by_interval():
+    pipeline = aggregations.rollup_pipeline({"interval": ["15m"], "group": ["plant_name"]})
+
+    assert pipeline[1]["$group"]["_id"] == {
+        "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": "minute", "binSize": 15}},
+        "plant_name": "$plant_name",
+    }
+    assert pipeline[-1] == {"$sort": {"bucket": 1, "plant_name": 1}}
+
+
+def test_rollup_source_uses_coarsest_aligned_resolution():
+    params = {"interval": ["1d"], "from": ["2025-01-01T00:00:00Z"], "to": ["2025-01-08T00:00:00Z"]}
+
+    resolution, pipeline = aggregations.rollup_source(params, RESOLUTIONS)
+
+    assert resolution == "1d"
+    assert set(pipeline[0]["$match"]["bucket"]) == {"$gte", "$lt"}
+    assert pipeline[1]["$group"]["_id"]["bucket"]["$dateTrunc"]["date"] == "$bucket"
+
+
+def test_rollup_source_falls_back_for_unaligned_window():
+    params = {"interval": ["1h"], "from": ["2025-01-01T00:00:30Z"]}
+
+    resolution, _ = aggregations.rollup_source({"interval": ["1h"]}, RESOLUTIONS)
+
+    assert resolution == "1h"
+    assert aggregations.rollup_source(params, RESOLUTIONS) is None
+
+
+@pytest.mark.parametrize("params", [
+    {"group": ["status"]},
+    {"status": ["error"]},
+    {"interval": ["90s"]},
+])
+def test_rollup_source_needs_raw_data(params):
+    assert aggregations.rollup_source(params, RESOLUTIONS) is None
+
+
+def test_merge_status_seconds():
+    docs = [{"bucket": datetime.datetime(2025, 1, 1), "status_seconds": [{"error": 10.0}, {"error": 5.0, "idle": 1.0}, None]}]
+
+    assert aggregations.merge_status_seconds(docs)[0]["status_seconds"] == {"error": 15.0, "idle": 1.0}
+
+
+def test_top_pipeline_limits_and_ranks_by_metric():
+    pipeline = aggregations.top_pipeline({"by": ["power_usage"], "n": ["5"]})
+
+    assert pipeline[1]["$group"]["peak"]["$top"]["sortBy"] == {"power_usage": -1}
+    assert pipeline[-2:] == [{"$sort": {"max": -1}}, {"$limit": 5}]
+
+
+@pytest.mark.parametrize("params", [{"n": ["0"]}, {"n": ["abc"]}, {"n": ["101"]}, {"by": ["status"]}])
+def test_top_pipeline_rejects_invalid_parameters(params):
+    with pytest.raises(QueryError):
+        aggregations.top_pipeline(params)
+
+
+def test_endpoint_answers_400_on_invalid_group(server):
+    assert server.get("/machine_data/stats?group=temperature").status == 400
@@ -0,0 +1,124 @@
+import datetime
+import gzip
+import json
+import zlib
+
+import bson
+import pytest
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+
+from libs import encoding
+
+DOCS = [{
+    "_id": ObjectId("65a000000000000000000001"),
+    "plant_name": "Hala_A",
+    "machine_id": f"M_{i:02d}",
+    "timestamp": datetime.datetime(2025, 1, 1, 0, 0, i, 250000 * (i % 2)),
+    "temperature": 80.5 + i / 3,
+    "power_usage": 12,
+    "status": "error" if i % 3 == 0 else "operational",
+    "machine_hours": None,
+} for i in range(20)]
+
+
+def old_json(docs) -> bytes:
+    """ Response body of the server before orjson: json.JSONEncoder over the whole list """
+    return json.JSONEncoder(default=encoding._default).encode(docs).encode("utf-8")
+
+
+def zstd_decompress(data: bytes) -> bytes:
+    # stream bez velikosti obsahu v hlavicce ramce, ZstdDecompressor.decompress by ho odmitl
+    zstandard = pytest.importorskip("zstandard")
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate, br", "gzip"),
+    ("GZIP ; q=0.8", "gzip"),
+    ("gzip, zstd", "zstd"),
+    ("zstd;q=0.5, gzip", "gzip"),
+    ("gzip;q=0.5, zstd;q=0.9", "zstd"),
+    ("gzip;q=0", None),
+    ("gzip;q=0, zstd;q=0", None),
+    ("gzip;q=hot", None),
+    ("*", "zstd"),
+    ("*;q=0", None),
+    ("zstd;q=0, *", "gzip"),
+    ("*;q=0.1, gzip;q=0.5", "gzip"),
+    ("*;q=0.9, gzip;q=0.5", "zstd"),
+])
+def test_negotiate_encoding_q_values(accept_encoding, expected):
+    pytest.importorskip("zstandard")
+
+    assert encoding.negotiate_encoding(accept_encoding) == expected
+
+
+def test_negotiate_encoding_without_zstandard(monkeypatch):
+    monkeypatch.setattr(encoding, "zstandard", None)
+
+    assert encoding.available_encodings() == ["gzip"]
+    assert encoding.negotiate_encoding("zstd") is None
+    assert encoding.negotiate_encoding("zstd, gzip;q=0.1") == "gzip"
+    assert encoding.negotiate_encoding("*") == "gzip"
+
+
+def test_gzip_stream_round_trip_is_flushed_per_chunk():
+    chunks = list(encoding.encode_ndjson(DOCS, 3))
+
+    compressed = list(encoding.compress_stream(iter(chunks), "gzip"))
+
+    assert all(compressed)
+    assert gzip.decompress(b"".join(compressed)) == b"".join(chunks)
+    # po sync flush jde prvni chunk dekomprimovat hned, bez zbytku proudu
+    assert zlib.decompressobj(31).decompress(compressed[0]) == chunks[0]
+
+
+def test_zstd_stream_round_trip():
+    pytest.importorskip("zstandard")
+    chunks = list(encoding.encode_json(DOCS, 3))
+
+    compressed = list(encoding.compress_stream(iter(chunks), "zstd"))
+
+    assert all(compressed)
+    assert zstd_decompress(b"".join(compressed)) == b"".join(chunks)
+    assert zstd_decompress(compressed[0]) == chunks[0]
+
+
+def test_empty_stream_is_a_valid_gzip_member():
+    assert gzip.decompress(b"".join(encoding.compress_stream(iter([]), "gzip"))) == b""
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_matches_old_json_output(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(encoding, "orjson", None)
+
+    body = b"".join(encoding.encode_json(DOCS, 7))
+    lines = b"".join(encoding.encode_ndjson(DOCS, 7)).splitlines()
+
+    assert json.loads(body) == json.loads(old_json(DOCS))
+    assert [json.loads(line) for line in lines] == json.loads(old_json(DOCS))
+    # kompaktni oddelovace, jinak stejne bajty jako json.JSONEncoder
+    assert body == json.JSONEncoder(default=encoding._default, separators=(",", ":")).encode(DOCS).encode("utf-8")
+
+
+def test_raw_bson_document_is_encoded_as_json():
+    raw = RawBSONDocument(bson.encode(DOCS[1]))
+
+    assert json.loads(encoding.dumps([raw])) == json.loads(old_json([DOCS[1]]))
+
+
+def test_raw_batches_match_encoded_documents():
+    # find_raw_batches vraci davky zretezenych BSON dokumentu, na draze jsou stejne jako encode_bson
+    batches = [b"".join(bson.encode(doc) for doc in DOCS[start:start + 6]) for start in range(0, len(DOCS), 6)]
+
+    body = b"".join(encoding.encode_raw_batches(iter(batches + [b""])))
+
+    assert body == b"".join(encoding.encode_bson(DOCS, 5))
+    assert bson.decode_all(body) == DOCS
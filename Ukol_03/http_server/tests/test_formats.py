@@ -0,0 +1,50 @@
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import http_server
+
+
+def test_parquet_body_decodes_with_schema(server, machine_docs):
+    server.collection.insert_many(machine_docs(3 * http_server.CURSOR_BATCH_SIZE))
+
+    response = server.get("/machine_data?format=parquet&machine_id=M_01&sort=timestamp")
+
+    assert response.status == 200
+    assert response.getheader("Content-Type") == http_server.columnar.PARQUET_MIME
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    table = pq.read_table(io.BytesIO(response.data))
+    assert table.schema == http_server.columnar.SCHEMA
+    assert table.num_rows == http_server.CURSOR_BATCH_SIZE
+    assert set(table.column("machine_id").to_pylist()) == {"M_01"}
+    timestamps = table.column("timestamp").to_pylist()
+    assert timestamps == sorted(timestamps)
+
+
+def test_arrow_body_with_projection(server, machine_docs):
+    docs = machine_docs(100)
+    server.collection.insert_many(docs)
+
+    response = server.get("/machine_data?format=arrow&fields=machine_id,temperature&status=error")
+
+    assert response.getheader("Content-Type") == http_server.columnar.ARROW_MIME
+    table = pa.ipc.open_stream(io.BytesIO(response.data)).read_all()
+    assert table.schema.names == ["machine_id", "temperature"]
+    assert table.column("temperature").to_pylist() == [doc["temperature"] for doc in docs if doc["status"] == "error"]
+
+
+def test_parquet_is_not_compressed_again(server, machine_docs, monkeypatch):
+    monkeypatch.setattr(http_server, "COMPRESSION", True)
+    server.collection.insert_many(machine_docs(300))
+
+    parquet = server.get("/machine_data?format=parquet", {"Accept-Encoding": "gzip"})
+    arrow = server.get("/machine_data?format=arrow", {"Accept-Encoding": "gzip"})
+
+    assert parquet.getheader("Content-Encoding") is None
+    assert pq.read_table(io.BytesIO(parquet.data)).num_rows == 300
+    assert arrow.getheader("Content-Encoding") == "gzip"
+
+
+def test_unknown_format_is_400(server):
+    assert server.get("/machine_data?format=csv").status == 400
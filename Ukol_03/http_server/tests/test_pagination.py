@@ -0,0 +1,108 @@
+import datetime
+import json
+
+import pytest
+from bson import ObjectId
+
+from libs import pagination
+from libs.query_parser import MongoQuery, QueryError
+
+
+def fetch_all_pages(server, path: str) -> tuple[list[dict], int]:
+    """ Follow X-Next-Token until the last page, return all documents and the number of pages """
+    docs, pages = [], 0
+    separator = "&" if "?" in path else "?"
+    token = None
+    while True:
+        response = server.get(path + (f"{separator}next={token}" if token else ""))
+        assert response.status == 200
+        docs.extend(json.loads(response.data))
+        pages += 1
+        token = response.getheader("X-Next-Token")
+        if token is None:
+            return docs, pages
+
+
+def test_token_round_trip():
+    doc = {"timestamp": datetime.datetime(2025, 1, 1, 12, 30), "_id": ObjectId()}
+
+    token = pagination.encode_token(doc, -1)
+
+    assert pagination.decode_token(token) == (doc["timestamp"], doc["_id"], -1)
+
+
+def test_invalid_token_is_a_query_error():
+    with pytest.raises(QueryError):
+        pagination.decode_token("not-a-token")
+
+
+@pytest.mark.parametrize("sort", ["", "&sort=-timestamp"])
+def test_pages_cover_all_documents_once(server, machine_docs, sort):
+    # tri stroje maji stejny timestamp, poradi v ramci timestampu urcuje _id
+    server.collection.insert_many(machine_docs(1000))
+    expected = sorted(
+        server.collection.find({}, {"_id": 1, "machine_hours": 1, "timestamp": 1}),
+        key=lambda doc: (doc["timestamp"], doc["_id"]),
+        reverse=bool(sort),
+    )
+
+    docs, pages = fetch_all_pages(server, f"/machine_data?page_size=97{sort}")
+
+    assert pages == 11
+    assert [doc["machine_hours"] for doc in docs] == [doc["machine_hours"] for doc in expected]
+
+
+def test_page_boundary_inside_equal_timestamps(server, machine_docs):
+    server.collection.insert_many(machine_docs(30))
+
+    docs, pages = fetch_all_pages(server, "/machine_data?page_size=2&fields=machine_hours")
+
+    assert pages == 15
+    assert sorted(doc["machine_hours"] for doc in docs) == list(range(1000, 1030))
+    assert all(set(doc) == {"machine_hours"} for doc in docs)
+
+
+def test_documents_inserted_while_paging(server, machine_docs):
+    docs = machine_docs(20)
+    server.collection.insert_many(docs[:10])
+
+    first = server.get("/machine_data?page_size=5")
+    server.collection.insert_many(docs[10:])
+    rest, _ = fetch_all_pages(server, f"/machine_data?page_size=5&next={first.getheader('X-Next-Token')}")
+
+    hours = [doc["machine_hours"] for doc in json.loads(first.data) + rest]
+    assert sorted(hours) == list(range(1000, 1020))
+    assert len(set(hours)) == 20
+
+
+def test_link_header_keeps_the_filter(server, machine_docs):
+    server.collection.insert_many(machine_docs(50))
+
+    response = server.get("/machine_data?status=error&page_size=3")
+
+    token = response.getheader("X-Next-Token")
+    assert response.getheader("Link") == f'</machine_data?status=error&page_size=3&next={token}>; rel="next"'
+
+
+def test_token_of_other_sort_order_is_rejected(server, machine_docs):
+    server.collection.insert_many(machine_docs(10))
+    token = server.get("/machine_data?page_size=2").getheader("X-Next-Token")
+
+    response = server.get(f"/machine_data?page_size=2&sort=-timestamp&next={token}")
+
+    assert response.status == 400
+
+
+@pytest.mark.parametrize("params", ["limit=5&page_size=2", "limit=5&next=abc", "limit=0&page_size=2"])
+def test_limit_with_pagination_is_rejected(server, machine_docs, params):
+    server.collection.insert_many(machine_docs(10))
+
+    response = server.get(f"/machine_data?{params}")
+
+    assert response.status == 400
+    assert b"limit" in response.data
+
+
+def test_paginate_rejects_limit():
+    with pytest.raises(QueryError, match="limit"):
+        pagination.paginate(MongoQuery(limit=5), {"limit": ["5"], "page_size": ["2"]})
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from libs.query_parser import MAX_LIMIT, QueryError, parse_datetime, parse_query
+
+
+def parse(query_string: str):
+    """ Query string as parse_qs returns it, values always in lists """
+    params = {}
+    for item in query_string.split("&"):
+        key, _, value = item.partition("=")
+        params.setdefault(key, []).append(value)
+    return parse_query(params)
+
+
+@pytest.mark.parametrize("query_string, expected", [
+    ("temperature=95", {"temperature": 95.0}),
+    ("machine_hours=1500", {"machine_hours": 1500}),
+    ("status=error", {"status": "error"}),
+    ("machine_id=42", {"machine_id": "42"}),
+    ("timestamp=2025-01-01T00:00:00Z", {"timestamp": datetime(2025, 1, 1, tzinfo=timezone.utc)}),
+])
+def test_values_are_coerced_to_the_schema_type(query_string, expected):
+    query_filter = parse(query_string).filter
+
+    assert query_filter == expected
+    assert [type(value) for value in query_filter.values()] == [type(value) for value in expected.values()]
+
+
+@pytest.mark.parametrize("op, mongo_op", [("gt", "$gt"), ("gte", "$gte"), ("lt", "$lt"), ("lte", "$lte"), ("ne", "$ne")])
+def test_comparison_operators(op, mongo_op):
+    assert parse(f"temperature__{op}=95.5").filter == {"temperature": {mongo_op: 95.5}}
+    assert parse(f"machine_hours__{op}=10").filter == {"machine_hours": {mongo_op: 10}}
+
+
+def test_operators_of_one_field_are_merged():
+    assert parse("temperature__gte=80&temperature__lt=95").filter == {"temperature": {"$gte": 80.0, "$lt": 95.0}}
+
+
+def test_in_operator_with_list_and_repeated_parameter():
+    assert parse("status__in=IDLE,error").filter == {"status": {"$in": ["IDLE", "error"]}}
+    assert parse("status__in=IDLE&status__in=error,").filter == {"status": {"$in": ["IDLE", "error"]}}
+    assert parse("machine_hours__in=1,2").filter == {"machine_hours": {"$in": [1, 2]}}
+
+
+def test_time_window_and_unix_time():
+    query_filter = parse("from=1735689600&to=2025-01-02").filter
+
+    assert query_filter == {"timestamp": {"$gte": datetime(2025, 1, 1, tzinfo=timezone.utc), "$lt": datetime(2025, 1, 2)}}
+
+
+def test_relative_time():
+    before = datetime.now(timezone.utc)
+
+    value = parse_datetime("-10m")
+
+    assert before - timedelta(minutes=10, seconds=1) < value <= datetime.now(timezone.utc) - timedelta(minutes=10)
+
+
+def test_fields_sort_and_limit():
+    query = parse(f"fields=timestamp,temperature&sort=-timestamp,machine_id&limit={MAX_LIMIT + 1}")
+
+    assert query.projection == {"_id": 0, "timestamp": 1, "temperature": 1}
+    assert query.sort == [("timestamp", -1), ("machine_id", 1)]
+    assert query.limit == MAX_LIMIT
+
+
+@pytest.mark.parametrize("query_string", [
+    "temperature=hot",
+    "machine_hours=1.5",
+    "machine_hours__in=1,x",
+    "temperature__between=1",
+    "pressure=1",
+    "timestamp=yesterday",
+    "status=error&status__ne=IDLE",
+    "timestamp=2025-01-01&from=2025-01-01",
+    "fields=timestamp,pressure",
+    "sort=-pressure",
+    "limit=-1",
+    "limit=ten",
+])
+def test_invalid_queries(query_string):
+    with pytest.raises(QueryError):
+        parse(query_string)
@@ -0,0 +1,117 @@
+import datetime
+import json
+
+import http_server
+from libs import response_cache
+
+
+def test_key_does_not_depend_on_parameter_order():
+    first = response_cache.make_key("/machine_data", {"status": ["error"], "machine_id": ["M_01"]}, "application/json")
+    second = response_cache.make_key("/machine_data", {"machine_id": ["M_01"], "status": ["error"]}, "application/json")
+
+    assert first == second
+    assert first != response_cache.make_key("/machine_data", {"status": ["error"]}, "application/json")
+
+
+def test_relative_time_is_not_cacheable():
+    assert response_cache.is_cacheable({"status": ["error"], "from": ["2025-01-01"]})
+    assert not response_cache.is_cacheable({"from": ["-10m"]})
+
+
+def test_entry_of_older_version_is_dropped():
+    cache = response_cache.ResponseCache(1024, 300, 1024)
+    cache.put("key", (1, None), '"etag"', "application/json", {}, b"[]")
+
+    assert cache.get("key", (1, None)).body == b"[]"
+    assert cache.get("key", (2, None)) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = response_cache.ResponseCache(10, 300, 10)
+    cache.put("a", (1,), "", "", {}, b"aaaa")
+    cache.put("b", (1,), "", "", {}, b"bbbb")
+    cache.get("a", (1,))
+    cache.put("c", (1,), "", "", {}, b"cccc")
+
+    assert cache.get("b", (1,)) is None
+    assert cache.get("a", (1,)) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 8
+
+
+def test_expired_and_oversized_entries(monkeypatch):
+    cache = response_cache.ResponseCache(100, 60, 5)
+    cache.put("big", (1,), "", "", {}, b"123456")
+    cache.put("small", (1,), "", "", {}, b"123")
+    now = response_cache.time.monotonic()
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now + 61)
+
+    assert cache.get("big", (1,)) is None
+    assert cache.get("small", (1,)) is None
+
+
+def test_hit_and_not_modified(server, machine_docs):
+    server.collection.insert_many(machine_docs(30))
+
+    first = server.get("/machine_data?status=error")
+    second = server.get("/machine_data?status=error")
+    etag = second.getheader("ETag")
+    not_modified = server.get("/machine_data?status=error", {"If-None-Match": etag})
+
+    assert first.getheader("X-Cache") == "MISS"
+    assert second.getheader("X-Cache") == "HIT"
+    assert second.data == first.data
+    assert etag == first.getheader("ETag")
+    assert not_modified.status == 304
+    assert not_modified.data == b""
+
+
+def test_insert_is_never_served_stale(server, machine_docs):
+    # zapis jako data_transform.py: insert_bulk zvysi verzi dat
+    docs = machine_docs(60)
+    http_server.mongo_basic.insert_bulk(server.db, http_server.COLLECTION_NAME, docs[:30])
+    before = server.get("/machine_data?status=error")
+    assert server.get("/machine_data?status=error").getheader("X-Cache") == "HIT"
+
+    http_server.mongo_basic.insert_bulk(server.db, http_server.COLLECTION_NAME, docs[30:])
+    after = server.get("/machine_data?status=error")
+    revalidated = server.get("/machine_data?status=error", {"If-None-Match": before.getheader("ETag")})
+
+    assert after.getheader("X-Cache") == "MISS"
+    assert len(json.loads(after.data)) == len([i for i in range(60) if i % 7 == 0])
+    assert after.getheader("ETag") != before.getheader("ETag")
+    assert revalidated.status == 200
+    assert revalidated.data == after.data
+
+
+def test_insert_without_version_bump_is_detected(server, machine_docs):
+    # jiny zapisovac, ktery verzi nezvysuje: zmenu prozradi nejnovejsi (timestamp, _id)
+    server.collection.insert_many(machine_docs(30))
+    before = server.get("/machine_data")
+
+    server.collection.insert_one({**machine_docs(1)[0], "timestamp": datetime.datetime(2025, 2, 1)})
+    after = server.get("/machine_data")
+
+    assert after.getheader("X-Cache") == "MISS"
+    assert len(json.loads(after.data)) == len(json.loads(before.data)) + 1
+
+
+def test_relative_time_query_is_not_cached(server, machine_docs):
+    server.collection.insert_many(machine_docs(3))
+
+    response = server.get("/machine_data?from=-10m")
+
+    assert response.status == 200
+    assert response.getheader("ETag") is None
+    assert response.getheader("X-Cache") is None
+
+
+def test_cache_stats(server, machine_docs):
+    server.collection.insert_many(machine_docs(3))
+    server.get("/machine_data")
+    server.get("/machine_data")
+
+    stats = json.loads(server.get("/cache_stats").data)
+
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
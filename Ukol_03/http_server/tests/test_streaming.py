@@ -0,0 +1,105 @@
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import http_server
+
+
+def test_ndjson_is_streamed_in_chunks(server, machine_docs):
+    server.collection.insert_many(machine_docs(3 * http_server.CURSOR_BATCH_SIZE + 7))
+
+    response = server.get("/machine_data", {"Accept": "application/x-ndjson"})
+
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "application/x-ndjson"
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    assert response.getheader("Content-Length") is None
+    docs = [json.loads(line) for line in response.data.splitlines()]
+    assert len(docs) == 3 * http_server.CURSOR_BATCH_SIZE + 7
+    assert docs[0]["timestamp"] == "2025-01-01T00:00:00"
+    assert "_id" not in docs[0]
+
+
+def test_json_array_matches_ndjson(server, machine_docs):
+    server.collection.insert_many(machine_docs(1000))
+
+    array = json.loads(server.get("/machine_data?status=error").data)
+    lines = server.get("/machine_data?status=error", {"Accept": "application/x-ndjson"}).data.splitlines()
+
+    assert array == [json.loads(line) for line in lines]
+    assert len(array) == len([i for i in range(1000) if i % 7 == 0])
+    assert {doc["status"] for doc in array} == {"error"}
+
+
+def test_empty_result_is_valid_json(server):
+    response = server.get("/machine_data?status=error")
+
+    assert response.status == 200
+    assert json.loads(response.data) == []
+
+
+def test_invalid_query_returns_400_before_streaming(server):
+    response = server.get("/machine_data?temperature__gt=hot")
+
+    assert response.status == 400
+
+
+def test_parallel_clients(server, machine_docs):
+    # jednoduchy zatezovy test: soubezni klienti dostanou kazdy celou a spravnou odpoved
+    server.collection.insert_many(machine_docs(2000))
+    paths = [f"/machine_data?machine_id=M_{i % 3:02d}" for i in range(24)]
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        responses = list(pool.map(lambda path: server.get(path, {"Accept": "application/x-ndjson"}), paths))
+
+    for path, response in zip(paths, responses):
+        assert response.status == 200
+        docs = [json.loads(line) for line in response.data.splitlines()]
+        assert len(docs) in (666, 667)
+        assert {doc["machine_id"] for doc in docs} == {path.rsplit("=", 1)[1]}
+
+
+@pytest.mark.parametrize("accept_encoding, content_encoding", [("gzip", "gzip"), ("zstd, gzip;q=0.5", "zstd")])
+def test_stream_is_compressed_as_negotiated(server, machine_docs, monkeypatch, accept_encoding, content_encoding):
+    if content_encoding == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        decompress = lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    else:
+        decompress = gzip.decompress
+    monkeypatch.setattr(http_server, "COMPRESSION", True)
+    server.collection.insert_many(machine_docs(2 * http_server.CURSOR_BATCH_SIZE))
+    plain = server.get("/machine_data", {"Accept": "application/x-ndjson"})
+
+    response = server.get("/machine_data", {"Accept": "application/x-ndjson", "Accept-Encoding": accept_encoding})
+
+    assert response.getheader("Content-Encoding") == content_encoding
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    assert "Accept-Encoding" in response.getheader("Vary")
+    assert plain.getheader("Content-Encoding") is None
+    assert decompress(response.data) == plain.data
+    assert len(response.data) < len(plain.data) / 4
+
+
+@pytest.mark.parametrize("accept_encoding", ["", "gzip;q=0", "br"])
+def test_no_acceptable_encoding_is_sent_plain(server, machine_docs, monkeypatch, accept_encoding):
+    monkeypatch.setattr(http_server, "COMPRESSION", True)
+    server.collection.insert_many(machine_docs(300))
+
+    response = server.get("/machine_data", {"Accept-Encoding": accept_encoding})
+
+    assert response.getheader("Content-Encoding") is None
+    # i nekomprimovana odpoved zavisi na Accept-Encoding, sdilena cache ji nesmi poslat jinemu klientovi
+    assert "Accept-Encoding" in response.getheader("Vary")
+    assert len(json.loads(response.data)) == 300
+
+
+def test_small_body_is_not_compressed(server, monkeypatch):
+    monkeypatch.setattr(http_server, "COMPRESSION", True)
+
+    response = server.get("/cache_stats", {"Accept-Encoding": "gzip"})
+
+    assert len(response.data) < http_server.encoding.MIN_COMPRESS_BYTES
+    assert response.getheader("Content-Encoding") is None
+    assert "Accept-Encoding" in response.getheader("Vary")
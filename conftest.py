@@ -0,0 +1,52 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Adresar testu -> adresar se zdrojaky, ktery je v kontejneru pracovnim adresarem sluzby
+SOURCES = {
+    os.path.join(ROOT, "Ukol_01", "tests"): os.path.join(ROOT, "Ukol_01"),
+    os.path.join(ROOT, "Ukol_02", "tests"): os.path.join(ROOT, "Ukol_02"),
+    os.path.join(ROOT, "Ukol_03", "http_server", "tests"): os.path.join(ROOT, "Ukol_03", "http_server", "src"),
+    os.path.join(ROOT, "Ukol_03", "data_trasformer", "tests"): os.path.join(ROOT, "Ukol_03", "data_trasformer", "src"),
+    os.path.join(ROOT, "Ukol_03", "dashboard", "tests"): os.path.join(ROOT, "Ukol_03", "dashboard", "src"),
+}
+
+
+# Zdroj -> jeho moduly libs*, odlozene, kdyz se aktivuje jina sluzba
+_stashed: dict[str, dict] = {}
+
+
+def _activate(source: str):
+    """ Import modules of one service: its directory first on sys.path and its own libs package """
+    for other in SOURCES.values():
+        while other in sys.path:
+            sys.path.remove(other)
+    sys.path.insert(0, source)
+    libs = sys.modules.get("libs")
+    if libs is not None and os.path.dirname(os.path.dirname(os.path.abspath(libs.__file__))) == source:
+        return
+    # kazda sluzba ma vlastni balicek libs; moduly predchozi sluzby se odlozi a vrati, az na ni prijde rada,
+    # aby testy a pickle (procesy parseru) videly stale tytez objekty modulu
+    if libs is not None:
+        owner = os.path.dirname(os.path.dirname(os.path.abspath(libs.__file__)))
+        names = [name for name in sys.modules if name == "libs" or name.startswith("libs.")]
+        _stashed[owner] = {name: sys.modules.pop(name) for name in names}
+    sys.modules.update(_stashed.pop(source, {}))
+
+
+def _activate_for(path):
+    path = str(path)
+    for tests, source in SOURCES.items():
+        if path == tests or path.startswith(tests + os.sep):
+            _activate(source)
+
+
+def pytest_collectstart(collector):
+    # testovaci moduly se importuji az po tomto hooku, vzdy proti zdrojakum sve sluzby
+    _activate_for(getattr(collector, "path", ""))
+
+
+def pytest_runtest_setup(item):
+    # testy bezi az po sberu vsech sluzeb, libs musi znovu patrit sluzbe testu
+    _activate_for(item.path)